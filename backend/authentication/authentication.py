@@ -0,0 +1,131 @@
+"""
+JWT authentication that trusts the user claims of a validated access token.
+
+Tokens issued at login carry the user's email, names and staff flags (add_user_claims).
+In the default claims mode ClaimsJWTAuthentication builds request.user from them, so an
+authenticated API request runs no query for authentication; the signature and expiry
+checks are unchanged. Views that need the User row call authenticated_user(request),
+which loads it through a per-process cache kept for JWT_AUTHENTICATION['USER_CACHE_SECONDS'].
+
+Claims are fixed when the refresh token is issued, so a user deactivated or demoted
+keeps the claims of their current access token until it expires; the refresh endpoint
+still checks the User row. The database mode loads the row on every request instead.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.utils.functional import cached_property
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+
+# User fields copied into tokens at login
+USER_CLAIMS = ('username', 'email', 'first_name', 'last_name', 'is_staff', 'is_superuser')
+
+
+def _auth_setting(key, default):
+    return getattr(settings, 'JWT_AUTHENTICATION', {}).get(key, default)
+
+
+def add_user_claims(token, user):
+    """Copy USER_CLAIMS into token; access tokens made from a refresh token inherit them."""
+    for claim in USER_CLAIMS:
+        token[claim] = getattr(user, claim)
+    return token
+
+
+class ClaimsUser(TokenUser):
+    """request.user built from access token claims; tokens from before the claims have only the id."""
+
+    @cached_property
+    def email(self):
+        return self.token.get('email', '')
+
+    @cached_property
+    def first_name(self):
+        return self.token.get('first_name', '')
+
+    @cached_property
+    def last_name(self):
+        return self.token.get('last_name', '')
+
+    @cached_property
+    def is_active(self):
+        # The token was valid when issued; deactivation is checked at refresh and by authenticated_user()
+        return True
+
+
+class UserCache:
+    """
+    User rows by id for up to ttl seconds in this process; missing users are cached as None.
+    Ids are keyed as strings, the form the user_id claim takes.
+    """
+
+    def __init__(self, ttl, max_size=1024):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.lock = threading.Lock()
+        # user_id -> (expires at, User or None), least recently loaded first
+        self.entries = OrderedDict()
+
+    def get(self, user_id):
+        user_id = str(user_id)
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(user_id)
+            if entry is not None and entry[0] > now:
+                return entry[1]
+
+        user = User.objects.filter(pk=user_id).first()
+        if self.ttl > 0:
+            with self.lock:
+                self.entries.pop(user_id, None)
+                self.entries[user_id] = (now + self.ttl, user)
+                while len(self.entries) > self.max_size:
+                    self.entries.popitem(last=False)
+        return user
+
+    def invalidate(self, user_id):
+        with self.lock:
+            self.entries.pop(str(user_id), None)
+
+
+_user_cache = None
+_user_cache_lock = threading.Lock()
+
+
+def get_user_cache():
+    """Process-wide user cache."""
+    global _user_cache
+    if _user_cache is None:
+        with _user_cache_lock:
+            if _user_cache is None:
+                _user_cache = UserCache(_auth_setting('USER_CACHE_SECONDS', 30))
+    return _user_cache
+
+
+def authenticated_user(request):
+    """The User row of request.user, from the user cache in claims mode."""
+    user = request.user
+    if not isinstance(user, ClaimsUser):
+        return user
+    full_user = get_user_cache().get(user.id)
+    if full_user is None or not api_settings.USER_AUTHENTICATION_RULE(full_user):
+        raise AuthenticationFailed('User not found or inactive', code='user_not_found')
+    return full_user
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication without the per-request User query unless JWT_AUTHENTICATION['MODE'] is database."""
+
+    def get_user(self, validated_token):
+        if _auth_setting('MODE', 'claims') == 'database':
+            return super().get_user(validated_token)
+        if api_settings.USER_ID_CLAIM not in validated_token:
+            raise InvalidToken('Token contained no recognizable user identification')
+        return ClaimsUser(validated_token)
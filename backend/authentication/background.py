@@ -0,0 +1,70 @@
+"""
+Bounded background execution for post-login side effects such as Slack notifications.
+
+google_auth used to start a thread per login. BoundedExecutor runs tasks on at most
+MAX_WORKERS threads and accepts at most MAX_PENDING queued or running tasks; beyond that
+submit() drops the task and returns None, so a login wave after an outage neither spawns
+hundreds of threads nor queues unbounded work behind a slow Slack API.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+from voiceops.metrics import Counter
+
+logger = logging.getLogger(__name__)
+
+LOGIN_TASKS = Counter(
+    'voiceops_login_tasks_total',
+    'Post-login background tasks by outcome',
+    ('outcome',)
+)
+
+
+class BoundedExecutor:
+    """Thread pool that drops submissions once max_pending tasks are queued or running."""
+
+    def __init__(self, max_workers, max_pending, thread_name_prefix=''):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=thread_name_prefix)
+        self.slots = threading.BoundedSemaphore(max_pending)
+
+    def submit(self, func, *args, **kwargs):
+        """Future of func(*args, **kwargs), or None when the executor is full."""
+        if not self.slots.acquire(blocking=False):
+            LOGIN_TASKS.inc(outcome='dropped')
+            return None
+        try:
+            future = self.executor.submit(func, *args, **kwargs)
+        except Exception:
+            self.slots.release()
+            raise
+        LOGIN_TASKS.inc(outcome='submitted')
+        future.add_done_callback(self._done)
+        return future
+
+    def _done(self, future):
+        self.slots.release()
+        if not future.cancelled() and future.exception() is not None:
+            LOGIN_TASKS.inc(outcome='failed')
+            logger.error("Login background task failed", exc_info=future.exception())
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_login_executor():
+    """Process-wide executor from settings.LOGIN_TASKS."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                config = getattr(settings, 'LOGIN_TASKS', {})
+                _executor = BoundedExecutor(
+                    config.get('MAX_WORKERS', 4),
+                    config.get('MAX_PENDING', 100),
+                    thread_name_prefix='login-tasks'
+                )
+    return _executor
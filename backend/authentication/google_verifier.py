@@ -0,0 +1,142 @@
+"""
+Google ID token verification with cached signing certificates.
+
+google.oauth2.id_token.verify_oauth2_token fetches Google's certificates on every call.
+GoogleTokenVerifier keeps them in process memory for the max-age of the certificate
+response (less its Age), fetched over one pooled requests session, so logins reuse them
+and a login burst triggers one fetch. Refreshes are single-flight: one thread fetches
+while the others wait for its result.
+
+A token signed with a key id missing from the cache (Google rotated its keys) refetches
+early, at most once per MIN_REFRESH_SECONDS so bogus key ids cannot force fetches. When a
+refresh fails, the cached certificates stay in use and the fetch is retried after
+MIN_REFRESH_SECONDS.
+
+GOOGLE_AUTH['CERTS_URL'] can point at a local stub serving a {key id: PEM certificate}
+JSON document, the format of Google's v1 endpoint.
+"""
+import logging
+import re
+import threading
+import time
+
+import requests
+from django.conf import settings
+from google.auth import exceptions, jwt
+
+GOOGLE_CERTS_URL = 'https://www.googleapis.com/oauth2/v1/certs'
+GOOGLE_ISSUERS = ('accounts.google.com', 'https://accounts.google.com')
+
+# Used when the certificate response has no max-age
+DEFAULT_CERTS_TTL_SECONDS = 300
+MIN_REFRESH_SECONDS = 30
+
+logger = logging.getLogger(__name__)
+
+re_max_age = re.compile(r'(?:^|,)\s*max-age\s*=\s*"?(\d+)"?', re.IGNORECASE)
+
+
+def _google_auth_setting(key, default):
+    return getattr(settings, 'GOOGLE_AUTH', {}).get(key, default)
+
+
+def certs_ttl(headers):
+    """Seconds a certificate response may be cached: Cache-Control max-age less Age."""
+    match = re_max_age.search(headers.get('Cache-Control', ''))
+    if not match:
+        return DEFAULT_CERTS_TTL_SECONDS
+    try:
+        age = int(headers.get('Age', 0))
+    except ValueError:
+        age = 0
+    return max(int(match.group(1)) - age, 0)
+
+
+class GoogleCertCache:
+    """Certificates from certs_url, refetched when their max-age has passed."""
+
+    def __init__(self, certs_url, session=None, timeout=5):
+        self.certs_url = certs_url
+        self.session = session or requests.Session()
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.certs = None
+        self.expires_at = 0.0
+        self.fetched_at = 0.0
+
+    def get(self, key_id=None):
+        """Certificates by key id; refetched early when key_id is not among them."""
+        certs = self.certs
+        now = time.monotonic()
+        if certs is not None and now < self.expires_at and (key_id is None or key_id in certs):
+            return certs
+
+        with self.lock:
+            now = time.monotonic()
+            if self.certs is None or now >= self.expires_at or (
+                key_id is not None and key_id not in self.certs and now - self.fetched_at >= MIN_REFRESH_SECONDS
+            ):
+                self._refresh(now)
+            return self.certs
+
+    def _refresh(self, now):
+        try:
+            response = self.session.get(self.certs_url, timeout=self.timeout)
+            response.raise_for_status()
+            certs = response.json()
+        except Exception as e:
+            if self.certs is None:
+                raise exceptions.TransportError(f"Could not fetch certificates at {self.certs_url}: {e}") from e
+            logger.warning("Failed to refresh Google certificates, keeping cached ones: %s", e)
+            self.fetched_at = now
+            self.expires_at = now + MIN_REFRESH_SECONDS
+            return
+        self.certs = certs
+        self.fetched_at = now
+        self.expires_at = now + certs_ttl(response.headers)
+
+
+class GoogleTokenVerifier:
+    """Verifies Google ID tokens like id_token.verify_oauth2_token, with cached certificates."""
+
+    def __init__(self, cert_cache, clock_skew_seconds=0):
+        self.cert_cache = cert_cache
+        self.clock_skew_seconds = clock_skew_seconds
+
+    def verify(self, token, audience=None):
+        """
+        Decoded claims of token. Raises ValueError for invalid tokens and
+        google.auth.exceptions.GoogleAuthError for a wrong issuer or unreachable certificates.
+        """
+        key_id = jwt.decode_header(token).get('kid')
+        idinfo = jwt.decode(
+            token,
+            certs=self.cert_cache.get(key_id),
+            audience=audience,
+            clock_skew_in_seconds=self.clock_skew_seconds
+        )
+        if idinfo.get('iss') not in GOOGLE_ISSUERS:
+            raise exceptions.GoogleAuthError(
+                f"Wrong issuer. 'iss' should be one of the following: {list(GOOGLE_ISSUERS)}"
+            )
+        return idinfo
+
+
+_verifier = None
+_verifier_lock = threading.Lock()
+
+
+def get_google_verifier():
+    """Process-wide verifier from settings.GOOGLE_AUTH."""
+    global _verifier
+    if _verifier is None:
+        with _verifier_lock:
+            if _verifier is None:
+                _verifier = GoogleTokenVerifier(
+                    GoogleCertCache(
+                        _google_auth_setting('CERTS_URL', GOOGLE_CERTS_URL),
+                        timeout=_google_auth_setting('CERTS_TIMEOUT_SECONDS', 5)
+                    ),
+                    clock_skew_seconds=_google_auth_setting('CLOCK_SKEW_SECONDS', 0)
+                )
+    return _verifier
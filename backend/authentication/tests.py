@@ -1,3 +1,257 @@
-from django.test import TestCase
+import datetime
+import threading
+import time
+from unittest import mock
 
-# Create your tests here.
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from google.auth import crypt, jwt
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from . import authentication, google_verifier
+from .authentication import ClaimsUser, UserCache
+from .google_verifier import GoogleCertCache, GoogleTokenVerifier
+from .views import get_tokens_for_user
+
+CERTS_URL = 'https://certs.example.com/oauth2/v1/certs'
+
+
+def make_signer(key_id):
+    """RSA signer for key_id and the PEM certificate Google would publish for it."""
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, key_id)])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(minutes=5))
+        .not_valid_after(now + datetime.timedelta(days=1))
+        .sign(key, hashes.SHA256())
+    )
+    private_pem = key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    )
+    return crypt.RSASigner.from_string(private_pem, key_id=key_id), cert.public_bytes(serialization.Encoding.PEM).decode()
+
+
+def make_token(signer, audience='client-id'):
+    now = int(time.time())
+    return jwt.encode(signer, {
+        'iss': 'https://accounts.google.com', 'aud': audience, 'sub': '42',
+        'email': 'user@example.com', 'iat': now, 'exp': now + 600,
+    })
+
+
+class StubResponse:
+    def __init__(self, status_code, certs, max_age):
+        self.status_code = status_code
+        self.certs = certs
+        self.headers = {'Cache-Control': f'public, max-age={max_age}'}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise google_verifier.requests.HTTPError(f'{self.status_code} Server Error')
+
+    def json(self):
+        return dict(self.certs)
+
+
+class StubSession:
+    """Serves certs like Google's endpoint and counts fetches; no network."""
+
+    def __init__(self, certs, max_age=3600, delay=0):
+        self.certs = certs
+        self.max_age = max_age
+        self.delay = delay
+        self.status_code = 200
+        self.fetches = 0
+        self.lock = threading.Lock()
+
+    def get(self, url, timeout=None):
+        with self.lock:
+            self.fetches += 1
+        time.sleep(self.delay)
+        return StubResponse(self.status_code, self.certs, self.max_age)
+
+
+class GoogleCertCacheTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.signer, cls.cert = make_signer('key-1')
+        cls.rotated_signer, cls.rotated_cert = make_signer('key-2')
+
+    def test_concurrent_logins_fetch_once(self):
+        session = StubSession({'key-1': self.cert}, delay=0.05)
+        verifier = GoogleTokenVerifier(GoogleCertCache(CERTS_URL, session=session))
+        token = make_token(self.signer)
+        results = []
+
+        def login():
+            results.append(verifier.verify(token, 'client-id')['sub'])
+
+        threads = [threading.Thread(target=login) for _ in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results, ['42'] * 20)
+        self.assertEqual(session.fetches, 1)
+
+    def test_unknown_key_id_refetches(self):
+        session = StubSession({'key-1': self.cert})
+        verifier = GoogleTokenVerifier(GoogleCertCache(CERTS_URL, session=session))
+        verifier.verify(make_token(self.signer), 'client-id')
+
+        session.certs = {'key-1': self.cert, 'key-2': self.rotated_cert}
+        with mock.patch.object(google_verifier, 'MIN_REFRESH_SECONDS', 0):
+            self.assertEqual(verifier.verify(make_token(self.rotated_signer), 'client-id')['sub'], '42')
+        self.assertEqual(session.fetches, 2)
+
+    def test_unknown_key_id_refetch_is_rate_limited(self):
+        session = StubSession({'key-1': self.cert})
+        cache = GoogleCertCache(CERTS_URL, session=session)
+        cache.get('key-1')
+        for _ in range(5):
+            self.assertNotIn('bogus', cache.get('bogus'))
+        self.assertEqual(session.fetches, 1)
+
+    def test_keeps_stale_certs_when_refresh_fails(self):
+        session = StubSession({'key-1': self.cert}, max_age=0)
+        verifier = GoogleTokenVerifier(GoogleCertCache(CERTS_URL, session=session))
+        token = make_token(self.signer)
+        verifier.verify(token, 'client-id')
+
+        session.status_code = 503
+        with self.assertLogs('authentication.google_verifier', level='WARNING') as logs:
+            self.assertEqual(verifier.verify(token, 'client-id')['sub'], '42')
+        self.assertEqual(session.fetches, 2)
+        self.assertIn('keeping cached ones', logs.output[0])
+
+        # The failed refresh is retried only after MIN_REFRESH_SECONDS
+        verifier.verify(token, 'client-id')
+        self.assertEqual(session.fetches, 2)
+
+    def test_first_fetch_failure_raises(self):
+        session = StubSession({})
+        session.status_code = 503
+        with self.assertRaises(google_verifier.exceptions.TransportError):
+            GoogleCertCache(CERTS_URL, session=session).get('key-1')
+
+
+class ClaimsAuthenticationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            'ada@example.com', 'ada@example.com', first_name='Ada', last_name='Lovelace', is_staff=True
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        patcher = mock.patch.object(authentication, '_user_cache', UserCache(30))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def request(self, method, path, token, **data):
+        """Response and the auth_user queries it ran."""
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method)(path, data, format='json')
+        return response, [query['sql'] for query in queries.captured_queries if 'auth_user' in query['sql']]
+
+    def test_claims_mode_runs_no_user_query(self):
+        token = get_tokens_for_user(self.user)['access']
+        response, user_queries = self.request('post', '/api/auth/logout/', token)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(user_queries, [])
+
+        user = response.wsgi_request.user
+        self.assertIsInstance(user, ClaimsUser)
+        self.assertEqual(
+            (user.username, user.email, user.first_name, user.last_name, user.is_staff, user.is_superuser),
+            ('ada@example.com', 'ada@example.com', 'Ada', 'Lovelace', True, False)
+        )
+
+    @override_settings(JWT_AUTHENTICATION={'MODE': 'database', 'USER_CACHE_SECONDS': 30})
+    def test_database_mode_loads_user_per_request(self):
+        token = get_tokens_for_user(self.user)['access']
+        for _ in range(2):
+            response, user_queries = self.request('post', '/api/auth/logout/', token)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(user_queries), 1)
+            self.assertIsInstance(response.wsgi_request.user, User)
+
+        # Deactivation takes effect on the next request
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        response, _ = self.request('post', '/api/auth/logout/', token)
+        self.assertEqual(response.status_code, 401)
+
+    def test_deactivated_user_keeps_claims_until_refresh(self):
+        tokens = get_tokens_for_user(self.user)
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+
+        # The access token stays valid in claims mode; the User row is checked where it is read
+        response, _ = self.request('post', '/api/auth/logout/', tokens['access'])
+        self.assertEqual(response.status_code, 200)
+        response, _ = self.request('get', '/api/auth/user/', tokens['access'])
+        self.assertEqual(response.status_code, 401)
+
+        self.client.credentials()
+        response = self.client.post('/api/auth/token/refresh/', {'refresh': tokens['refresh']}, format='json')
+        self.assertEqual(response.status_code, 401)
+
+    def test_user_info_is_cached_and_invalidated_on_login(self):
+        token = get_tokens_for_user(self.user)['access']
+        response, user_queries = self.request('get', '/api/auth/user/', token)
+        self.assertEqual(response.json()['first_name'], 'Ada')
+        self.assertEqual(len(user_queries), 1)
+        response, user_queries = self.request('get', '/api/auth/user/', token)
+        self.assertEqual(user_queries, [])
+
+        verifier = mock.Mock()
+        verifier.verify.return_value = {
+            'email': 'ada@example.com', 'given_name': 'Augusta', 'family_name': 'King', 'sub': '42'
+        }
+        self.client.credentials()
+        with mock.patch('authentication.views.get_google_verifier', return_value=verifier), \
+                mock.patch('authentication.views.get_login_executor'):
+            response = self.client.post('/api/auth/google/', {'token': 'google-token'}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+        # The old access token still carries the old names, but the profile reloads the row
+        response, user_queries = self.request('get', '/api/auth/user/', token)
+        self.assertEqual(len(user_queries), 1)
+        self.assertEqual((response.json()['first_name'], response.json()['last_name']), ('Augusta', 'King'))
+        self.assertEqual(response.wsgi_request.user.first_name, 'Ada')
+
+    def test_token_with_only_user_id(self):
+        token = AccessToken.for_user(self.user)
+        response, user_queries = self.request('post', '/api/auth/logout/', token)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(user_queries, [])
+        user = response.wsgi_request.user
+        self.assertEqual((user.id, user.email, user.first_name), (str(self.user.pk), '', ''))
+
+        response, _ = self.request('get', '/api/auth/user/', token)
+        self.assertEqual(response.json()['email'], 'ada@example.com')
+
+        # Access tokens made from an old refresh token work the same way
+        response, _ = self.request('get', '/api/auth/user/', RefreshToken.for_user(self.user).access_token)
+        self.assertEqual(response.json()['first_name'], 'Ada')
+
+    def test_token_without_user_id_is_rejected(self):
+        token = AccessToken.for_user(self.user)
+        del token['user_id']
+        response, _ = self.request('post', '/api/auth/logout/', token)
+        self.assertEqual(response.status_code, 401)
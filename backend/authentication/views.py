@@ -1,25 +1,27 @@
 import logging
-import threading
 
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework_simplejwt.tokens import RefreshToken
-from google.oauth2 import id_token
-from google.auth.transport import requests
 from django.contrib.auth.models import User
 from django.conf import settings
+from django.utils import timezone
+from .authentication import add_user_claims, authenticated_user, get_user_cache
+from .background import get_login_executor
+from .google_verifier import get_google_verifier
 from .serializers import UserSerializer, GoogleAuthSerializer
 from events.integrations.slack import login_notification
+from voiceops import tracing
 
 
 logger = logging.getLogger(__name__)
 
 
 def get_tokens_for_user(user):
-    """Generate JWT tokens for user"""
-    refresh = RefreshToken.for_user(user)
+    """Generate JWT tokens for user, carrying the claims ClaimsJWTAuthentication trusts"""
+    refresh = add_user_claims(RefreshToken.for_user(user), user)
     return {
         'refresh': str(refresh),
         'access': str(refresh.access_token),
@@ -41,12 +43,8 @@ def google_auth(request):
     google_token = serializer.validated_data['token']
     
     try:
-        # Verify the Google token
-        idinfo = id_token.verify_oauth2_token(
-            google_token, 
-            requests.Request(), 
-            settings.GOOGLE_OAUTH_CLIENT_ID
-        )
+        # Verify the Google token against the cached Google certificates
+        idinfo = get_google_verifier().verify(google_token, settings.GOOGLE_OAUTH_CLIENT_ID)
         
         # Extract user info from Google token
         email = idinfo.get('email')
@@ -60,13 +58,15 @@ def google_auth(request):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Get or create user
+        # Get or create user; last_login is written with the user row, not per request
+        now = timezone.now()
         user, created = User.objects.get_or_create(
             email=email,
             defaults={
                 'username': email,
                 'first_name': first_name,
                 'last_name': last_name,
+                'last_login': now,
             }
         )
         
@@ -74,26 +74,25 @@ def google_auth(request):
         if not created:
             user.first_name = first_name
             user.last_name = last_name
-            user.save()
+            user.last_login = now
+            user.save(update_fields=['first_name', 'last_name', 'last_login'])
+            get_user_cache().invalidate(user.pk)
         
         # Generate JWT tokens
         tokens = get_tokens_for_user(user)
 
-        # Send Slack notification in a fire-and-forget daemon thread
-        # so login response is not blocked by external Slack latency.
+        # Send Slack notification on the bounded login executor so the login
+        # response is not blocked by external Slack latency; dropped when it is full.
         try:
             user_data = {
                 'email': email,
                 'first_name': first_name,
                 'last_name': last_name,
             }
-            threading.Thread(
-                target=login_notification,
-                args=(user_data, created),
-                daemon=True,
-            ).start()
+            if get_login_executor().submit(tracing.propagate(login_notification), user_data, created) is None:
+                logger.warning("Login executor full, Slack login notification dropped")
         except Exception as slack_exc:
-            logger.error("Slack notification thread dispatch failed: %s", slack_exc)
+            logger.error("Slack notification dispatch failed: %s", slack_exc)
         
         return Response({
             'access': tokens['access'],
@@ -118,7 +117,7 @@ def google_auth(request):
 @permission_classes([IsAuthenticated])
 def get_user_info(request):
     """Get current authenticated user info"""
-    serializer = UserSerializer(request.user)
+    serializer = UserSerializer(authenticated_user(request))
     return Response(serializer.data, status=status.HTTP_200_OK)
 
 
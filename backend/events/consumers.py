@@ -1,43 +1,389 @@
 """
 WebSocket consumers for real-time event streaming
 """
+import asyncio
 import json
+import logging
+import time
+import weakref
+from collections import deque
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
+from django.conf import settings
+
+from .utilities.broadcasting import TRACE_TOPICS, StreamFilterError, filter_group_names, trace_group_name
+from .utilities.stream_buffer import cursor_key, get_stream_buffer
+
+logger = logging.getLogger(__name__)
+
+STREAM_FILTER_KEYS = ('category', 'account_sid', 'status', 'severity')
+
+OVERFLOW_POLICIES = ('coalesce', 'drop_oldest', 'disconnect')
+
+# Close code sent to clients disconnected by the 'disconnect' overflow policy.
+SLOW_CONSUMER_CLOSE_CODE = 4008
+
+# Connections handled by this process, for lag reporting.
+_active_connections = weakref.WeakSet()
+
+
+def _backpressure_setting(key, default):
+    return getattr(settings, 'EVENT_STREAM_BACKPRESSURE', {}).get(key, default)
+
+
+def connection_stats():
+    """Lag and queue stats for every WebSocket connection handled by this process."""
+    return [consumer.stream_stats() for consumer in list(_active_connections)]
 
 
 class EventStreamConsumer(AsyncWebsocketConsumer):
     """
-    WebSocket consumer for streaming Twilio events to connected clients
+    WebSocket consumer for streaming Twilio events to connected clients.
+
+    Outbound messages go through a bounded per-connection queue drained by a writer task,
+    so the channel layer buffer is always emptied promptly and a slow client only affects
+    itself. When the queue is full the connection's overflow policy applies:
+    - coalesce: drop new events and later send one summary with the dropped counts
+    - drop_oldest: discard the oldest queued message
+    - disconnect: close with code 4008 and a resume hint
+    Clients can opt into flow control with ?ack_window=N and then acknowledge with
+    { "action": "ack", "received": <total messages received> }; at most N messages are
+    then in flight, and the rest wait in the queue.
+
+    Event messages carry a cursor. Reconnecting with ?last_seen=<cursor> replays the
+    missed events matching the connection's filters from the stream buffer, or sends
+    resync_required when the gap is too large to replay.
     """
-    
+    MAX_TRACE_SUBSCRIPTIONS = 50
+
     async def connect(self):
-        self.group_name = 'twilio_events'
-        
-        # Join the events group
-        await self.channel_layer.group_add(
-            self.group_name,
-            self.channel_name
-        )
-        
+        self.stream_groups = []
+        self.trace_groups = set()
+
+        query_params = parse_qs(self.scope.get('query_string', b'').decode())
+
+        self.queue_size = _backpressure_setting('QUEUE_SIZE', 500)
+        self.overflow_policy = _first_param(query_params, 'overflow') or _backpressure_setting('POLICY', 'coalesce')
+        ack_window = _first_param(query_params, 'ack_window')
+        if self.overflow_policy not in OVERFLOW_POLICIES or (ack_window and not ack_window.isdigit()):
+            await self.close(code=4400)
+            return
+        self.ack_window = min(int(ack_window), self.queue_size) if ack_window else None
+
+        self.outbound = deque()
+        self.outbound_ready = asyncio.Event()
+        self.coalesced_counts = {}
+        self.connected_at = time.monotonic()
+        self.sent_count = 0
+        self.acked_count = 0
+        self.dropped_count = 0
+        self.coalesced_count = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.last_sent_event_id = None
+        self.last_sent_cursor = None
+        self.replayed_through = None
+        self.writer_task = None
+        self.closing = False
+
+        # Join the events groups matching the filters in the query string (all events by default)
+        try:
+            stream_groups = filter_group_names(_parse_stream_filters(query_params))
+        except StreamFilterError:
+            await self.close(code=4400)
+            return
+        await self._join_stream_groups(stream_groups)
+
         await self.accept()
-        print(f"WebSocket connected: {self.channel_name}")
-    
+        self.writer_task = asyncio.ensure_future(self._drain_outbound())
+        _active_connections.add(self)
+        logger.info("WebSocket connected: %s", self.channel_name)
+
+        last_seen = _first_param(query_params, 'last_seen')
+        if last_seen:
+            await self._replay(last_seen)
+
     async def disconnect(self, close_code):
-        await self.channel_layer.group_discard(
-            self.group_name,
-            self.channel_name
-        )
-        print(f"WebSocket disconnected: {self.channel_name}")
-    
-    async def receive(self, text_data):
-        """Handle messages from WebSocket (if needed)"""
-        pass
-    
-    async def event_message(self, event):
+        _active_connections.discard(self)
+        if getattr(self, 'writer_task', None):
+            self.writer_task.cancel()
+            self.writer_task = None
+        for stream_group in self.stream_groups:
+            await self.channel_layer.group_discard(stream_group, self.channel_name)
+        self.stream_groups = []
+        for trace_group in self.trace_groups:
+            await self.channel_layer.group_discard(trace_group, self.channel_name)
+        self.trace_groups.clear()
+        logger.info("WebSocket disconnected: %s (code %s)", self.channel_name, close_code)
+
+    async def receive(self, text_data=None, bytes_data=None):
         """
-        Receive event from channel layer and send to WebSocket
+        Handle messages from WebSocket.
+        Supports live trace subscriptions:
+        { "action": "subscribe" | "unsubscribe", "call_sid": "..." } or with "conference_sid".
+        Replacing the event stream filters:
+        { "action": "set_filters", "account_sid": [...], "category": [...], "status": [...], "severity": [...] }
+        Flow control and lag reporting:
+        { "action": "ack", "received": N } and { "action": "stats" }
         """
+        try:
+            message = json.loads(text_data or '')
+        except json.JSONDecodeError:
+            await self._send_error('Invalid JSON')
+            return
+
+        if not isinstance(message, dict):
+            await self._send_error('Message must be an object')
+            return
+
+        action = message.get('action')
+        if action == 'ack':
+            self._ack(message.get('received'))
+            return
+        if action == 'stats':
+            await self.send(text_data=json.dumps({
+                'type': 'stats',
+                'data': self.stream_stats()
+            }))
+            return
+        if action == 'set_filters':
+            await self._set_filters(message)
+            return
+        if action not in ('subscribe', 'unsubscribe'):
+            await self._send_error(f"Unknown action: {action}")
+            return
+
+        topic = next((key for key in TRACE_TOPICS if message.get(key)), None)
+        group_name = trace_group_name(topic, message.get(topic)) if topic else None
+        if not group_name:
+            await self._send_error('A valid call_sid or conference_sid is required')
+            return
+
+        if action == 'subscribe':
+            if group_name not in self.trace_groups:
+                if len(self.trace_groups) >= self.MAX_TRACE_SUBSCRIPTIONS:
+                    await self._send_error('Too many trace subscriptions')
+                    return
+                await self.channel_layer.group_add(group_name, self.channel_name)
+                self.trace_groups.add(group_name)
+        else:
+            await self.channel_layer.group_discard(group_name, self.channel_name)
+            self.trace_groups.discard(group_name)
+
         await self.send(text_data=json.dumps({
-            'type': event['event_type'],
+            'type': 'subscribed' if action == 'subscribe' else 'unsubscribed',
+            'topic': topic,
+            'sid': message[topic]
+        }))
+
+    async def event_message(self, event):
+        """
+        Receive event from channel layer and queue it for the WebSocket
+        """
+        cursor = event.get('cursor')
+        if cursor and self.replayed_through and cursor_key(cursor) <= self.replayed_through:
+            # Already sent during replay
+            return
+
+        await self._enqueue(event['event_type'], _event_payload(event, cursor))
+
+    async def trace_message(self, event):
+        """
+        Receive a formatted trace event for a subscribed call or conference and queue it for the WebSocket
+        """
+        await self._enqueue('trace_event', {
+            'type': 'trace_event',
+            'topic': event['topic'],
+            'sid': event['sid'],
             'data': event['data']
+        })
+
+    def stream_stats(self):
+        """Per-connection queue and lag metrics."""
+        now = time.monotonic()
+        oldest_age = now - self.outbound[0][0] if self.outbound else 0.0
+        return {
+            'channel_name': self.channel_name,
+            'connected_seconds': round(now - self.connected_at, 3),
+            'overflow_policy': self.overflow_policy,
+            'ack_window': self.ack_window,
+            'queue_depth': len(self.outbound),
+            'queue_size': self.queue_size,
+            'oldest_queued_seconds': round(oldest_age, 3),
+            'in_flight': self.sent_count - self.acked_count if self.ack_window else None,
+            'sent': self.sent_count,
+            'dropped': self.dropped_count,
+            'coalesced': self.coalesced_count,
+            'last_lag_seconds': round(self.last_lag, 3),
+            'max_lag_seconds': round(self.max_lag, 3),
+        }
+
+    async def _enqueue(self, kind, payload):
+        if self.closing:
+            return
+        if len(self.outbound) >= self.queue_size:
+            if self.overflow_policy == 'disconnect':
+                await self._disconnect_slow_consumer()
+                return
+            if self.overflow_policy == 'drop_oldest':
+                self.outbound.popleft()
+                self.dropped_count += 1
+            else:
+                self.coalesced_counts[kind] = self.coalesced_counts.get(kind, 0) + 1
+                self.coalesced_count += 1
+                self.outbound_ready.set()
+                return
+
+        self.outbound.append((time.monotonic(), payload))
+        self.outbound_ready.set()
+
+    def _ack(self, received):
+        if not isinstance(received, int) or received < self.acked_count:
+            return
+        self.acked_count = min(received, self.sent_count)
+        self.outbound_ready.set()
+
+    def _can_send(self):
+        return self.ack_window is None or self.sent_count - self.acked_count < self.ack_window
+
+    async def _drain_outbound(self):
+        """Writer task: send queued messages in order, respecting the ack window."""
+        try:
+            while True:
+                await self.outbound_ready.wait()
+                self.outbound_ready.clear()
+
+                while self._can_send() and (self.outbound or self.coalesced_counts):
+                    if self.outbound:
+                        enqueued_at, payload = self.outbound.popleft()
+                        self.last_lag = time.monotonic() - enqueued_at
+                        self.max_lag = max(self.max_lag, self.last_lag)
+                        self.last_sent_event_id = payload.get('data', {}).get('event_id', self.last_sent_event_id)
+                        self.last_sent_cursor = payload.get('cursor', self.last_sent_cursor)
+                    else:
+                        # Queue has drained: tell the client how many events it missed so it can resync.
+                        payload = {
+                            'type': 'coalesced',
+                            'counts': self.coalesced_counts
+                        }
+                        self.coalesced_counts = {}
+
+                    await self.send(text_data=json.dumps(payload))
+                    self.sent_count += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # Without the writer nothing more would be delivered; close so the client reconnects and resumes.
+            logger.exception("WebSocket writer failed for %s, closing", self.channel_name)
+            self.closing = True
+            try:
+                await self.close(code=1011)
+            except Exception:
+                logger.warning("Failed to close WebSocket %s", self.channel_name, exc_info=True)
+
+    async def _disconnect_slow_consumer(self):
+        # Stop queueing; disconnect() runs when the server reports the close.
+        self.closing = True
+        await self.send(text_data=json.dumps({
+            'type': 'resume',
+            'reason': 'slow_consumer',
+            'last_event_id': self.last_sent_event_id,
+            'last_seen': self.last_sent_cursor
         }))
+        await self.close(code=SLOW_CONSUMER_CLOSE_CODE)
+
+    async def _replay(self, last_seen):
+        """Queue buffered events after last_seen that match this connection's stream groups."""
+        stream_buffer = get_stream_buffer()
+        entries = None
+        if stream_buffer is not None:
+            try:
+                entries = await sync_to_async(stream_buffer.since)(
+                    last_seen,
+                    getattr(settings, 'EVENT_STREAM_REPLAY', {}).get('MAX_REPLAY', 1000)
+                )
+            except Exception as e:
+                logger.warning("Stream replay failed: %s", e)
+
+        if entries is None:
+            await self._enqueue('resync_required', {
+                'type': 'resync_required',
+                'last_seen': last_seen
+            })
+            return
+
+        stream_groups = set(self.stream_groups)
+        replayed = 0
+        for cursor, groups, message in entries:
+            if stream_groups.intersection(groups):
+                await self._enqueue(message['event_type'], _event_payload(message, cursor))
+                replayed += 1
+        if entries:
+            self.replayed_through = cursor_key(entries[-1][0])
+
+        await self._enqueue('replay_complete', {
+            'type': 'replay_complete',
+            'count': replayed
+        })
+
+    async def _set_filters(self, message):
+        filters = _parse_stream_filters(message)
+        try:
+            stream_groups = filter_group_names(filters)
+        except StreamFilterError as e:
+            await self._send_error(str(e))
+            return
+
+        await self._join_stream_groups(stream_groups)
+        await self.send(text_data=json.dumps({
+            'type': 'filters_set',
+            'filters': filters
+        }))
+
+    async def _join_stream_groups(self, stream_groups):
+        for stream_group in set(self.stream_groups) - set(stream_groups):
+            await self.channel_layer.group_discard(stream_group, self.channel_name)
+        for stream_group in set(stream_groups) - set(self.stream_groups):
+            await self.channel_layer.group_add(stream_group, self.channel_name)
+        self.stream_groups = stream_groups
+
+    async def _send_error(self, message):
+        await self.send(text_data=json.dumps({
+            'type': 'error',
+            'message': message
+        }))
+
+
+def _event_payload(message, cursor):
+    payload = {
+        'type': message['event_type'],
+        'data': message['data']
+    }
+    if cursor:
+        payload['cursor'] = cursor
+    return payload
+
+
+def _first_param(query_params, key):
+    values = query_params.get(key) or []
+    return values[0] if values else None
+
+
+def _parse_stream_filters(params):
+    """
+    Normalize stream filters from a parsed query string or a JSON message.
+    Values may be lists or comma-separated strings.
+    """
+    filters = {}
+    for key in STREAM_FILTER_KEYS:
+        raw_values = params.get(key) or []
+        if isinstance(raw_values, str):
+            raw_values = [raw_values]
+        values = []
+        for raw_value in raw_values:
+            values.extend(value.strip() for value in str(raw_value).split(',') if value.strip())
+        if values:
+            filters[key] = values
+    return filters
@@ -1,13 +1,50 @@
+import logging
 import os
+import time
 import requests
 from datetime import datetime, timezone, timedelta
 from dotenv import load_dotenv
+from voiceops import tracing
+from voiceops.metrics import Counter, Histogram
+from ..utilities.ingest_health import get_ingest_health
 
 load_dotenv()
 
 SLACK_BOT_TOKEN = os.getenv('SLACK_BOT_TOKEN')
 CHANNEL_ID = os.getenv('CHANNEL_ID')
 
+logger = logging.getLogger(__name__)
+
+SLACK_REQUEST_SECONDS = Histogram(
+    'voiceops_slack_request_seconds', 'Slack chat.postMessage latency by notification', ['notification']
+)
+SLACK_REQUESTS = Counter(
+    'voiceops_slack_requests_total', 'Slack requests by notification and outcome (ok, failed, error)',
+    ['notification', 'outcome']
+)
+
+def _post_message(url, payload, headers, notification):
+    """POST to the Slack API and return the decoded response, recording latency and outcome."""
+    ingest_health = get_ingest_health()
+    token = ingest_health.slack_started()
+    start = time.perf_counter()
+    with tracing.span('slack.chat.postMessage', kind=tracing.SPAN_KIND_CLIENT, notification=notification) as span:
+        try:
+            response = requests.post(url, json=payload, headers=headers)
+            span.set_attribute('http.response.status_code', response.status_code)
+            response_data = response.json()
+        except Exception:
+            SLACK_REQUESTS.inc(notification=notification, outcome='error')
+            ingest_health.slack_finished(token, ok=False)
+            raise
+        finally:
+            SLACK_REQUEST_SECONDS.observe(time.perf_counter() - start, notification=notification)
+        if not response_data.get('ok'):
+            span.set_error(response_data.get('error', 'Unknown error'))
+    SLACK_REQUESTS.inc(notification=notification, outcome='ok' if response_data.get('ok') else 'failed')
+    ingest_health.slack_finished(token, ok=bool(response_data.get('ok')))
+    return response_data
+
 def twilio_error_notification(error_data):
     try:
         timestamp_str = error_data.get('timestamp', datetime.now().isoformat())
@@ -36,18 +73,17 @@ def twilio_error_notification(error_data):
             "text": text
         }
         
-        response = requests.post(url, json=payload, headers=headers)
-        response_data = response.json()
+        response_data = _post_message(url, payload, headers, 'twilio_error_notification')
         
         if response_data.get('ok'):
-            print(f"Slack notification sent successfully for error: {error_data.get('error_code')}")
+            logger.info("Slack notification sent successfully for error: %s", error_data.get('error_code'))
             return True
         else:
-            print(f"Failed to send Slack notification: {response_data.get('error', 'Unknown error')}")
+            logger.warning("Failed to send Slack notification: %s", response_data.get('error', 'Unknown error'))
             return False
             
     except Exception as e:
-        print(f"Exception while sending Slack notification: {e}")
+        logger.warning("Exception while sending Slack notification: %s", e)
         import traceback
         traceback.print_exc()
         return False
@@ -74,14 +110,13 @@ def database_call_notification(event_data):
             "text": text
         }
         
-        response = requests.post(url, json=payload, headers=headers)
-        response_data = response.json()
+        response_data = _post_message(url, payload, headers, 'database_call_notification')
         
         if response_data.get('ok'):
-            print(f"Slack notification sent successfully for database error")
+            logger.info("Slack notification sent successfully for database error")
             
     except Exception as e:
-        print(f"Exception while sending Slack notification: {e}")
+        logger.warning("Exception while sending Slack notification: %s", e)
         import traceback
         traceback.print_exc()
         return False
@@ -108,14 +143,13 @@ def database_error_notification(event_data):
             "text": text
         }
         
-        response = requests.post(url, json=payload, headers=headers)
-        response_data = response.json()
+        response_data = _post_message(url, payload, headers, 'database_error_notification')
         
         if response_data.get('ok'):
-            print(f"Slack notification sent successfully for database error")
+            logger.info("Slack notification sent successfully for database error")
             
     except Exception as e:
-        print(f"Exception while sending Slack notification: {e}")
+        logger.warning("Exception while sending Slack notification: %s", e)
         import traceback
         traceback.print_exc()
         return False
@@ -138,14 +172,13 @@ def webhook_error_notification(error_msg):
             "text": text
         }
         
-        response = requests.post(url, json=payload, headers=headers)
-        response_data = response.json()
+        response_data = _post_message(url, payload, headers, 'webhook_error_notification')
         
         if response_data.get('ok'):
-            print(f"Slack notification sent successfully for webhook error")
+            logger.info("Slack notification sent successfully for webhook error")
             
     except Exception as e:
-        print(f"Exception while sending Slack notification: {e}")
+        logger.warning("Exception while sending Slack notification: %s", e)
         import traceback
         traceback.print_exc()
 
@@ -185,18 +218,58 @@ def login_notification(user_data, is_new_user=False):
             "text": text
         }
         
-        response = requests.post(url, json=payload, headers=headers)
-        response_data = response.json()
+        response_data = _post_message(url, payload, headers, 'login_notification')
         
         if response_data.get('ok'):
-            print(f"Slack notification sent successfully for login: {email}")
+            logger.info("Slack notification sent successfully for login: %s", email)
             return True
         else:
-            print(f"Failed to send Slack notification: {response_data.get('error', 'Unknown error')}")
+            logger.warning("Failed to send Slack notification: %s", response_data.get('error', 'Unknown error'))
             return False
             
     except Exception as e:
-        print(f"Exception while sending Slack notification: {e}")
+        logger.warning("Exception while sending Slack notification: %s", e)
+        import traceback
+        traceback.print_exc()
+        return False
+
+def error_rate_anomaly_notification(alert):
+    try:
+        minute_start = datetime.fromtimestamp(alert.get('minute_start', 0), tz=timezone.utc)
+        IST = timezone(timedelta(hours=5, minutes=30))
+        formatted_time_ist = minute_start.astimezone(IST).strftime('%Y-%m-%d %H:%M IST')
+        signal_label = 'Failed calls' if alert.get('signal') == 'failed_call' else 'Errors'
+
+        text = (
+            f"VoiceOps Error Rate Anomaly\n"
+            f"Account SID: {alert.get('account_sid') or 'N/A'}\n"
+            f"{signal_label} this minute: {alert.get('count')}\n"
+            f"Baseline: {alert.get('baseline')} per minute (stddev {alert.get('stddev')})\n"
+            f"Minute starting: {formatted_time_ist}"
+        )
+
+        url = "https://slack.com/api/chat.postMessage"
+        headers = {
+            "Authorization": f"Bearer {SLACK_BOT_TOKEN}",
+            "Content-Type": "application/json"
+        }
+
+        payload = {
+            "channel": CHANNEL_ID,
+            "text": text
+        }
+
+        response_data = _post_message(url, payload, headers, 'error_rate_anomaly_notification')
+
+        if response_data.get('ok'):
+            logger.info("Slack notification sent successfully for error rate anomaly: %s", alert.get('account_sid'))
+            return True
+        else:
+            logger.warning("Failed to send Slack notification: %s", response_data.get('error', 'Unknown error'))
+            return False
+
+    except Exception as e:
+        logger.warning("Exception while sending Slack notification: %s", e)
         import traceback
         traceback.print_exc()
         return False
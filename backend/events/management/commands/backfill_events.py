@@ -0,0 +1,141 @@
+"""
+Backfill archived Event Streams payloads from JSONL or JSONL.gz files.
+
+Lines are read as a stream and sent in batches to a process pool for parsing and
+normalization; the main process loads each batch with COPY into a staging table and
+upserts on event_id. Batches are committed in file order and recorded in a checkpoint
+file, so an interrupted run resumes after the last committed batch. Upserts are
+idempotent, so a batch replayed after a crash is harmless.
+
+Backfilled events are not broadcast and do not feed ingest analytics; run
+rebuild_call_timings afterwards to include them in call timing percentiles.
+"""
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+
+from events.utilities.backfill import iter_lines, load_rows, normalize_lines, uses_copy
+
+
+class Command(BaseCommand):
+    help = "Bulk load archived Event Streams JSONL(.gz) files with COPY and parallel normalization"
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+', help="JSONL or JSONL.gz files, loaded in the given order")
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help="Normalization processes; 0 normalizes in the main process")
+        parser.add_argument('--batch-size', type=int, default=5000, help="Lines per batch")
+        parser.add_argument('--checkpoint', default='backfill_checkpoint.json',
+                            help="Progress file used to resume an interrupted run")
+        parser.add_argument('--restart', action='store_true', help="Ignore an existing checkpoint")
+
+    def handle(self, *args, **options):
+        missing = [path for path in options['paths'] if not os.path.exists(path)]
+        if missing:
+            raise CommandError(f"File(s) not found: {', '.join(missing)}")
+
+        self.checkpoint_path = options['checkpoint']
+        self.progress = {} if options['restart'] else self._load_checkpoint()
+        self.totals = {'lines': 0, 'inserted': 0, 'updated': 0, 'rejected': 0}
+        self.started = time.monotonic()
+        self.last_report = self.started
+
+        copy_format = uses_copy()
+        workers = max(0, options['workers'])
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=django.setup) if workers else None
+        try:
+            for path in options['paths']:
+                self._load_file(path, executor, workers, options['batch_size'], copy_format)
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+
+        elapsed = time.monotonic() - self.started
+        self.stdout.write(self.style.SUCCESS(
+            f"Done in {elapsed:.1f}s: {self.totals['lines']} lines, {self.totals['inserted']} inserted, "
+            f"{self.totals['updated']} updated, {self.totals['rejected']} rejected "
+            f"({self._rate(elapsed)} events/s)"
+        ))
+
+    def _load_file(self, path, executor, workers, batch_size, copy_format):
+        key = os.path.abspath(path)
+        state = self.progress.get(key, {'line': 0, 'done': False})
+        if state['done']:
+            self.stdout.write(f"Skipping {path} (already loaded)")
+            return
+        if state['line']:
+            self.stdout.write(f"Resuming {path} after line {state['line']}")
+
+        # Keep a bounded number of batches in flight and commit them in file order
+        pending = deque()
+        for last_line, lines in _batches(iter_lines(path, skip=state['line']), batch_size):
+            if executor is None:
+                self._commit(key, last_line, len(lines), normalize_lines(lines, copy_format))
+                continue
+            pending.append((last_line, len(lines), executor.submit(normalize_lines, lines, copy_format)))
+            if len(pending) >= workers * 2:
+                last, count, future = pending.popleft()
+                self._commit(key, last, count, future.result())
+
+        while pending:
+            last, count, future = pending.popleft()
+            self._commit(key, last, count, future.result())
+
+        self.progress[key] = {'line': self.progress.get(key, state)['line'], 'done': True}
+        self._save_checkpoint()
+
+    def _commit(self, key, last_line, line_count, result):
+        rows, rejected = result
+        # load_rows commits as it goes; the checkpoint only moves once the whole batch is in
+        call_inserted, call_updated = load_rows('call', rows['call'])
+        error_inserted, error_updated = load_rows('error', rows['error'])
+
+        self.progress[key] = {'line': last_line, 'done': False}
+        self._save_checkpoint()
+
+        self.totals['lines'] += line_count
+        self.totals['inserted'] += call_inserted + error_inserted
+        self.totals['updated'] += call_updated + error_updated
+        self.totals['rejected'] += rejected
+
+        now = time.monotonic()
+        if now - self.last_report >= 5:
+            self.last_report = now
+            self.stdout.write(
+                f"{self.totals['lines']} lines, {self.totals['inserted'] + self.totals['updated']} events "
+                f"({self._rate(now - self.started)} events/s)"
+            )
+
+    def _rate(self, elapsed):
+        return int((self.totals['inserted'] + self.totals['updated']) / elapsed) if elapsed else 0
+
+    def _load_checkpoint(self):
+        try:
+            with open(self.checkpoint_path) as checkpoint:
+                return json.load(checkpoint)
+        except FileNotFoundError:
+            return {}
+
+    def _save_checkpoint(self):
+        temp_path = f"{self.checkpoint_path}.tmp"
+        with open(temp_path, 'w') as checkpoint:
+            json.dump(self.progress, checkpoint)
+        os.replace(temp_path, self.checkpoint_path)
+
+
+def _batches(numbered_lines, size):
+    """Group (line_number, line) pairs into (last_line_number, [lines]) batches."""
+    lines = []
+    last_line = 0
+    for last_line, line in numbered_lines:
+        lines.append(line)
+        if len(lines) == size:
+            yield last_line, lines
+            lines = []
+    if lines:
+        yield last_line, lines
@@ -0,0 +1,119 @@
+"""
+Benchmark API response rendering and compression.
+
+Renders a 1000-row call event list and a large conference trace with the stock DRF
+JSONRenderer and with ORJSONRenderer, and reports encoded sizes with gzip and brotli.
+Uses unsaved model instances, so no database is needed.
+"""
+import gzip
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from events.models import CallEvent
+from events.serializers import CallEventSerializer
+from events.utilities.call_trace import format_call_event
+from voiceops.middleware import brotli
+from voiceops.renderers import ORJSONRenderer
+
+
+class Command(BaseCommand):
+    help = "Compare JSONRenderer and ORJSONRenderer on a list and a large conference trace"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000)
+        parser.add_argument('--trace-events', type=int, default=5000)
+        parser.add_argument('--repeat', type=int, default=10)
+
+    def handle(self, *args, **options):
+        list_data = CallEventSerializer(_build_events(options['rows']), many=True).data
+        trace_data = {
+            'header': {'conference_sid': 'CF00000000000000000000000000000000'},
+            'events': [format_call_event(event) for event in _build_events(options['trace_events'])]
+        }
+
+        for name, data in ((f"{options['rows']}-row list", list_data),
+                           (f"{options['trace_events']}-event conference trace", trace_data)):
+            self.stdout.write(name)
+            for renderer in (JSONRenderer(), ORJSONRenderer()):
+                seconds, body = _time_render(renderer, data, options['repeat'])
+                self.stdout.write(
+                    f"  {type(renderer).__name__:<16}{seconds * 1000:>10.2f} ms{len(body):>12} bytes"
+                )
+
+            body = ORJSONRenderer().render(data)
+            start = time.perf_counter()
+            gzipped = gzip.compress(body, compresslevel=6)
+            gzip_ms = (time.perf_counter() - start) * 1000
+            self.stdout.write(f"  {'gzip':<16}{gzip_ms:>10.2f} ms{len(gzipped):>12} bytes")
+            if brotli is not None:
+                start = time.perf_counter()
+                brotlied = brotli.compress(body, quality=4)
+                brotli_ms = (time.perf_counter() - start) * 1000
+                self.stdout.write(f"  {'brotli q4':<16}{brotli_ms:>10.2f} ms{len(brotlied):>12} bytes")
+
+
+def _time_render(renderer, data, repeat):
+    best = None
+    body = b''
+    for _ in range(repeat):
+        start = time.perf_counter()
+        body = renderer.render(data)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, body
+
+
+def _build_events(count):
+    """Unsaved conference participant events with realistic request payloads."""
+    start = timezone.now()
+    events = []
+    for index in range(count):
+        call_sid = f"CA{index % 50:032d}"
+        timestamp = start + timedelta(milliseconds=index * 250)
+        events.append(CallEvent(
+            event_id=f"EV{index:032d}",
+            account_sid='AC00000000000000000000000000000000',
+            call_sid=call_sid,
+            conference_sid='CF00000000000000000000000000000000',
+            event_type='com.twilio.voice.status-callback.conference.participant.updated',
+            call_status='participant-join',
+            direction='outbound-api',
+            from_number='+15550000000',
+            to_number='+15551111111',
+            timestamp=timestamp,
+            meta_data={
+                'specversion': '1.0',
+                'type': 'com.twilio.voice.status-callback.conference.participant.updated',
+                'source': '/2010-04-01/Accounts/AC00000000000000000000000000000000/Conferences',
+                'id': f"EV{index:032d}",
+                'time': timestamp.isoformat(),
+                'data': {
+                    'eventSid': f"EV{index:032d}",
+                    'request': {
+                        'method': 'POST',
+                        'url': 'https://example.com/twilio/conference-status',
+                        'parameters': {
+                            'AccountSid': 'AC00000000000000000000000000000000',
+                            'CallSid': call_sid,
+                            'ConferenceSid': 'CF00000000000000000000000000000000',
+                            'FriendlyName': 'support-room-42',
+                            'ParticipantLabel': f"agent-{index % 50}",
+                            'StatusCallbackEvent': 'participant-join',
+                            'Muted': 'false',
+                            'Hold': 'false',
+                            'Coaching': 'false',
+                            'EndConferenceOnExit': 'false',
+                            'StartConferenceOnEnter': 'true',
+                            'SequenceNumber': str(index),
+                            'Timestamp': timestamp.strftime('%a, %d %b %Y %H:%M:%S +0000'),
+                        },
+                    },
+                    'response': {'responseCode': 200, 'contentType': 'text/html', 'body': '<Response/>'},
+                },
+            },
+        ))
+    return events
@@ -0,0 +1,69 @@
+"""
+Benchmark list and broadcast serialization.
+
+Compares the DRF ModelSerializers with the values_list()-based serializers on rows already
+stored in the database, reporting total time and per-row cost, query included.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from events.models import CallEvent, ErrorEvent
+from events.serializers import (
+    CallEventSerializer,
+    ErrorEventSerializer,
+    call_event_values,
+    error_event_values,
+)
+
+
+class Command(BaseCommand):
+    help = "Compare ModelSerializer and values-based serialization on stored events"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        repeat = options['repeat']
+
+        for model, serializer_class, values_serializer in (
+            (CallEvent, CallEventSerializer, call_event_values),
+            (ErrorEvent, ErrorEventSerializer, error_event_values),
+        ):
+            queryset = model.objects.order_by('-timestamp')[:rows]
+            count = queryset.count()
+            if not count:
+                self.stdout.write(f"{model.__name__}: no rows stored, skipping")
+                continue
+
+            self.stdout.write(f"{model.__name__} list ({count} rows)")
+            self._report('ModelSerializer', count, _best_of(
+                repeat, lambda: serializer_class(queryset.defer('meta_data'), many=True).data
+            ))
+            self._report('values_list', count, _best_of(
+                repeat, lambda: values_serializer.to_representation(values_serializer.values_list(queryset))
+            ))
+
+            instances = list(queryset.defer('meta_data'))
+            self.stdout.write(f"{model.__name__} broadcast ({count} instances, no query)")
+            self._report('ModelSerializer', count, _best_of(
+                repeat, lambda: [serializer_class(instance).data for instance in instances]
+            ))
+            self._report('values', count, _best_of(
+                repeat, lambda: [values_serializer.instance_representation(instance) for instance in instances]
+            ))
+
+    def _report(self, name, count, seconds):
+        self.stdout.write(f"  {name:<16}{seconds * 1000:>10.2f} ms{seconds * 1e6 / count:>10.2f} us/row")
+
+
+def _best_of(repeat, func):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
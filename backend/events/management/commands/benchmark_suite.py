@@ -0,0 +1,107 @@
+"""
+Run the performance benchmark suite and gate it against stored baselines.
+
+Benchmarks run on a dataset of a named size (10k, 1m or 10m events). --seed-data replaces
+all stored events with a synthetic dataset of that size first, so only use it on a
+benchmark database. Results are compared with benchmarks/baselines.json for the current
+database vendor and size; any regression makes the command fail. --update-baseline
+records the current results instead.
+"""
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from events.utilities.benchmarks import (
+    BASELINE_PATH,
+    BENCHMARK_SIZES,
+    BenchmarkError,
+    baseline_results,
+    benchmark_scenarios,
+    compare_results,
+    load_baselines,
+    measure,
+    measure_ingest,
+    save_baseline,
+    seed_dataset,
+    stored_event_count,
+)
+
+
+class Command(BaseCommand):
+    help = "Benchmark ingest, list, search, stats and trace paths against stored baselines"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', choices=list(BENCHMARK_SIZES), default='10k')
+        parser.add_argument('--seed-data', action='store_true',
+                            help="Delete all stored events and seed a synthetic dataset of --size first")
+        parser.add_argument('--seed', type=int, default=0, help="Synthetic data seed")
+        parser.add_argument('--repeat', type=int, default=20, help="Measured runs per scenario")
+        parser.add_argument('--ingest-calls', type=int, default=200,
+                            help="Call legs posted to the webhook for the ingest scenario (0 to skip)")
+        parser.add_argument('--only', nargs='+', help="Run only scenarios whose name starts with these prefixes")
+        parser.add_argument('--baseline', default=str(BASELINE_PATH))
+        parser.add_argument('--update-baseline', action='store_true',
+                            help="Record these results as the baseline instead of comparing")
+        parser.add_argument('--time-tolerance', type=float, default=0.25,
+                            help="Allowed median slowdown as a fraction of the baseline")
+        parser.add_argument('--output', help="Also write the results to this JSON file")
+
+    def handle(self, *args, **options):
+        size = options['size']
+        target = BENCHMARK_SIZES[size]
+
+        if options['seed_data']:
+            self.stdout.write(f"Seeding about {target} events...")
+            seed_dataset(target, seed=options['seed'], stdout=self.stdout, stderr=self.stderr)
+
+        event_count = stored_event_count()
+        if abs(event_count - target) > target * 0.1:
+            raise CommandError(
+                f"{event_count} events stored, expected about {target} for size {size}; "
+                f"run with --seed-data on a benchmark database"
+            )
+
+        def selected(name):
+            return not options['only'] or any(name.startswith(prefix) for prefix in options['only'])
+
+        results = {}
+        try:
+            for name, func in benchmark_scenarios():
+                if selected(name):
+                    results[name] = measure(func, options['repeat'])
+                    self._report(name, results[name])
+            if options['ingest_calls'] and selected('ingest'):
+                results['ingest.webhook'] = measure_ingest(options['ingest_calls'], seed=options['seed'] + 1)
+                self._report('ingest.webhook', results['ingest.webhook'])
+        except BenchmarkError as e:
+            raise CommandError(str(e))
+
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump({'size': size, 'events': event_count, 'results': results}, output, indent=2)
+
+        if options['update_baseline']:
+            save_baseline(results, size, event_count, options['baseline'])
+            self.stdout.write(self.style.SUCCESS(f"Baseline for {size} updated in {options['baseline']}"))
+            return
+
+        baseline = baseline_results(load_baselines(options['baseline']), size)
+        if not baseline:
+            self.stdout.write(self.style.WARNING(
+                f"No baseline for size {size} on this database; run with --update-baseline to record one"
+            ))
+            return
+
+        regressions = compare_results(results, baseline, options['time_tolerance'])
+        if regressions:
+            raise CommandError("Performance regressions:\n  " + "\n  ".join(regressions))
+        self.stdout.write(self.style.SUCCESS(f"No regressions against the {size} baseline"))
+
+    def _report(self, name, result):
+        line = (
+            f"{name:<34}{result['p50_ms']:>10.2f} ms p50{result['min_ms']:>10.2f} min"
+            f"{result['max_ms']:>10.2f} max{result['queries']:>8} queries"
+        )
+        if 'events_per_second' in result:
+            line += f"{result['events_per_second']:>10} events/s"
+        self.stdout.write(line)
@@ -0,0 +1,64 @@
+"""
+Export call or error events to a local csv, ndjson or parquet file.
+
+Uses the same server-side cursor and encoders as GET /api/<resource>/export/, writing
+chunks to the file as they are produced.
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from events.utilities.export import EXPORT_CONTENT_TYPES, EXPORT_MODELS, export_chunks, export_rows
+
+
+class Command(BaseCommand):
+    help = "Stream CallEvent or ErrorEvent rows for a time range to a file"
+
+    def add_arguments(self, parser):
+        parser.add_argument('resource', choices=list(EXPORT_MODELS))
+        parser.add_argument('output', help="Destination file path")
+        parser.add_argument('--format', dest='output_format', choices=list(EXPORT_CONTENT_TYPES), default='csv')
+        parser.add_argument('--start', help="ISO 8601 datetime (inclusive)")
+        parser.add_argument('--end', help="ISO 8601 datetime (exclusive)")
+        parser.add_argument('--account-sid')
+        parser.add_argument('--include-meta-data', action='store_true')
+
+    def handle(self, *args, **options):
+        model, values_serializer = EXPORT_MODELS[options['resource']]
+        columns, rows = export_rows(
+            model,
+            values_serializer,
+            start=_parse_datetime_option(options['start'], 'start'),
+            end=_parse_datetime_option(options['end'], 'end'),
+            account_sid=options['account_sid'],
+            include_meta_data=options['include_meta_data']
+        )
+        try:
+            chunks = export_chunks(model, columns, rows, options['output_format'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        started = time.monotonic()
+        written = 0
+        with open(options['output'], 'wb') as output:
+            for chunk in chunks:
+                output.write(chunk)
+                written += len(chunk)
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {written} bytes to {options['output']} in {elapsed:.1f}s"
+        ))
+
+
+def _parse_datetime_option(value, name):
+    if not value:
+        return None
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise CommandError(f"--{name} must be an ISO 8601 datetime")
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
@@ -0,0 +1,122 @@
+"""
+Generate seeded synthetic Twilio Event Streams traffic for scale and performance testing.
+
+Writes webhook deliveries as JSONL(.gz), one delivery (array of events) per line in
+delivery order, which replay_webhooks and backfill_events both read. With --database
+the events are normalized and upserted directly with the backfill loader instead.
+
+The same --seed and options always produce the same events.
+"""
+import gzip
+import sys
+import time
+from datetime import datetime
+
+import orjson
+from django.core.management.base import BaseCommand, CommandError
+
+from events.utilities.backfill import load_rows, normalize_events, uses_copy
+from events.utilities.synthetic_events import SyntheticTraffic
+
+
+class Command(BaseCommand):
+    help = "Generate synthetic call, conference and error events as webhook deliveries or straight to the database"
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', nargs='?',
+                            help="JSONL or JSONL.gz file for the deliveries, - for stdout (omit with --database)")
+        parser.add_argument('--database', action='store_true', help="Store events directly instead of writing a file")
+        parser.add_argument('--calls', type=int, default=10000, help="Call legs to generate")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--start', help="ISO 8601 time of the first call (default 2026-01-01T00:00:00Z)")
+        parser.add_argument('--calls-per-second', type=float, default=5.0, help="Mean call arrival rate")
+        parser.add_argument('--accounts', type=int, default=20)
+        parser.add_argument('--conference-share', type=float, default=0.2,
+                            help="Probability that a new call graph is a conference")
+        parser.add_argument('--error-rate', type=float, default=0.03, help="Probability of an error per call")
+        parser.add_argument('--duplicate-rate', type=float, default=0.01, help="Probability an event is delivered twice")
+        parser.add_argument('--max-delay', type=float, default=30.0, help="Maximum delivery delay in seconds")
+        parser.add_argument('--max-batch', type=int, default=10, help="Maximum events per delivery")
+        parser.add_argument('--batch-size', type=int, default=5000, help="Events per load batch")
+
+    def handle(self, *args, **options):
+        if options['database'] == bool(options['output']):
+            raise CommandError("Give an output file or --database, not both")
+        if options['calls_per_second'] <= 0 or options['max_batch'] < 1 or options['accounts'] < 1:
+            raise CommandError("--calls-per-second, --max-batch and --accounts must be positive")
+
+        start = None
+        if options['start']:
+            try:
+                start = datetime.fromisoformat(options['start'].replace('Z', '+00:00'))
+            except ValueError:
+                raise CommandError(f"Invalid --start: {options['start']}")
+            if start.tzinfo is None:
+                raise CommandError("--start must include a timezone, e.g. 2026-01-01T00:00:00Z")
+
+        traffic = SyntheticTraffic(
+            seed=options['seed'],
+            start=start,
+            calls_per_second=options['calls_per_second'],
+            accounts=options['accounts'],
+            conference_share=options['conference_share'],
+            error_rate=options['error_rate'],
+            duplicate_rate=options['duplicate_rate'],
+            max_delay=options['max_delay'],
+            max_batch=options['max_batch']
+        )
+        deliveries = traffic.deliveries(options['calls'])
+
+        started = time.monotonic()
+        if options['database']:
+            delivery_count, event_count = self._store(deliveries, options['batch_size'])
+        else:
+            delivery_count, event_count = self._write(deliveries, options['output'])
+        elapsed = time.monotonic() - started
+
+        self.stderr.write(self.style.SUCCESS(
+            f"Generated {event_count} events in {delivery_count} deliveries for {options['calls']} call legs "
+            f"in {elapsed:.1f}s ({int(event_count / elapsed) if elapsed else 0} events/s)"
+        ))
+        if options['database']:
+            self.stderr.write("Run rebuild_call_timings to include the generated calls in timing percentiles.")
+
+    def _write(self, deliveries, output):
+        delivery_count = event_count = 0
+        if output == '-':
+            stream = sys.stdout.buffer
+        elif output.endswith('.gz'):
+            stream = gzip.GzipFile(output, 'wb', compresslevel=6, mtime=0)
+        else:
+            stream = open(output, 'wb')
+        try:
+            for _, events in deliveries:
+                stream.write(orjson.dumps(events, option=orjson.OPT_APPEND_NEWLINE))
+                delivery_count += 1
+                event_count += len(events)
+        finally:
+            if stream is not sys.stdout.buffer:
+                stream.close()
+        return delivery_count, event_count
+
+    def _store(self, deliveries, batch_size):
+        delivery_count = event_count = 0
+        copy_format = uses_copy()
+        batch = []
+        for _, events in deliveries:
+            delivery_count += 1
+            event_count += len(events)
+            batch.extend(events)
+            if len(batch) >= batch_size:
+                self._load(batch, copy_format)
+                batch = []
+        if batch:
+            self._load(batch, copy_format)
+        return delivery_count, event_count
+
+    def _load(self, events, copy_format):
+        rows, rejected = normalize_events(events, copy_format)
+        if rejected:
+            raise CommandError(f"{rejected} generated events failed normalization")
+        load_rows('call', rows['call'])
+        load_rows('error', rows['error'])
@@ -0,0 +1,136 @@
+"""
+Load test for WebSocket broadcast fan-out.
+
+Connects many EventStreamConsumer instances in-process, publishes events through the
+ingest broadcast path and reports how many socket messages each event costs, with
+unfiltered connections versus connections filtered to a single account.
+"""
+import asyncio
+import time
+from itertools import cycle
+
+from asgiref.sync import sync_to_async
+from channels.layers import DEFAULT_CHANNEL_LAYER, InMemoryChannelLayer, channel_layers
+from channels.testing import WebsocketCommunicator
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from events.consumers import EventStreamConsumer
+from events.models import CallEvent, ErrorEvent
+from events.utilities.broadcasting import broadcast_call_event, broadcast_error_event
+
+
+CALL_STATUSES = ('initiated', 'ringing', 'in-progress', 'completed')
+
+
+class Command(BaseCommand):
+    help = "Measure WebSocket broadcast cost for unfiltered and account-filtered connections"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--connections', type=int, default=1000)
+        parser.add_argument('--events', type=int, default=200)
+        parser.add_argument('--accounts', type=int, default=20)
+        parser.add_argument(
+            '--layer', choices=('memory', 'configured'), default='memory',
+            help="Use an in-memory channel layer, or the layer from CHANNEL_LAYERS (e.g. Redis)"
+        )
+
+    def handle(self, *args, **options):
+        account_sids = [f"AC{index:032d}" for index in range(options['accounts'])]
+        events = _build_events(options['events'], account_sids)
+
+        scenarios = (
+            ('unfiltered', lambda index: ''),
+            ('account filter', lambda index: f"account_sid={account_sids[index % len(account_sids)]}"),
+            ('account + error filter', lambda index: f"account_sid={account_sids[index % len(account_sids)]}&category=error"),
+        )
+
+        self.stdout.write(
+            f"{options['connections']} connections, {len(events)} events, "
+            f"{len(account_sids)} accounts, {options['layer']} layer"
+        )
+        self.stdout.write(f"{'scenario':<24}{'publish s':>12}{'deliver s':>12}{'messages':>12}{'msgs/event':>12}")
+
+        for name, query_string in scenarios:
+            result = asyncio.run(self._run_scenario(options, events, query_string))
+            self.stdout.write(
+                f"{name:<24}{result['publish_seconds']:>12.3f}{result['deliver_seconds']:>12.3f}"
+                f"{result['messages']:>12}{result['messages'] / len(events):>12.1f}"
+            )
+
+    async def _run_scenario(self, options, events, query_string):
+        if options['layer'] == 'memory':
+            # Large capacity so the measurement is not skewed by messages dropped on full channels.
+            channel_layer = InMemoryChannelLayer(capacity=len(events) * 2)
+            channel_layers.set(DEFAULT_CHANNEL_LAYER, channel_layer)
+        else:
+            channel_layer = channel_layers[DEFAULT_CHANNEL_LAYER]
+
+        application = EventStreamConsumer.as_asgi()
+        communicators = []
+        for index in range(options['connections']):
+            path = '/ws/events/'
+            if query_string(index):
+                path = f"{path}?{query_string(index)}"
+            communicator = WebsocketCommunicator(application, path)
+            await communicator.connect()
+            communicators.append(communicator)
+
+        start = time.perf_counter()
+        for event in events:
+            if isinstance(event, ErrorEvent):
+                await sync_to_async(broadcast_error_event)(channel_layer, event)
+            else:
+                await sync_to_async(broadcast_call_event)(channel_layer, event)
+        publish_seconds = time.perf_counter() - start
+
+        # Wait until consumers stop forwarding messages to their sockets.
+        messages = -1
+        while True:
+            await asyncio.sleep(0.05)
+            delivered = sum(communicator.output_queue.qsize() for communicator in communicators)
+            if delivered == messages:
+                break
+            messages = delivered
+        deliver_seconds = time.perf_counter() - start - 0.05
+
+        for communicator in communicators:
+            await communicator.disconnect()
+
+        return {
+            'publish_seconds': publish_seconds,
+            'deliver_seconds': deliver_seconds,
+            'messages': messages,
+        }
+
+
+def _build_events(count, account_sids):
+    """Unsaved call and error events spread evenly across accounts (every fifth one is an error)."""
+    now = timezone.now()
+    events = []
+    accounts = cycle(account_sids)
+    statuses = cycle(CALL_STATUSES)
+    for index in range(count):
+        account_sid = next(accounts)
+        if index % 5 == 4:
+            events.append(ErrorEvent(
+                event_id=f"NO{index:032d}",
+                account_sid=account_sid,
+                correlation_sid=f"CA{index:032d}",
+                error_code='11200',
+                severity='ERROR',
+                timestamp=now,
+                meta_data={}
+            ))
+        else:
+            call_status = next(statuses)
+            events.append(CallEvent(
+                event_id=f"EV{index:032d}",
+                account_sid=account_sid,
+                call_sid=f"CA{index:032d}",
+                event_type=f"com.twilio.voice.status-callback.call.{call_status}",
+                call_status=call_status,
+                timestamp=now,
+                meta_data={}
+            ))
+    return events
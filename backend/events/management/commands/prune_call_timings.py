@@ -0,0 +1,25 @@
+"""
+Delete per-call timing state for calls that stopped receiving status callbacks.
+
+Ingest deletes a call's CallTiming row once every phase is known; calls that end busy,
+unanswered or failed, or whose account does not subscribe to every status, keep theirs
+until this runs. Schedule it hourly, e.g. from cron.
+"""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from events.utilities.call_timing import prune_call_timings
+
+
+class Command(BaseCommand):
+    help = "Delete CallTiming rows whose latest status callback is older than --hours"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=float, default=24,
+                            help='Keep calls with a status callback in the last N hours (default 24)')
+
+    def handle(self, *args, **options):
+        deleted = prune_call_timings(timezone.now() - timedelta(hours=options['hours']))
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} call timing rows"))
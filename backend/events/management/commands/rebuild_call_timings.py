@@ -0,0 +1,34 @@
+"""
+Rebuild call timing state and histograms from stored status callbacks.
+
+Ingest keeps the histograms current; run this once after deploying the timing tables,
+or to recompute them after changing metric definitions.
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from events.models import CallEvent, CallTiming, TimingHistogramBucket
+from events.utilities.call_timing import CALL_PHASE_FIELDS, record_call_timing
+
+
+class Command(BaseCommand):
+    help = "Recompute CallTiming rows and timing histograms from stored call events"
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            CallTiming.objects.all().delete()
+            TimingHistogramBucket.objects.all().delete()
+
+        events = CallEvent.objects.filter(
+            event_type__contains='status-callback.call',
+            call_status__in=list(CALL_PHASE_FIELDS)
+        ).only('call_sid', 'account_sid', 'event_type', 'call_status', 'timestamp').order_by('timestamp')
+
+        processed = measurements = 0
+        for call_event in events.iterator(chunk_size=2000):
+            measurements += len(record_call_timing(call_event))
+            processed += 1
+            if processed % 10000 == 0:
+                self.stdout.write(f"{processed} events processed")
+
+        self.stdout.write(self.style.SUCCESS(f"Processed {processed} events, recorded {measurements} measurements"))
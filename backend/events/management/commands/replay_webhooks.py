@@ -0,0 +1,78 @@
+"""
+Replay recorded Twilio webhook deliveries against the twilio-events endpoint for load testing.
+
+Runs in-process through the Django test client by default, or against a running server
+with --url. Prints throughput, error counts and latency percentiles for the run.
+
+The webhook's side effects run as usual (storage, broadcasts, analytics, Slack alerts
+for error events), so point it at a database and Slack configuration meant for testing.
+"""
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from events.utilities.webhook_replay import HttpSender, InProcessSender, load_deliveries, replay
+
+
+class Command(BaseCommand):
+    help = "Replay recorded webhook deliveries in-process or over HTTP and report latency percentiles"
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+',
+                            help="Delivery files (.json, .jsonl, .jsonl.gz, .form) or directories of them")
+        parser.add_argument('--url', help="Send over HTTP to this URL instead of in-process")
+        parser.add_argument('--path', default='/api/twilio-events', help="Endpoint path for in-process replay")
+        parser.add_argument('--concurrency', type=int, default=4)
+        parser.add_argument('--rate', type=float, help="Deliveries per second (default: as fast as possible)")
+        parser.add_argument('--time-compression', type=float,
+                            help="Replay recorded arrival gaps divided by this factor, e.g. 60 plays an hour in a minute")
+        parser.add_argument('--batch-size', type=int, default=0,
+                            help="Regroup JSON events into arrays of this many events (default: as recorded)")
+        parser.add_argument('--rewrite-ids', action='store_true',
+                            help="Give every event a fresh id so recordings can be replayed repeatedly")
+        parser.add_argument('--json', action='store_true', help="Print the report as JSON")
+
+    def handle(self, *args, **options):
+        if options['rate'] and options['time_compression']:
+            raise CommandError("Use either --rate or --time-compression, not both")
+        if options['concurrency'] < 1:
+            raise CommandError("--concurrency must be at least 1")
+
+        if options['url']:
+            sender_factory = lambda: HttpSender(options['url'])
+            target = options['url']
+        else:
+            sender_factory = lambda: InProcessSender(options['path'])
+            target = f"in-process {options['path']}"
+
+        deliveries = load_deliveries(
+            options['paths'], batch_size=options['batch_size'], rewrite_ids=options['rewrite_ids']
+        )
+        try:
+            stats = replay(
+                deliveries,
+                sender_factory,
+                concurrency=options['concurrency'],
+                rate=options['rate'],
+                time_compression=options['time_compression']
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        report = stats.report()
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        self.stdout.write(f"Target: {target}")
+        self.stdout.write(
+            f"Sent {report['deliveries']} deliveries ({report['events']} events) in {report['elapsed_seconds']}s: "
+            f"{report['deliveries_per_second']} deliveries/s, {report['events_per_second']} events/s"
+        )
+        self.stdout.write(f"Statuses: {report['statuses']}  Exceptions: {report['exceptions']}")
+        for label, key in (('Service latency', 'service_latency_ms'), ('Response latency', 'response_latency_ms')):
+            percentiles = '  '.join(f"{name}={value}ms" for name, value in report[key].items())
+            self.stdout.write(f"{label}: {percentiles}")
+
+        style = self.style.ERROR if report['errors'] else self.style.SUCCESS
+        self.stdout.write(style(f"Errors: {report['errors']}"))
@@ -0,0 +1,66 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:29
+
+import events.models
+from django.db import migrations
+
+
+INGEST_TABLES = ('events_callevent', 'events_errorevent')
+
+
+def create_ingest_sequences(apps, schema_editor):
+    """Create per-table Postgres sequences and number existing rows in timestamp order."""
+    connection = schema_editor.connection
+    quote_name = connection.ops.quote_name
+
+    with connection.cursor() as cursor:
+        for table in INGEST_TABLES:
+            if connection.vendor == 'postgresql':
+                sequence = f"{table}_ingest_seq"
+                cursor.execute(f"CREATE SEQUENCE IF NOT EXISTS {quote_name(sequence)}")
+                cursor.execute(
+                    f"UPDATE {quote_name(table)} AS t SET ingest_seq = numbered.seq "
+                    f"FROM (SELECT event_id, ROW_NUMBER() OVER (ORDER BY timestamp, event_id) AS seq "
+                    f"FROM {quote_name(table)}) AS numbered "
+                    f"WHERE t.event_id = numbered.event_id"
+                )
+                cursor.execute(
+                    f"SELECT setval(%s, COALESCE((SELECT MAX(ingest_seq) FROM {quote_name(table)}), 0) + 1, false)",
+                    [sequence]
+                )
+            else:
+                cursor.execute(
+                    f"UPDATE {quote_name(table)} SET ingest_seq = ("
+                    f"SELECT numbered.seq FROM (SELECT event_id, ROW_NUMBER() OVER (ORDER BY timestamp, event_id) AS seq "
+                    f"FROM {quote_name(table)}) AS numbered "
+                    f"WHERE numbered.event_id = {quote_name(table)}.event_id)"
+                )
+
+
+def drop_ingest_sequences(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql':
+        return
+    with connection.cursor() as cursor:
+        for table in INGEST_TABLES:
+            cursor.execute(f"DROP SEQUENCE IF EXISTS {connection.ops.quote_name(f'{table}_ingest_seq')}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0007_alter_callevent_options_alter_errorevent_options'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='callevent',
+            name='ingest_seq',
+            field=events.models.IngestSequenceField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='errorevent',
+            name='ingest_seq',
+            field=events.models.IngestSequenceField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.RunPython(create_ingest_sequences, drop_ingest_sequences),
+    ]
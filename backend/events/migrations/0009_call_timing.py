@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0008_callevent_ingest_seq_errorevent_ingest_seq'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CallTiming',
+            fields=[
+                ('call_sid', models.CharField(max_length=34, primary_key=True, serialize=False)),
+                ('account_sid', models.CharField(blank=True, max_length=34, null=True)),
+                ('initiated_at', models.DateTimeField(blank=True, null=True)),
+                ('ringing_at', models.DateTimeField(blank=True, null=True)),
+                ('answered_at', models.DateTimeField(blank=True, null=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('recorded_metrics', models.JSONField(default=list)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TimingHistogramBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('account_sid', models.CharField(blank=True, default='', max_length=34)),
+                ('metric', models.CharField(max_length=32)),
+                ('period_start', models.DateTimeField()),
+                ('bucket', models.IntegerField()),
+                ('count', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('metric', 'period_start', 'account_sid', 'bucket'), name='unique_timing_histogram_bucket')],
+            },
+        ),
+    ]
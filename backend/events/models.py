@@ -1,4 +1,58 @@
-from django.db import models
+from django.db import connection, models
+
+
+def next_ingest_seq_sql(table):
+    """
+    SQL and params drawing the next value of a table's Postgres ingest sequence.
+    The value is drawn only once the transaction has an id, so every value up to a reading
+    of the sequence belongs to a transaction older than any snapshot taken after it
+    (see events.utilities.ingest_watermark).
+    """
+    return "CASE WHEN pg_current_xact_id() IS NOT NULL THEN nextval(%s) END", [f"{table}_ingest_seq"]
+
+
+class NextIngestSequence(models.Func):
+    """
+    Next ingest sequence value for a table.
+    Uses the table's Postgres sequence; other backends serialize writes, so MAX + 1 is safe there.
+    """
+    output_field = models.BigIntegerField()
+
+    def __init__(self, table):
+        self.table = table
+        super().__init__()
+
+    def as_sql(self, compiler, connection, **extra_context):
+        table = connection.ops.quote_name(self.table)
+        return f"(SELECT COALESCE(MAX(ingest_seq), 0) + 1 FROM {table})", []
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        return next_ingest_seq_sql(self.table)
+
+
+class IngestSequenceField(models.BigIntegerField):
+    """
+    Monotonic per-table insertion order, assigned by the database on insert.
+    Unlike timestamp, it reflects when a row was stored, so it can be used as a sync cursor.
+    """
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('null', True)
+        kwargs.setdefault('blank', True)
+        kwargs.setdefault('editable', False)
+        kwargs.setdefault('db_index', True)
+        super().__init__(*args, **kwargs)
+
+    @property
+    def db_returning(self):
+        # Read the assigned value back from the INSERT so instances carry it without a refetch.
+        return connection.features.can_return_columns_from_insert
+
+    def pre_save(self, model_instance, add):
+        value = super().pre_save(model_instance, add)
+        if add and value is None:
+            return NextIngestSequence(model_instance._meta.db_table)
+        return value
 
 
 class CallEvent(models.Model):
@@ -22,6 +76,8 @@ class CallEvent(models.Model):
 
     meta_data = models.JSONField()
 
+    ingest_seq = IngestSequenceField()
+
     def __str__(self):
         return f"{self.call_sid or 'N/A'} - {self.call_status or 'N/A'}"
 
@@ -47,5 +103,52 @@ class ErrorEvent(models.Model):
 
     meta_data = models.JSONField()
 
+    ingest_seq = IngestSequenceField()
+
     def __str__(self):
         return f"{self.error_code} - {self.severity}"
+
+
+class CallTiming(models.Model):
+    """
+    Per-call status callback timestamps kept at ingest, so timing measurements can be
+    emitted once both ends of an interval are known, whatever order the events arrive in
+    """
+
+    call_sid = models.CharField(max_length=34, primary_key=True)
+    account_sid = models.CharField(max_length=34, null=True, blank=True)
+
+    initiated_at = models.DateTimeField(null=True, blank=True)
+    ringing_at = models.DateTimeField(null=True, blank=True)
+    answered_at = models.DateTimeField(null=True, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    recorded_metrics = models.JSONField(default=list)
+
+    def __str__(self):
+        return self.call_sid
+
+
+class TimingHistogramBucket(models.Model):
+    """
+    Count of timing measurements in one histogram bucket, per account, metric and hour.
+    Buckets use fixed boundaries (see utilities/histograms.py), so any range of rows
+    merges into one histogram by summing counts per bucket.
+    """
+
+    account_sid = models.CharField(max_length=34, blank=True, default='')
+    metric = models.CharField(max_length=32)
+    period_start = models.DateTimeField()
+    bucket = models.IntegerField()
+    count = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['metric', 'period_start', 'account_sid', 'bucket'],
+                name='unique_timing_histogram_bucket'
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.metric} {self.period_start:%Y-%m-%d %H:00} [{self.bucket}] = {self.count}"
@@ -1,3 +1,5 @@
+from django.utils import timezone
+from django.utils.functional import cached_property
 from rest_framework import serializers
 from .models import CallEvent, ErrorEvent
 
@@ -20,3 +22,65 @@ class ErrorEventSerializer(serializers.ModelSerializer):
             'error_code', 'severity', 'product',
             'error_message', 'request_sid', 'timestamp'
         ]
+
+
+class ValuesSerializer:
+    """
+    Read-only fast path with the same output as a ModelSerializer.
+    Builds dicts straight from .values_list() rows or from model instances, skipping model
+    instantiation and per-field DRF machinery. Only plain model fields are supported.
+    """
+
+    def __init__(self, serializer_class):
+        self.serializer_class = serializer_class
+
+    @cached_property
+    def field_names(self):
+        return tuple(self.serializer_class().fields)
+
+    @cached_property
+    def converted(self):
+        """(index, name) of fields whose output differs from the raw database value."""
+        fields = self.serializer_class().fields
+        return tuple(
+            (index, name) for index, (name, field) in enumerate(fields.items())
+            if isinstance(field, serializers.DateTimeField)
+        )
+
+    def values_list(self, queryset, *extra_fields):
+        """Rows for to_representation; extra_fields are appended after the serialized ones."""
+        return queryset.values_list(*self.field_names, *extra_fields)
+
+    def to_representation(self, rows):
+        """Serialize values_list() rows (extra trailing values are ignored)."""
+        field_names = self.field_names
+        converted = self.converted
+        tz = timezone.get_current_timezone()
+
+        results = []
+        for row in rows:
+            data = dict(zip(field_names, row))
+            for index, name in converted:
+                value = row[index]
+                if value is not None:
+                    data[name] = _datetime_representation(value, tz)
+            results.append(data)
+        return results
+
+    def instance_representation(self, instance):
+        """Serialize a single model instance, e.g. a freshly stored event before broadcast."""
+        return self.to_representation([tuple(getattr(instance, name) for name in self.field_names)])[0]
+
+
+def _datetime_representation(value, tz):
+    # Same output as DRF's DateTimeField with the default ISO 8601 format
+    if timezone.is_aware(value):
+        value = value.astimezone(tz)
+    value = value.isoformat()
+    if value.endswith('+00:00'):
+        value = value[:-6] + 'Z'
+    return value
+
+
+call_event_values = ValuesSerializer(CallEventSerializer)
+error_event_values = ValuesSerializer(ErrorEventSerializer)
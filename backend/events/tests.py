@@ -1,3 +1,1383 @@
-from django.test import TestCase
+import csv
+import gzip
+import importlib.util
+import json
+import os
+import random
+import tempfile
+import threading
+from collections import Counter
+from datetime import timedelta
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from channels.layers import get_channel_layer
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.db import connection, connections, transaction
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+# fakeredis runs Lua scripts with lupa
+HAS_REDIS_SCRIPTING = fakeredis is not None and importlib.util.find_spec('lupa') is not None
+
+from voiceops import middleware
+from voiceops.query_profiling import QueryBudgetExceeded, assert_query_budget
+
+from .consumers import EventStreamConsumer
+from .models import CallEvent, CallTiming, ErrorEvent
+from .serializers import CallEventSerializer, ErrorEventSerializer, call_event_values, error_event_values
+from .utilities import call_trace, export, ingest_watermark
+from .utilities.anomaly_detection import ErrorRateDetector, RateSeries, RedisDetectorState
+from .utilities.broadcasting import (
+    EVENTS_GROUP_NAME, StreamFilterError, broadcast_call_event, broadcast_error_event, filter_group_names
+)
+from .utilities.call_timing import prune_call_timings, record_call_timing, timing_histograms, timing_summary
+from .utilities.heavy_hitters import LocalHeavyHitters, RedisHeavyHitters, SpaceSaving
+from .utilities.ingest_watermark import IngestWatermark, final_version
+from .utilities.stream_buffer import LocalStreamBuffer, _is_replayable
+from .views import CallEventViewSet, ErrorEventViewSet
+
+BASE_TIME = timezone.now().replace(microsecond=0) - timedelta(hours=1)
+
+
+def make_call_event(event_id, call_sid='CA1', status='completed', seconds=0, **fields):
+    fields.setdefault('account_sid', 'AC1')
+    fields.setdefault('event_type', f'com.twilio.voice.status-callback.call.{status}')
+    fields.setdefault('meta_data', {})
+    return CallEvent.objects.create(
+        event_id=event_id, call_sid=call_sid, call_status=status,
+        timestamp=BASE_TIME + timedelta(seconds=seconds), **fields
+    )
+
+
+def make_error_event(event_id, correlation_sid='CA1', seconds=0, **fields):
+    fields.setdefault('account_sid', 'AC1')
+    fields.setdefault('error_code', '11200')
+    fields.setdefault('severity', 'error')
+    fields.setdefault('meta_data', {})
+    return ErrorEvent.objects.create(
+        event_id=event_id, correlation_sid=correlation_sid,
+        timestamp=BASE_TIME + timedelta(seconds=seconds), **fields
+    )
+
+
+class APITestCase(TestCase):
+    """TestCase with an authenticated API client."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('tester', 'tester@example.com', 'password')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+
+class QueryBudgetTests(APITestCase):
+    """List and stats endpoints stay within their @query_budget."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        for index in range(5):
+            make_call_event(f'EV{index:032d}', call_sid=f'CA{index % 2:032d}', seconds=index)
+            make_error_event(f'ER{index:032d}', correlation_sid=f'CA{index % 2:032d}', seconds=index)
+
+    def test_list_endpoints_within_budget(self):
+        for path in ('/api/call-events/', '/api/error-events/', '/api/error-events/?since=0',
+                     '/api/call-events/stats/', '/api/error-events/stats/'):
+            with self.subTest(path=path), assert_query_budget(path):
+                self.assertEqual(self.client.get(path).status_code, 200)
+
+    @override_settings(QUERY_PROFILING={'ENABLED': True, 'ENFORCE_BUDGETS': False, 'REPORT_SIZE': 10})
+    def test_view_over_budget_fails(self):
+        with mock.patch.object(ErrorEventViewSet.list, 'query_budget', 1):
+            with self.assertRaises(QueryBudgetExceeded) as raised, \
+                    self.assertLogs('voiceops.middleware', level='WARNING') as logs:
+                with assert_query_budget('/api/error-events/'):
+                    self.client.get('/api/error-events/')
+        self.assertIn('ErrorEventViewSet.list ran', str(raised.exception))
+        # Without ENFORCE_BUDGETS the profiling middleware logs the request instead of raising
+        self.assertIn('over its budget of 1', logs.output[0])
+
+    def test_view_without_budget_is_rejected(self):
+        with mock.patch.object(CallEventViewSet.list, 'query_budget', None):
+            with self.assertRaises(AssertionError):
+                with assert_query_budget('/api/call-events/'):
+                    pass
+
+
+class ScriptedWatermark(IngestWatermark):
+    """IngestWatermark reading (sequence last value, snapshot xmin, xmax) from a script instead of PostgreSQL."""
+
+    def __init__(self):
+        super().__init__()
+        self.reading = (0, 1, 1)
+
+    def _read(self, tables):
+        last_value, xmin, xmax = self.reading
+        return [last_value] * len(tables), xmin, xmax
+
+
+def scripted_watermark(test):
+    """Use a ScriptedWatermark as if the database were PostgreSQL for the rest of test."""
+    watermark = ScriptedWatermark()
+    for patcher in (
+        mock.patch.object(ingest_watermark, 'uses_watermark', return_value=True),
+        mock.patch.object(ingest_watermark, 'get_ingest_watermark', return_value=watermark),
+    ):
+        patcher.start()
+        test.addCleanup(patcher.stop)
+    return watermark
+
+
+class ConditionalRequestTests(APITestCase):
+    def get(self, path, etag=None):
+        return self.client.get(path, HTTP_IF_NONE_MATCH=etag) if etag else self.client.get(path)
+
+    def test_unchanged_list_is_not_modified(self):
+        make_error_event('ER1', ingest_seq=1)
+        etag = self.get('/api/error-events/')['ETag']
+        self.assertEqual(self.get('/api/error-events/', etag).status_code, 304)
+        make_error_event('ER2', ingest_seq=2)
+        self.assertEqual(self.get('/api/error-events/', etag).status_code, 200)
+
+    def test_late_commit_below_max_changes_etag(self):
+        watermark = scripted_watermark(self)
+        make_error_event('ER1', ingest_seq=1)
+        make_error_event('ER3', ingest_seq=3)
+        # Sequence at 3; the transaction that drew 2 (xid 10) is still running
+        watermark.reading = (3, 10, 11)
+        response = self.get('/api/error-events/')
+        etag = response['ETag']
+        self.assertEqual(self.get('/api/error-events/', etag).status_code, 304)
+
+        # 2 commits late, below the MAX a plain MAX(ingest_seq) validator would still match
+        make_error_event('ER2', ingest_seq=2)
+        watermark.reading = (3, 12, 12)
+        response = self.get('/api/error-events/', etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('ER2', {row['event_id'] for row in response.json()['results']})
+
+        # The MAX is final now, so the validator stays put until the next write
+        self.assertEqual(self.get('/api/error-events/', response['ETag']).status_code, 304)
+
+    def test_final_version_reads_watermark_only_above_known_safe(self):
+        watermark = scripted_watermark(self)
+        watermark.reading = (5, 7, 7)
+        self.assertEqual(final_version((ErrorEvent, 5)), '5')
+        watermark.reading = (8, 9, 10)
+        with mock.patch.object(watermark, '_read', wraps=watermark._read) as read:
+            self.assertEqual(final_version((ErrorEvent, 4)), '4')
+            self.assertEqual(final_version((ErrorEvent, 8), (CallEvent, None)), '8~5.0')
+        self.assertEqual(read.call_count, 1)
+
+    def test_trace_versions_cover_both_tables(self):
+        make_call_event('EV1', call_sid='CA1')
+        etag = self.get('/api/call-events/call-trace/CA1/')['ETag']
+        self.assertEqual(self.get('/api/call-events/call-trace/CA1/', etag).status_code, 304)
+        make_error_event('ER1', correlation_sid='CA1')
+        self.assertEqual(self.get('/api/call-events/call-trace/CA1/', etag).status_code, 200)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'needs concurrent PostgreSQL transactions')
+class LateCommitPostgresTests(TransactionTestCase):
+    """A row committing after a higher ingest_seq is visible still reaches delta sync and ETag clients."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('tester'))
+
+    def test_late_commit(self):
+        make_error_event('ER0')
+        etag = self.client.get('/api/error-events/')['ETag']
+        cursor = self.client.get('/api/error-events/?since=0').json()['next_cursor']
+
+        inserted, release, done = threading.Event(), threading.Event(), threading.Event()
+
+        def slow_writer():
+            try:
+                with transaction.atomic():
+                    make_error_event('ER-late')
+                    inserted.set()
+                    release.wait(10)
+            finally:
+                connections.close_all()
+                done.set()
+
+        threading.Thread(target=slow_writer).start()
+        inserted.wait(10)
+        make_error_event('ER-fast')
+
+        # ER-fast is visible but has the higher ingest_seq; nothing is handed out past ER-late
+        delta = self.client.get(f'/api/error-events/?since={cursor}').json()
+        self.assertEqual(delta['results'], [])
+        held_etag = self.client.get('/api/error-events/')['ETag']
+        self.assertNotEqual(held_etag, etag)
+
+        release.set()
+        done.wait(10)
+        delta = self.client.get(f'/api/error-events/?since={cursor}').json()
+        self.assertEqual([row['event_id'] for row in delta['results']], ['ER-late', 'ER-fast'])
+        self.assertEqual(self.client.get('/api/error-events/', HTTP_IF_NONE_MATCH=held_etag).status_code, 200)
+
+
+class DeltaSyncTests(APITestCase):
+    def delta(self, query, path='/api/error-events/'):
+        response = self.client.get(f'{path}?{query}')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def event_ids(self, data):
+        return [row['event_id'] for row in data['results']]
+
+    def test_returns_rows_after_cursor_in_ingest_order(self):
+        first = make_error_event('ER1', seconds=30)
+        make_error_event('ER2', seconds=10)
+        make_error_event('ER3', seconds=20)
+
+        data = self.delta(f'since={first.ingest_seq}')
+        self.assertEqual(self.event_ids(data), ['ER2', 'ER3'])
+        self.assertFalse(data['has_more'])
+        self.assertEqual(self.delta(f"since={data['next_cursor']}")['results'], [])
+
+    def test_cursor_never_moves_backwards(self):
+        make_error_event('ER1')
+        data = self.delta('since=1000')
+        self.assertEqual(data['results'], [])
+        self.assertEqual(data['next_cursor'], '1000')
+
+    def test_limit_pages_and_is_clamped(self):
+        for index in range(5):
+            make_error_event(f'ER{index}')
+        with mock.patch.object(ErrorEventViewSet, 'MAX_DELTA_RESULTS', 3):
+            data = self.delta('since=0&limit=100')
+            self.assertEqual(self.event_ids(data), ['ER0', 'ER1', 'ER2'])
+            self.assertTrue(data['has_more'])
+            data = self.delta(f"since={data['next_cursor']}&limit=0")
+            self.assertEqual(self.event_ids(data), ['ER3'])
+            self.assertTrue(data['has_more'])
+            data = self.delta(f"since={data['next_cursor']}")
+            self.assertEqual(self.event_ids(data), ['ER4'])
+            self.assertFalse(data['has_more'])
+
+    def test_search_applies_to_deltas(self):
+        make_error_event('ER1', error_code='11200')
+        make_error_event('ER2', error_code='13227')
+        self.assertEqual(self.event_ids(self.delta('since=0&search=13227')), ['ER2'])
+        self.assertEqual(self.event_ids(self.delta('since=0&search=13227&ordering=-timestamp')), ['ER2'])
+
+    def test_cursor_is_capped_at_watermark(self):
+        watermark = scripted_watermark(self)
+        for seq in (1, 2, 3):
+            make_error_event(f'ER{seq}', ingest_seq=seq)
+        # 1 and 2 are final; the transaction that drew 3 was still running
+        watermark.record('events_errorevent', 2, 5, 5)
+        watermark.reading = (3, 6, 7)
+
+        data = self.delta('since=0')
+        self.assertEqual(self.event_ids(data), ['ER1', 'ER2'])
+        self.assertEqual(data['next_cursor'], '2')
+
+        watermark.reading = (3, 8, 8)
+        data = self.delta('since=2')
+        self.assertEqual(self.event_ids(data), ['ER3'])
+        self.assertEqual(data['next_cursor'], '3')
+
+    def test_cursor_advances_to_watermark_past_filtered_rows(self):
+        watermark = scripted_watermark(self)
+        for seq in (1, 2):
+            make_error_event(f'ER{seq}', ingest_seq=seq, error_code='11200')
+        watermark.reading = (2, 3, 3)
+        data = self.delta('since=0&search=13227')
+        self.assertEqual(data['results'], [])
+        self.assertEqual(data['next_cursor'], '2')
+
+    def test_upserted_row_reappears_with_new_seq(self):
+        from .utilities.backfill import ERROR_EVENT_COLUMNS, _copy_line, load_rows, uses_copy
+
+        event = make_error_event('ER1', error_message='first')
+        make_error_event('ER2')
+        cursor = self.delta('since=0')['next_cursor']
+
+        row = dict.fromkeys(ERROR_EVENT_COLUMNS)
+        row.update(event_id='ER1', account_sid='AC1', severity='error', timestamp=event.timestamp,
+                   error_message='second', meta_data={})
+        row = tuple(row.values())
+        self.assertEqual(load_rows('error', [_copy_line(row) if uses_copy() else row]), (0, 1))
+
+        data = self.delta(f'since={cursor}')
+        self.assertEqual(self.event_ids(data), ['ER1'])
+        self.assertGreater(int(data['next_cursor']), int(cursor))
+        self.assertEqual(data['results'][0]['error_message'], 'second')
+
+    def test_invalid_cursor(self):
+        for query in ('since=abc', 'since=1&limit=x'):
+            response = self.client.get(f'/api/error-events/?{query}')
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('error', response.json())
+
+
+class IngestWatermarkTests(TestCase):
+    def test_observation_is_safe_once_its_transactions_end(self):
+        watermark = IngestWatermark()
+        # Sequence at 10 while xids up to 19 may have drawn values; xid 15 still running
+        self.assertEqual(watermark.record('t', 10, 15, 20), 0)
+        self.assertEqual(watermark.record('t', 12, 15, 21), 0)
+        # Everything before xid 21 has ended
+        self.assertEqual(watermark.record('t', 14, 21, 23), 12)
+        self.assertEqual(watermark.known('t'), 12)
+        # Nothing running: the current observation is safe immediately
+        self.assertEqual(watermark.record('t', 15, 24, 24), 15)
+
+    def test_not_used_on_other_backends(self):
+        with mock.patch.object(ingest_watermark, 'uses_watermark', return_value=False):
+            self.assertIsNone(ingest_watermark.safe_ingest_seq(ErrorEvent))
+
+
+class CallListDedupTests(APITestCase):
+    """The call list shows one event per call: its completed event, else its latest, ties broken by event_id."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        # CA1: completed, then a later non-completed event
+        make_call_event('EV1a', call_sid='CA1', status='initiated', seconds=0)
+        make_call_event('EV1b', call_sid='CA1', status='completed', seconds=10)
+        make_call_event('EV1c', call_sid='CA1', status='ringing', seconds=20)
+        # CA2: no completed event; two latest events share a timestamp
+        make_call_event('EV2a', call_sid='CA2', status='initiated', seconds=5)
+        make_call_event('EV2c', call_sid='CA2', status='ringing', seconds=15)
+        make_call_event('EV2b', call_sid='CA2', status='in-progress', seconds=15)
+        # CA3: two completed events; the later one wins
+        make_call_event('EV3a', call_sid='CA3', status='completed', seconds=1)
+        make_call_event('EV3b', call_sid='CA3', status='completed', seconds=2)
+        # Events without a call_sid are never listed
+        make_call_event('EV4', call_sid='', status='completed', seconds=30)
+
+    def list_ids(self, query=''):
+        response = self.client.get(f'/api/call-events/?{query}')
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        rows = data['results'] if isinstance(data, dict) else data
+        return [row['event_id'] for row in rows], data
+
+    def test_one_event_per_call(self):
+        event_ids, data = self.list_ids()
+        self.assertEqual(event_ids, ['EV2c', 'EV1b', 'EV3b'])
+        self.assertEqual(data['count'], 3)
+
+    def test_ordering_applies_to_deduplicated_rows(self):
+        self.assertEqual(self.list_ids('ordering=timestamp')[0], ['EV3b', 'EV1b', 'EV2c'])
+
+    def test_pagination_applies_to_deduplicated_rows(self):
+        with mock.patch.object(CallEventViewSet.pagination_class, 'page_size', 2):
+            first_page, data = self.list_ids()
+            self.assertEqual(data['count'], 3)
+            self.assertEqual(first_page, ['EV2c', 'EV1b'])
+            self.assertEqual(self.list_ids('page=2')[0], ['EV3b'])
+
+    def test_no_pagination_limit_applies_after_dedup(self):
+        with mock.patch.object(CallEventViewSet, 'MAX_NO_PAGINATION_RESULTS', 2):
+            self.assertEqual(self.list_ids('no_pagination=true')[0], ['EV2c', 'EV1b'])
+
+    def test_search_returns_every_event(self):
+        event_ids, _ = self.list_ids('search=CA1')
+        self.assertEqual(sorted(event_ids), ['EV1a', 'EV1b', 'EV1c'])
+
+
+class ValuesSerializerTests(TestCase):
+    """The values_list fast path renders exactly what the ModelSerializers render."""
+
+    @classmethod
+    def setUpTestData(cls):
+        make_call_event('EV1', call_sid='CA1', direction='outbound-api', from_number='+15550001',
+                        to_number='sip:agent@example.com;transport=tls', conference_sid=None)
+        CallEvent.objects.create(
+            event_id='EV2', call_sid='CA2', event_type='com.twilio.voice.status-callback.call.ringing',
+            timestamp=BASE_TIME.replace(microsecond=123456), meta_data={'nested': {'a': [1, 2]}}
+        )
+        make_error_event('ER1', error_message='Caf\u00e9 "quoted"\nline', product='Programmable Voice')
+        make_error_event('ER2', correlation_sid=None, account_sid=None, severity='warning')
+
+    def assert_same_output(self, model, serializer_class, values_serializer):
+        queryset = model.objects.order_by('event_id')
+        expected = [serializer_class(instance).data for instance in queryset]
+        from_rows = values_serializer.to_representation(values_serializer.values_list(queryset, 'ingest_seq'))
+        from_instances = [values_serializer.instance_representation(instance) for instance in queryset]
+
+        self.assertEqual(from_rows, [dict(data) for data in expected])
+        self.assertEqual(from_instances, [dict(data) for data in expected])
+        renderer = JSONRenderer()
+        self.assertEqual(renderer.render(from_rows), renderer.render(expected))
+
+    def test_call_events(self):
+        self.assert_same_output(CallEvent, CallEventSerializer, call_event_values)
+
+    def test_error_events(self):
+        self.assert_same_output(ErrorEvent, ErrorEventSerializer, error_event_values)
+
+    @override_settings(TIME_ZONE='Asia/Kolkata')
+    def test_datetimes_in_non_utc_time_zone(self):
+        self.assert_same_output(CallEvent, CallEventSerializer, call_event_values)
+        self.assert_same_output(ErrorEvent, ErrorEventSerializer, error_event_values)
+
+    def test_list_endpoint_output(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user('values'))
+        response = client.get('/api/error-events/?ordering=timestamp')
+        expected = ErrorEventSerializer(ErrorEvent.objects.order_by('timestamp', 'event_id'), many=True).data
+        self.assertEqual(sorted(response.json()['results'], key=lambda row: row['event_id']),
+                         sorted((dict(row) for row in expected), key=lambda row: row['event_id']))
+
+
+class BackfillTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        from .utilities.synthetic_events import SyntheticTraffic
+
+        cls.events = [event for _, events in SyntheticTraffic(seed=40).deliveries(6) for event in events]
+
+    def write_archive(self, lines):
+        handle, path = tempfile.mkstemp(suffix='.jsonl')
+        with os.fdopen(handle, 'w') as archive:
+            archive.writelines(f"{line}\n" for line in lines)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def checkpoint_path(self):
+        path = os.path.join(tempfile.mkdtemp(), 'checkpoint.json')
+        self.addCleanup(lambda: os.path.exists(path) and os.remove(path))
+        return path
+
+    def backfill(self, path, checkpoint, **options):
+        call_command('backfill_events', path, workers=0, checkpoint=checkpoint, stdout=open(os.devnull, 'w'), **options)
+
+    def event_ids(self, events):
+        from .utilities.backfill import normalize_events
+
+        rows, _ = normalize_events(events, copy_format=False)
+        return {row[0] for row in rows['call'] + rows['error']}
+
+    def stored_ids(self):
+        return set(CallEvent.objects.values_list('event_id', flat=True)) | set(ErrorEvent.objects.values_list('event_id', flat=True))
+
+    def test_copy_line_escaping(self):
+        from .utilities.backfill import _copy_line
+
+        line = _copy_line(('a\tb', 'line\nbreak\r', 'back\\slash', None, {'k': 'v\t'}, BASE_TIME, 7))
+        self.assertEqual(line, '\t'.join([
+            'a\\tb', 'line\\nbreak\\r', 'back\\\\slash', '\\N',
+            '{"k": "v\\\\t"}', BASE_TIME.isoformat(), '7'
+        ]) + '\n')
+        self.assertEqual(line.count('\t'), 6)
+        self.assertEqual(line.count('\n'), 1)
+
+    def test_normalize_counts_rejected_lines(self):
+        from .utilities.backfill import normalize_lines
+
+        event = self.events[0]
+        lines = [
+            json.dumps(event),
+            'not json',
+            json.dumps({'type': 'com.twilio.unknown', 'data': {}}),
+            json.dumps({**event, 'data': {**event['data'], 'eventSid': ''}}),
+            json.dumps([event, {'type': event['type']}]),
+        ]
+        rows, rejected = normalize_lines(lines, copy_format=False)
+        self.assertEqual(len(rows['call']) + len(rows['error']), 2)
+        self.assertEqual(rejected, 4)
+
+    def test_upsert_keeps_row_and_assigns_new_seq(self):
+        from .utilities.backfill import normalize_events, load_rows, uses_copy
+
+        rows, _ = normalize_events(self.events, uses_copy())
+        inserted, updated = load_rows('call', rows['call'])
+        self.assertEqual(updated, 0)
+        before = dict(CallEvent.objects.values_list('event_id', 'ingest_seq'))
+        self.assertEqual(len(before), inserted)
+
+        self.assertEqual(load_rows('call', rows['call']), (0, inserted))
+        after = dict(CallEvent.objects.values_list('event_id', 'ingest_seq'))
+        self.assertEqual(after.keys(), before.keys())
+        self.assertGreater(min(after.values()), max(before.values()))
+
+    def test_commits_in_batches(self):
+        from .utilities import backfill
+
+        rows, _ = backfill.normalize_events(self.events, backfill.uses_copy())
+        upsert = '_copy_upsert' if backfill.uses_copy() else '_bulk_upsert'
+        with mock.patch.object(backfill, 'COMMIT_BATCH_SIZE', 4), \
+                mock.patch.object(backfill, upsert, wraps=getattr(backfill, upsert)) as batch_upsert:
+            backfill.load_rows('call', rows['call'])
+        self.assertEqual(batch_upsert.call_count, -(-len(rows['call']) // 4))
+
+    def test_resumes_from_checkpoint(self):
+        lines = [json.dumps(event) for event in self.events]
+        path = self.write_archive(lines)
+        checkpoint = self.checkpoint_path()
+
+        # Interrupted after the first batch of 4 lines was committed
+        from events.management.commands import backfill_events
+
+        load_rows = backfill_events.load_rows
+        calls = []
+
+        def failing_load_rows(category, rows):
+            calls.append(category)
+            if len(calls) > 2:
+                raise RuntimeError('connection lost')
+            return load_rows(category, rows)
+
+        with mock.patch.object(backfill_events, 'load_rows', failing_load_rows):
+            with self.assertRaises(RuntimeError):
+                self.backfill(path, checkpoint, batch_size=4)
+        with open(checkpoint) as progress:
+            self.assertEqual(json.load(progress)[os.path.abspath(path)], {'line': 4, 'done': False})
+        self.assertEqual(self.stored_ids(), self.event_ids(self.events[:4]))
+
+        with mock.patch.object(backfill_events, 'load_rows', wraps=load_rows) as resumed:
+            self.backfill(path, checkpoint, batch_size=4)
+        loaded = sum(len(call.args[1]) for call in resumed.call_args_list)
+        self.assertEqual(loaded, len(lines) - 4)
+        self.assertEqual(self.stored_ids(), self.event_ids(self.events))
+
+        # A finished file is skipped
+        with mock.patch.object(backfill_events, 'load_rows') as skipped:
+            self.backfill(path, checkpoint, batch_size=4)
+        skipped.assert_not_called()
+
+
+def unsaved_call_event(event_id, call_sid='CA1', status='completed', **fields):
+    fields.setdefault('account_sid', 'AC1')
+    fields.setdefault('event_type', f'com.twilio.voice.status-callback.call.{status}')
+    fields.setdefault('meta_data', {})
+    fields.setdefault('timestamp', BASE_TIME)
+    return CallEvent(event_id=event_id, call_sid=call_sid, call_status=status, **fields)
+
+
+def unsaved_error_event(event_id, correlation_sid='CA1', severity='error', **fields):
+    fields.setdefault('account_sid', 'AC1')
+    fields.setdefault('error_code', '11200')
+    fields.setdefault('meta_data', {})
+    fields.setdefault('timestamp', BASE_TIME)
+    return ErrorEvent(event_id=event_id, correlation_sid=correlation_sid, severity=severity, **fields)
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class EventStreamTestCase(SimpleTestCase):
+    """Runs EventStreamConsumer on the in-memory channel layer with an in-process replay buffer."""
+
+    def setUp(self):
+        self.stream_buffer = LocalStreamBuffer(100)
+        for target in ('events.utilities.broadcasting.get_stream_buffer', 'events.consumers.get_stream_buffer'):
+            patcher = mock.patch(target, return_value=self.stream_buffer)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        async_to_sync(get_channel_layer().flush)()
+
+    async def connect(self, query=''):
+        communicator = WebsocketCommunicator(EventStreamConsumer.as_asgi(), f'/ws/events/?{query}')
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator
+
+    async def broadcast(self, *events):
+        for event in events:
+            broadcast = broadcast_call_event if isinstance(event, CallEvent) else broadcast_error_event
+            await sync_to_async(broadcast)(get_channel_layer(), event)
+
+    async def receive_all(self, communicator):
+        messages = []
+        while not await communicator.receive_nothing(timeout=0.05):
+            messages.append(await communicator.receive_json_from())
+        return messages
+
+
+class StreamRoutingTests(EventStreamTestCase):
+    def test_filter_group_names(self):
+        self.assertEqual(filter_group_names({}), [EVENTS_GROUP_NAME])
+        self.assertEqual(
+            filter_group_names({'category': ['call'], 'account_sid': ['AC1'], 'status': ['busy', 'failed']}),
+            ['stream.call.AC1.busy', 'stream.call.AC1.failed']
+        )
+        # Without a category, status only constrains call events
+        self.assertEqual(filter_group_names({'status': ['busy']}), ['stream.call.all.busy', 'stream.error.all.all'])
+
+    def test_filter_group_names_rejects_filters_it_cannot_apply(self):
+        for filters in (
+            {'category': ['error'], 'status': ['busy']},
+            {'category': ['call'], 'severity': ['error']},
+            {'category': ['sms']},
+            {'account_sid': ['not a sid']},
+            {'status': ['Busy!']},
+            {'account_sid': [f'AC{index}' for index in range(101)]},
+        ):
+            with self.subTest(filters=filters), self.assertRaises(StreamFilterError):
+                filter_group_names(filters)
+
+    async def test_filters_route_events(self):
+        everything = await self.connect()
+        errors = await self.connect('category=error&severity=warning')
+        account_calls = await self.connect('account_sid=AC2&category=call')
+
+        await self.broadcast(
+            unsaved_call_event('EV1', account_sid='AC1'),
+            unsaved_call_event('EV2', account_sid='AC2', status='busy'),
+            unsaved_error_event('ER1', severity='error'),
+            unsaved_error_event('ER2', severity='warning'),
+        )
+
+        def event_ids(messages):
+            return [message['data']['event_id'] for message in messages]
+
+        self.assertEqual(event_ids(await self.receive_all(everything)), ['EV1', 'EV2', 'ER1', 'ER2'])
+        self.assertEqual(event_ids(await self.receive_all(errors)), ['ER2'])
+        self.assertEqual(event_ids(await self.receive_all(account_calls)), ['EV2'])
+        for communicator in (everything, errors, account_calls):
+            await communicator.disconnect()
+
+    async def test_invalid_filters_close_on_connect(self):
+        communicator = WebsocketCommunicator(EventStreamConsumer.as_asgi(), '/ws/events/?category=error&status=busy')
+        connected, close_code = await communicator.connect()
+        self.assertFalse(connected)
+        self.assertEqual(close_code, 4400)
+
+    async def test_set_filters(self):
+        communicator = await self.connect('category=call')
+
+        await communicator.send_json_to({'action': 'set_filters', 'category': ['error'], 'status': ['busy']})
+        self.assertEqual(await communicator.receive_json_from(), {
+            'type': 'error', 'message': 'A status filter requires the call category'
+        })
+
+        await communicator.send_json_to({'action': 'set_filters', 'category': 'error', 'severity': 'warning'})
+        self.assertEqual(await communicator.receive_json_from(), {
+            'type': 'filters_set', 'filters': {'category': ['error'], 'severity': ['warning']}
+        })
+
+        await self.broadcast(unsaved_call_event('EV1'), unsaved_error_event('ER1', severity='warning'))
+        self.assertEqual([message['data']['event_id'] for message in await self.receive_all(communicator)], ['ER1'])
+        await communicator.disconnect()
+
+    async def test_trace_subscription(self):
+        communicator = await self.connect('category=error')
+        await communicator.send_json_to({'action': 'subscribe', 'call_sid': 'CA2'})
+        self.assertEqual(await communicator.receive_json_from(), {'type': 'subscribed', 'topic': 'call_sid', 'sid': 'CA2'})
+
+        await self.broadcast(unsaved_call_event('EV1', call_sid='CA1'), unsaved_call_event('EV2', call_sid='CA2'))
+        messages = await self.receive_all(communicator)
+        self.assertEqual([(message['type'], message['sid']) for message in messages], [('trace_event', 'CA2')])
+
+        await communicator.send_json_to({'action': 'unsubscribe', 'call_sid': 'CA2'})
+        self.assertEqual((await communicator.receive_json_from())['type'], 'unsubscribed')
+        await self.broadcast(unsaved_call_event('EV3', call_sid='CA2'))
+        self.assertEqual(await self.receive_all(communicator), [])
+        await communicator.disconnect()
+
+    async def test_broadcast_sends_every_group_in_one_call(self):
+        channel_layer = get_channel_layer()
+        sent = []
+
+        async def group_send(group_name, message):
+            sent.append((group_name, message['type']))
+
+        with mock.patch.object(channel_layer, 'group_send', group_send), \
+                mock.patch('events.utilities.broadcasting.async_to_sync', wraps=async_to_sync) as bridge:
+            await self.broadcast(unsaved_call_event('EV1', call_sid='CA1', conference_sid='CF1'))
+
+        self.assertEqual(bridge.call_count, 1)
+        self.assertCountEqual(sent, [
+            ('twilio_events', 'event_message'),
+            ('stream.call.all.all', 'event_message'),
+            ('stream.call.all.completed', 'event_message'),
+            ('stream.call.AC1.all', 'event_message'),
+            ('stream.call.AC1.completed', 'event_message'),
+            ('trace.call_sid.CA1', 'trace_message'),
+            ('trace.conference_sid.CF1', 'trace_message'),
+        ])
+
+
+class StreamReplayTests(EventStreamTestCase):
+    def test_is_replayable_contiguous(self):
+        bounds = ('3-0', '10-0')
+        self.assertTrue(_is_replayable((2, 0), bounds, contiguous=True))
+        self.assertTrue(_is_replayable((10, 0), bounds, contiguous=True))
+        # Entry 2 was trimmed
+        self.assertFalse(_is_replayable((1, 0), bounds, contiguous=True))
+        # Newer than anything buffered: the buffer was reset
+        self.assertFalse(_is_replayable((11, 0), bounds, contiguous=True))
+
+    def test_is_replayable_stream_ids(self):
+        bounds = ('1000-0', '2000-5')
+        # Redis stream ids have gaps, so the last seen entry itself must still be buffered
+        self.assertTrue(_is_replayable((1000, 0), bounds, contiguous=False))
+        self.assertFalse(_is_replayable((999, 9), bounds, contiguous=False))
+        self.assertTrue(_is_replayable((2000, 5), bounds, contiguous=False))
+        self.assertFalse(_is_replayable((2000, 6), bounds, contiguous=False))
+
+    def test_is_replayable_empty_buffer(self):
+        self.assertTrue(_is_replayable((0, 0), None, contiguous=True))
+        self.assertFalse(_is_replayable((5, 0), None, contiguous=False))
+
+    def test_since_limit_and_malformed_cursor(self):
+        stream_buffer = LocalStreamBuffer(3)
+        cursors = [stream_buffer.append(['twilio_events'], {'index': index}) for index in range(5)]
+        self.assertEqual([entry[2]['index'] for entry in stream_buffer.since(cursors[2], 5)], [3, 4])
+        self.assertIsNone(stream_buffer.since(cursors[0], 5))
+        self.assertIsNone(stream_buffer.since(cursors[2], 1))
+        self.assertIsNone(stream_buffer.since('not-a-cursor', 5))
+
+    async def test_replay_then_skip_live_duplicates(self):
+        await self.broadcast(*(unsaved_call_event(f'EV{index}') for index in range(1, 4)))
+        cursors = [entry[0] for entry in self.stream_buffer.since('0-0', 10)]
+
+        communicator = await self.connect(f'category=call&last_seen={cursors[0]}')
+        replayed = [await communicator.receive_json_from() for _ in range(3)]
+        self.assertEqual([message['data']['event_id'] for message in replayed[:2]], ['EV2', 'EV3'])
+        self.assertEqual([message['cursor'] for message in replayed[:2]], cursors[1:])
+        self.assertEqual(replayed[2], {'type': 'replay_complete', 'count': 2})
+
+        # EV3 was published while the connection replayed it: the live copy is dropped
+        _, groups, message = self.stream_buffer.since(cursors[1], 10)[0]
+        for group_name in groups:
+            await get_channel_layer().group_send(group_name, {**message, 'cursor': cursors[2]})
+        await self.broadcast(unsaved_call_event('EV4'))
+        self.assertEqual([message['data']['event_id'] for message in await self.receive_all(communicator)], ['EV4'])
+        await communicator.disconnect()
+
+    async def test_unreplayable_gap_requires_resync(self):
+        await self.broadcast(unsaved_call_event('EV1'))
+        communicator = await self.connect('last_seen=999-0')
+        self.assertEqual(await communicator.receive_json_from(), {'type': 'resync_required', 'last_seen': '999-0'})
+        await communicator.disconnect()
+
+
+class FailingSendConsumer(EventStreamConsumer):
+    async def send(self, text_data=None, bytes_data=None, close=False):
+        if text_data and '"call_event"' in text_data:
+            raise RuntimeError('send failed')
+        await super().send(text_data=text_data, bytes_data=bytes_data, close=close)
+
+
+@override_settings(EVENT_STREAM_BACKPRESSURE={'QUEUE_SIZE': 2, 'POLICY': 'coalesce'})
+class BackpressureTests(EventStreamTestCase):
+    """A client acknowledging nothing holds one message in flight (ack_window=1) while five events arrive."""
+
+    async def stalled_connection(self, query=''):
+        communicator = await self.connect(f'ack_window=1&{query}')
+        await self.broadcast(*(unsaved_call_event(f'EV{index}') for index in range(1, 6)))
+        first = await communicator.receive_json_from()
+        self.assertEqual(first['data']['event_id'], 'EV1')
+        # Let the consumer handle every event before acknowledging
+        self.assertTrue(await communicator.receive_nothing(timeout=0.1))
+        return communicator
+
+    async def acknowledge_all(self, communicator, count):
+        messages = []
+        for received in range(1, count + 1):
+            await communicator.send_json_to({'action': 'ack', 'received': received})
+            messages.append(await communicator.receive_json_from())
+        self.assertTrue(await communicator.receive_nothing(timeout=0.05))
+        return messages
+
+    async def stats(self, communicator):
+        await communicator.send_json_to({'action': 'stats'})
+        return (await communicator.receive_json_from())['data']
+
+    async def test_coalesce_sends_dropped_counts_once_drained(self):
+        communicator = await self.stalled_connection()
+        messages = await self.acknowledge_all(communicator, 3)
+        self.assertEqual([message['data']['event_id'] for message in messages[:2]], ['EV2', 'EV3'])
+        self.assertEqual(messages[2], {'type': 'coalesced', 'counts': {'call_event': 2}})
+        self.assertEqual((await self.stats(communicator))['coalesced'], 2)
+        await communicator.disconnect()
+
+    async def test_drop_oldest_keeps_newest(self):
+        communicator = await self.stalled_connection('overflow=drop_oldest')
+        messages = await self.acknowledge_all(communicator, 2)
+        self.assertEqual([message['data']['event_id'] for message in messages], ['EV4', 'EV5'])
+        self.assertEqual((await self.stats(communicator))['dropped'], 2)
+        await communicator.disconnect()
+
+    async def test_disconnect_sends_resume_and_closes(self):
+        communicator = await self.connect('ack_window=1&overflow=disconnect')
+        await self.broadcast(*(unsaved_call_event(f'EV{index}') for index in range(1, 6)))
+        first = await communicator.receive_json_from()
+        resume = await communicator.receive_json_from()
+        self.assertEqual(resume, {
+            'type': 'resume', 'reason': 'slow_consumer',
+            'last_event_id': 'EV1', 'last_seen': first['cursor']
+        })
+        self.assertEqual(await communicator.receive_output(), {'type': 'websocket.close', 'code': 4008})
+        # Closed once: later events are not queued and trigger no second resume
+        self.assertTrue(await communicator.receive_nothing(timeout=0.05))
+        await communicator.disconnect()
+
+    async def test_ack_window_limits_in_flight_messages(self):
+        communicator = await self.connect('ack_window=2')
+        await self.broadcast(*(unsaved_call_event(f'EV{index}') for index in range(1, 4)))
+        received = [await communicator.receive_json_from() for _ in range(2)]
+        self.assertTrue(await communicator.receive_nothing(timeout=0.1))
+        self.assertEqual((await self.stats(communicator))['in_flight'], 2)
+
+        # Stale or malformed acks are ignored
+        await communicator.send_json_to({'action': 'ack', 'received': 'all'})
+        self.assertTrue(await communicator.receive_nothing(timeout=0.05))
+        await communicator.send_json_to({'action': 'ack', 'received': 1})
+        received.append(await communicator.receive_json_from())
+        self.assertEqual([message['data']['event_id'] for message in received], ['EV1', 'EV2', 'EV3'])
+        await communicator.disconnect()
+
+    async def test_invalid_ack_window_closes(self):
+        communicator = WebsocketCommunicator(EventStreamConsumer.as_asgi(), '/ws/events/?ack_window=many')
+        connected, close_code = await communicator.connect()
+        self.assertFalse(connected)
+        self.assertEqual(close_code, 4400)
+
+    async def test_writer_failure_closes_connection(self):
+        communicator = WebsocketCommunicator(FailingSendConsumer.as_asgi(), '/ws/events/')
+        self.assertTrue((await communicator.connect())[0])
+        with self.assertLogs('events.consumers', level='ERROR'):
+            await self.broadcast(unsaved_call_event('EV1'))
+            self.assertEqual(await communicator.receive_output(), {'type': 'websocket.close', 'code': 1011})
+        await communicator.disconnect()
+
+
+class CallTimingTests(TestCase):
+    def record_call(self, call_sid, phases):
+        """Record status callbacks at the given millisecond offsets from BASE_TIME."""
+        return [
+            record_call_timing(unsaved_call_event(
+                f'EV{call_sid}{status}', call_sid=call_sid, status=status,
+                timestamp=BASE_TIME + timedelta(milliseconds=offset)
+            ))
+            for status, offset in phases
+        ]
+
+    def test_percentiles_match_known_values(self):
+        shuffle = random.Random(36).shuffle
+        for index in range(1, 101):
+            ring_time, talk_time = index * 100, index * 1000
+            phases = [
+                ('initiated', 0),
+                ('ringing', 1000),
+                ('in-progress', 1000 + ring_time),
+                ('completed', 1000 + ring_time + talk_time),
+            ]
+            # Callbacks may arrive in any order
+            shuffle(phases)
+            self.record_call(f'CA{index}', phases)
+
+        histograms = timing_histograms(BASE_TIME - timedelta(hours=1), BASE_TIME + timedelta(hours=2))
+        expected = {
+            'post_dial_delay': {'p50': 1000, 'p95': 1000, 'p99': 1000},
+            'ring_time': {'p50': 5000, 'p95': 9500, 'p99': 9900},
+            'time_to_answer': {'p50': 6000, 'p95': 10500, 'p99': 10900},
+            'talk_time': {'p50': 50000, 'p95': 95000, 'p99': 99000},
+        }
+        for metric, percentiles in expected.items():
+            summary = timing_summary(histograms[metric])
+            self.assertEqual(summary['count'], 100)
+            for percentile, value in percentiles.items():
+                with self.subTest(metric=metric, percentile=percentile):
+                    # Buckets bound the relative error to under 1%
+                    self.assertAlmostEqual(summary[percentile], value, delta=value * 0.01)
+
+        # Finished calls leave no timing state behind
+        self.assertFalse(CallTiming.objects.exists())
+
+    def test_duplicate_phase_is_measured_once(self):
+        self.record_call('CA1', [('initiated', 0), ('ringing', 1500)])
+        self.assertEqual(self.record_call('CA1', [('ringing', 1700)]), [[]])
+        self.assertEqual(CallTiming.objects.get().ringing_at, BASE_TIME + timedelta(milliseconds=1500))
+        histogram = timing_histograms(BASE_TIME, BASE_TIME + timedelta(hours=1), metrics=['post_dial_delay'])
+        self.assertEqual(timing_summary(histogram['post_dial_delay'])['count'], 1)
+
+    def test_prune_removes_calls_without_recent_callbacks(self):
+        self.record_call('CA1', [('initiated', 0), ('ringing', 1000)])
+        self.record_call('CA2', [('initiated', 0), ('ringing', 3 * 3600 * 1000)])
+
+        self.assertEqual(prune_call_timings(BASE_TIME + timedelta(hours=1)), 1)
+        self.assertEqual(list(CallTiming.objects.values_list('call_sid', flat=True)), ['CA2'])
+
+
+def redis_detector_state(server):
+    with mock.patch('redis.Redis.from_url', return_value=fakeredis.FakeRedis(server=server)):
+        return RedisDetectorState('redis://test', 'test:detector')
+
+
+class AnomalyDetectionTests(SimpleTestCase):
+    SETTINGS = {'alpha': 0.1, 'threshold': 4.0, 'warmup_minutes': 5, 'min_count': 10}
+
+    def warm_series(self, minutes=30):
+        series = RateSeries(0)
+        series.advance(minutes, [4, 6] * (minutes // 2), **self.SETTINGS)
+        return series
+
+    def observe_minute(self, detector, minute, count, account_sid='AC1'):
+        """Events spread over one minute; returns the alerts they raised."""
+        alerts = []
+        for index in range(count):
+            alerts += detector.observe(account_sid, 'error', now=minute * 60 + index * 50 / max(count, 1))
+        return alerts
+
+    def test_advance_does_not_alert_or_clip_during_warmup(self):
+        series = RateSeries(0)
+        series.advance(3, [5, 5, 100], **self.SETTINGS)
+        self.assertFalse(series.alerting)
+        self.assertEqual((series.minute, series.minutes_seen), (3, 3))
+        # 0 -> 0.5 -> 0.95 -> 0.855 + 10: the spike is folded in full
+        self.assertAlmostEqual(series.mean, 10.855)
+
+    def test_advance_clips_spikes_after_warmup(self):
+        series = self.warm_series()
+        bound = series.upper_bound(self.SETTINGS['threshold'])
+        series.advance(31, [1000], **self.SETTINGS)
+        self.assertTrue(series.alerting)
+        # The spike counts as the old upper bound, so the next one is still detected
+        self.assertLess(series.mean, bound)
+        self.assertLess(series.upper_bound(self.SETTINGS['threshold']), 50)
+
+        # Back to normal re-arms; a spike below min_count never alerts
+        series.advance(32, [5], **self.SETTINGS)
+        self.assertFalse(series.alerting)
+        series.advance(33, [9], **self.SETTINGS)
+        self.assertFalse(series.alerting)
+
+    def test_alerts_once_per_anomaly_then_rearms(self):
+        detector = ErrorRateDetector(**self.SETTINGS)
+        for minute in range(10):
+            self.assertEqual(self.observe_minute(detector, minute, 4 + 2 * (minute % 2)), [])
+
+        alerts = self.observe_minute(detector, 10, 30)
+        self.assertEqual(len(alerts), 1)
+        self.assertEqual(alerts[0]['account_sid'], 'AC1')
+        self.assertGreater(alerts[0]['count'], alerts[0]['baseline'])
+        # Still anomalous: no new alert until a minute is back within the baseline
+        self.assertEqual(self.observe_minute(detector, 11, 30), [])
+        self.assertEqual(self.observe_minute(detector, 12, 5), [])
+        self.assertEqual(len(self.observe_minute(detector, 13, 30)), 1)
+        # Other accounts have their own baseline
+        self.assertEqual(self.observe_minute(detector, 13, 30, account_sid='AC2'), [])
+
+    @skipUnless(fakeredis, 'fakeredis is not installed')
+    def test_alert_claimed_by_one_worker(self):
+        server = fakeredis.FakeServer()
+        first, second = redis_detector_state(server), redis_detector_state(server)
+        key = ('AC1', 'error')
+        self.assertTrue(first.claim_alert(key, 10))
+        self.assertFalse(second.claim_alert(key, 10))
+        self.assertTrue(second.claim_alert(key, 11))
+        self.assertTrue(second.claim_alert(('AC2', 'error'), 10))
+
+    @skipUnless(fakeredis, 'fakeredis is not installed')
+    def test_workers_share_counts_and_alert_once(self):
+        server = fakeredis.FakeServer()
+        workers = [ErrorRateDetector(shared=redis_detector_state(server), **self.SETTINGS) for _ in range(2)]
+
+        def run_minute(minute, count):
+            # Each worker sees half of the minute's events, then both sync after the minute is over
+            alerts = []
+            for index in range(count):
+                alerts += workers[index % 2].observe('AC1', 'error', now=minute * 60 + index * 50 / count)
+            for worker in workers:
+                alerts += worker.sync(now=minute * 60 + 59)
+            return alerts
+
+        for minute in range(10):
+            self.assertEqual(run_minute(minute, 8 + 4 * (minute % 2)), [])
+        for worker in workers:
+            worker.sync(now=10 * 60 + 15)
+
+        # Both workers folded the same shared totals
+        self.assertEqual(workers[0].series[('AC1', 'error')].to_dict(), workers[1].series[('AC1', 'error')].to_dict())
+        self.assertEqual(workers[0].series[('AC1', 'error')].minutes_seen, 10)
+
+        # Neither worker alone sees an anomaly, together they do: one worker sends the alert
+        alerts = run_minute(10, 40)
+        self.assertEqual(len(alerts), 1)
+        self.assertGreaterEqual(alerts[0]['count'], 20)
+
+    @skipUnless(fakeredis, 'fakeredis is not installed')
+    def test_restarted_worker_resumes_from_checkpoint(self):
+        server = fakeredis.FakeServer()
+        worker = ErrorRateDetector(shared=redis_detector_state(server), checkpoint_seconds=0, **self.SETTINGS)
+        for minute in range(10):
+            self.observe_minute(worker, minute, 5)
+            worker.sync(now=minute * 60 + 59)
+        worker.sync(now=10 * 60 + 15)
+
+        restarted = ErrorRateDetector(shared=redis_detector_state(server), **self.SETTINGS)
+        restarted.observe('AC1', 'error', now=10 * 60 + 20)
+        # The checkpoint was saved before the last fold; the minute after it is folded from shared totals
+        restarted.sync(now=10 * 60 + 30)
+        self.assertEqual(restarted.series[('AC1', 'error')].minutes_seen, 9)
+        restarted.sync(now=10 * 60 + 40)
+        self.assertEqual(restarted.series[('AC1', 'error')].to_dict(), worker.series[('AC1', 'error')].to_dict())
+
+    def test_unreachable_shared_state_folds_local_counts(self):
+        shared = mock.Mock()
+        shared.sync.side_effect = ConnectionError('down')
+        detector = ErrorRateDetector(shared=shared, **self.SETTINGS)
+        self.observe_minute(detector, 0, 5)
+        with self.assertLogs('events.utilities.anomaly_detection', level='WARNING'):
+            self.assertEqual(detector.sync(now=75), [])
+        series = detector.series[('AC1', 'error')]
+        self.assertEqual((series.minute, series.minutes_seen), (1, 1))
+        self.assertEqual(detector.pending[(('AC1', 'error'), 0)], 5)
+
+
+def skewed_stream(seed, length, items=200):
+    """Item names drawn with Zipf-like frequencies, so a few items dominate."""
+    generator = random.Random(seed)
+    weights = [1 / rank for rank in range(1, items + 1)]
+    return [f'item{index:03d}' for index in generator.choices(range(items), weights, k=length)]
+
+
+class SpaceSavingTests(SimpleTestCase):
+    CAPACITY = 20
+
+    def sketch(self, stream):
+        sketch = SpaceSaving(self.CAPACITY)
+        for item in stream:
+            sketch.add(item)
+        return sketch
+
+    def assertWithinBounds(self, sketch, stream):
+        exact = Counter(stream)
+        for item, (count, error) in sketch.counters.items():
+            with self.subTest(item=item):
+                # The count never underestimates, and overestimates by at most its error
+                self.assertGreaterEqual(count, exact[item])
+                self.assertLessEqual(count - error, exact[item])
+        # Every item more frequent than len(stream) / capacity is tracked
+        for item, count in exact.items():
+            if count > len(stream) / self.CAPACITY:
+                self.assertIn(item, sketch.counters)
+
+    def test_add_error_bounds(self):
+        stream = skewed_stream(37, 5000)
+        sketch = self.sketch(stream)
+        self.assertEqual(len(sketch.counters), self.CAPACITY)
+        # Each add raises exactly one counter by one
+        self.assertEqual(sum(count for count, _ in sketch.counters.values()), len(stream))
+        self.assertWithinBounds(sketch, stream)
+        # Outdated heap entries are compacted
+        self.assertLessEqual(len(sketch.heap), 2 * self.CAPACITY + 16)
+
+    def test_evicts_smallest_counter(self):
+        sketch = SpaceSaving(2)
+        for item in ('a', 'a', 'a', 'b', 'b', 'c'):
+            sketch.add(item)
+        self.assertEqual(sketch.counters, {'a': [3, 0], 'c': [3, 2]})
+        sketch.add('d', count=5)
+        self.assertEqual(sketch.counters, {'c': [3, 2], 'd': [8, 3]})
+
+    def test_merge_error_bounds(self):
+        first, second = skewed_stream(1, 3000), skewed_stream(2, 2000)
+        merged = self.sketch(first).merge(self.sketch(second))
+        self.assertEqual(len(merged.counters), self.CAPACITY)
+        self.assertWithinBounds(merged, first + second)
+
+        # Adding after a merge still evicts the smallest counter
+        floor = min(count for count, _ in merged.counters.values())
+        merged.add('new')
+        self.assertEqual(merged.counters['new'], [floor + 1, floor])
+
+    def test_top(self):
+        stream = skewed_stream(3, 5000)
+        top = self.sketch(stream).top(5)
+        self.assertEqual(len(top), 5)
+        self.assertEqual([entry['count'] for entry in top], sorted((entry['count'] for entry in top), reverse=True))
+        # Items far above the error bound are ranked exactly
+        self.assertEqual([entry['value'] for entry in top[:3]], [item for item, _ in Counter(stream).most_common(3)])
+
+    @skipUnless(HAS_REDIS_SCRIPTING, 'fakeredis and lupa are not installed')
+    def test_redis_script_matches_local_backend(self):
+        with mock.patch('redis.Redis.from_url', return_value=fakeredis.FakeRedis()):
+            shared = RedisHeavyHitters('redis://test', 'test:hitters', window_minutes=5, capacity=self.CAPACITY)
+        local = LocalHeavyHitters(window_minutes=5, capacity=self.CAPACITY)
+
+        now = 1000 * 60
+        for minute, seed in enumerate((4, 5, 6)):
+            for item in skewed_stream(seed, 1000):
+                for backend in (shared, local):
+                    backend.add('error_code', item, now=now + minute * 60)
+
+        for window in (1, 3):
+            with self.subTest(window=window):
+                self.assertEqual(
+                    shared.top('error_code', window, 10, now=now + 120),
+                    local.top('error_code', window, 10, now=now + 120)
+                )
+
+
+class CallTracesBatchTests(APITestCase):
+    PATH = '/api/call-events/call-traces/'
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        for index, status in enumerate(('initiated', 'ringing', 'completed')):
+            make_call_event(f'EV{index}', call_sid='CA1', status=status, seconds=index)
+        make_error_event('ER1', correlation_sid='CA1', seconds=1)
+        make_call_event('EV3', call_sid='CA2', status='failed')
+
+    def test_post_and_get_return_the_same_traces(self):
+        posted = self.client.post(self.PATH, {'call_sids': ['CA1', 'CA2', 'CA9']}, format='json')
+        fetched = self.client.get(self.PATH, {'call_sids': 'CA1, CA2,CA9'})
+        self.assertEqual(posted.status_code, 200)
+        self.assertEqual(fetched.status_code, 200)
+        self.assertEqual(posted.json(), fetched.json())
+
+        data = posted.json()
+        self.assertEqual(sorted(data['traces']), ['CA1', 'CA2'])
+        self.assertEqual(data['missing'], ['CA9'])
+        self.assertEqual([event['event_id'] for event in data['traces']['CA1']['events']], ['EV0', 'EV1', 'ER1', 'EV2'])
+
+    def test_query_count_does_not_grow_with_sids(self):
+        query_counts = []
+        for call_sids in (['CA1'], ['CA1', 'CA2'] + [f'CA{index}' for index in range(10, 60)]):
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.client.post(self.PATH, {'call_sids': call_sids}, format='json').status_code, 200)
+            query_counts.append(len(queries))
+        self.assertEqual(query_counts[0], query_counts[1])
+        with assert_query_budget(f'{self.PATH}?call_sids=CA1,CA2'):
+            self.client.get(self.PATH, {'call_sids': 'CA1,CA2'})
+
+    def test_sid_limit(self):
+        call_sids = [f'CA{index}' for index in range(100)]
+        self.assertEqual(self.client.post(self.PATH, {'call_sids': call_sids}, format='json').status_code, 200)
+        response = self.client.post(self.PATH, {'call_sids': call_sids + ['CA100']}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('At most 100', response.json()['error'])
+        self.assertEqual(self.client.get(self.PATH, {'call_sids': ','.join(call_sids + ['CA100'])}).status_code, 400)
+
+    def test_invalid_bodies(self):
+        for body in (['CA1'], 'CA1', {'call_sids': 'CA1'}, {'call_sids': []}, {}):
+            with self.subTest(body=body):
+                self.assertEqual(self.client.post(self.PATH, body, format='json').status_code, 400)
+        self.assertEqual(self.client.get(self.PATH).status_code, 400)
+
+
+async def read_stream(response):
+    return b''.join([chunk async for chunk in response.streaming_content])
+
+
+class TraceOptionsTests(APITestCase):
+    PATH = '/api/call-events/call-trace/CA1/'
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        for index, status in enumerate(('initiated', 'ringing', 'completed')):
+            make_call_event(f'EV{index}', call_sid='CA1', status=status, seconds=2 * index, meta_data={'index': index})
+            if index < 2:
+                make_error_event(f'ER{index}', correlation_sid='CA1', seconds=2 * index + 1, meta_data={'index': index})
+
+    def formatted_events(self, path):
+        """Response and the model instances the trace formatters were given."""
+        formatted = []
+        with mock.patch.object(call_trace, 'format_call_event', wraps=call_trace.format_call_event) as calls, \
+                mock.patch.object(call_trace, 'format_error_event', wraps=call_trace.format_error_event) as errors:
+            response = self.client.get(path)
+            if response.streaming:
+                response.lines = [json.loads(line) for line in async_to_sync(read_stream)(response).splitlines()]
+        for mocked in (calls, errors):
+            formatted.extend(call.args[0] for call in mocked.call_args_list)
+        return response, formatted
+
+    def test_payload_included_by_default(self):
+        response, events = self.formatted_events(self.PATH)
+        self.assertEqual([event['payload'] for event in response.json()['events']], [
+            {'index': 0}, {'index': 0}, {'index': 1}, {'index': 1}, {'index': 2}
+        ])
+        self.assertTrue(all('meta_data' not in event.get_deferred_fields() for event in events))
+
+    def test_include_payload_false_does_not_load_meta_data(self):
+        response, events = self.formatted_events(f'{self.PATH}?include_payload=false')
+        trace = response.json()
+        self.assertEqual(len(trace['events']), 5)
+        self.assertTrue(all('payload' not in event for event in trace['events']))
+        self.assertEqual(trace['header']['call_sid'], 'CA1')
+        self.assertEqual(len(events), 5)
+        self.assertTrue(all('meta_data' in event.get_deferred_fields() for event in events))
+
+    def test_fields_projection(self):
+        response, events = self.formatted_events(f'{self.PATH}?fields=event_id,category,unknown')
+        self.assertEqual(response.json()['events'][:2], [
+            {'event_id': 'EV0', 'category': 'call'}, {'event_id': 'ER0', 'category': 'error'}
+        ])
+        self.assertTrue(all('meta_data' in event.get_deferred_fields() for event in events))
+
+        # Payload is loaded only when it is one of the fields
+        response, events = self.formatted_events(f'{self.PATH}?fields=event_id,payload')
+        self.assertEqual(response.json()['events'][0], {'event_id': 'EV0', 'payload': {'index': 0}})
+        self.assertTrue(all('meta_data' not in event.get_deferred_fields() for event in events))
+
+        # The batch endpoint accepts the same options
+        traces = self.client.get('/api/call-events/call-traces/', {'call_sids': 'CA1', 'fields': 'event_id'}).json()
+        self.assertEqual(traces['traces']['CA1']['events'][0], {'event_id': 'EV0'})
+
+    def test_ndjson_lines_in_timestamp_order(self):
+        whole = self.client.get(self.PATH).json()
+        # Chunks of two lines, so call and error events are merged across chunk boundaries
+        with mock.patch('events.views.TRACE_STREAM_CHUNK_SIZE', 2), \
+                mock.patch.object(call_trace, 'TRACE_STREAM_CHUNK_SIZE', 2):
+            response, _ = self.formatted_events(f'{self.PATH}?stream=ndjson')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertEqual(response.lines[0], {'header': whole['header']})
+        self.assertEqual([line['event'] for line in response.lines[1:]], whole['events'])
+        self.assertEqual(
+            [line['event']['event_id'] for line in response.lines[1:]],
+            ['EV0', 'ER0', 'EV1', 'ER1', 'EV2']
+        )
+
+    def test_ndjson_with_fields_and_missing_call(self):
+        response, _ = self.formatted_events(f'{self.PATH}?stream=ndjson&fields=event_id')
+        self.assertEqual([line['event'] for line in response.lines[1:]], [
+            {'event_id': event_id} for event_id in ('EV0', 'ER0', 'EV1', 'ER1', 'EV2')
+        ])
+        self.assertEqual(self.client.get('/api/call-events/call-trace/CA9/?stream=ndjson').status_code, 404)
+
+
+class ExportTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        make_call_event('EV1', seconds=1, meta_data={'CallStatus': 'completed'})
+        make_call_event('EV0', call_sid='CA2', seconds=0, account_sid='AC2')
+        make_call_event('EV2', seconds=7200)
+
+    def get_export(self, path, **params):
+        with assert_query_budget(path):
+            response = self.client.get(path, params)
+            if response.status_code == 200:
+                response.body = async_to_sync(read_stream)(response).decode()
+        return response
+
+    def test_csv(self):
+        response = self.get_export('/api/call-events/export/', include_meta_data='true')
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="call-events.csv"')
+        rows = list(csv.DictReader(response.body.splitlines()))
+        self.assertEqual([row['event_id'] for row in rows], ['EV0', 'EV1', 'EV2'])
+        self.assertEqual(rows[1]['timestamp'], (BASE_TIME + timedelta(seconds=1)).isoformat().replace('+00:00', 'Z'))
+        self.assertEqual(json.loads(rows[1]['meta_data']), {'CallStatus': 'completed'})
+        self.assertEqual(rows[1]['ingest_seq'], str(CallEvent.objects.get(event_id='EV1').ingest_seq))
+
+    def test_ndjson_range_and_account(self):
+        end = (BASE_TIME + timedelta(hours=1)).isoformat()
+        response = self.get_export('/api/call-events/export/', output='ndjson', end=end, account_sid='AC1')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = [json.loads(line) for line in response.body.splitlines()]
+        self.assertEqual([line['event_id'] for line in lines], ['EV1'])
+        self.assertNotIn('meta_data', lines[0])
+        self.assertEqual(lines[0]['call_sid'], 'CA1')
+
+        response = self.get_export('/api/error-events/export/', output='ndjson')
+        self.assertEqual(response.body, '')
+
+    def test_invalid_params(self):
+        for params in ({'output': 'xlsx'}, {'start': 'yesterday'}, {'start': BASE_TIME.isoformat(), 'end': BASE_TIME.isoformat()}):
+            with self.subTest(params=params):
+                response = self.client.get('/api/call-events/export/', params)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('error', response.json())
+
+    def test_parquet_without_pyarrow(self):
+        with mock.patch.object(export, 'pyarrow', None):
+            response = self.get_export('/api/call-events/export/', output='parquet')
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json(), {'error': 'Parquet export requires the pyarrow package'})
+
+            path = os.path.join(tempfile.mkdtemp(), 'calls.parquet')
+            with self.assertRaisesMessage(CommandError, 'requires the pyarrow package'):
+                call_command('export_events', 'call-events', path, output_format='parquet')
+            self.assertFalse(os.path.exists(path))
+
+    @skipUnless(export.pyarrow is not None, 'pyarrow is not installed')
+    def test_parquet(self):
+        response = self.client.get('/api/call-events/export/', {'output': 'parquet'})
+        table = export.pyarrow.parquet.read_table(export.pyarrow.BufferReader(async_to_sync(read_stream)(response)))
+        self.assertEqual(table.column('event_id').to_pylist(), ['EV0', 'EV1', 'EV2'])
+
+    def test_command_matches_endpoint(self):
+        path = os.path.join(tempfile.mkdtemp(), 'calls.ndjson')
+        call_command('export_events', 'call-events', path, output_format='ndjson', stdout=open(os.devnull, 'w'))
+        with open(path) as output:
+            self.assertEqual(output.read(), self.get_export('/api/call-events/export/', output='ndjson').body)
+
+
+class CompressionMiddlewareTests(TestCase):
+    BODY = json.dumps([{'event_id': f'EV{index}', 'call_status': 'completed'} for index in range(100)]).encode()
+
+    def compress(self, response, path='/api/call-events/', accept_encoding='gzip, deflate, br'):
+        request = RequestFactory().get(path, HTTP_ACCEPT_ENCODING=accept_encoding)
+        return middleware.CompressionMiddleware(lambda request: response)(request)
+
+    def json_response(self, body=BODY):
+        return HttpResponse(body, content_type='application/json')
+
+    def test_gzip_without_brotli(self):
+        with mock.patch.object(middleware, 'brotli', None):
+            response = self.compress(self.json_response())
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(gzip.decompress(response.content), self.BODY)
+
+    @skipUnless(middleware.brotli is not None, 'brotli is not installed')
+    def test_brotli_when_accepted(self):
+        response = self.json_response()
+        response['ETag'] = '"1.2"'
+        response = self.compress(response)
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(response['ETag'], 'W/"1.2"')
+        self.assertEqual(middleware.brotli.decompress(response.content), self.BODY)
+
+        self.assertEqual(self.compress(self.json_response(), accept_encoding='gzip')['Content-Encoding'], 'gzip')
+
+    def test_passed_through(self):
+        cases = {
+            'small': (self.json_response(b'{}'), '/api/call-events/', 'gzip, br'),
+            'excluded path': (self.json_response(), '/api/twilio-events/', 'gzip, br'),
+            'streaming': (StreamingHttpResponse(iter([self.BODY])), '/api/call-events/export/', 'gzip, br'),
+        }
+        for case, (response, path, accept_encoding) in cases.items():
+            with self.subTest(case=case):
+                body = None if response.streaming else response.content
+                response = self.compress(response, path, accept_encoding)
+                self.assertFalse(response.has_header('Content-Encoding'))
+                self.assertFalse(response.has_header('Vary'))
+                if not response.streaming:
+                    self.assertEqual(response.content, body)
+
+        # A compressible response varies on Accept-Encoding even when sent uncompressed
+        response = self.compress(self.json_response(), accept_encoding='identity')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(response.content, self.BODY)
+
+    def test_api_responses_are_compressed(self):
+        for index in range(30):
+            make_call_event(f'EV{index}', call_sid=f'CA{index}')
+        client = APIClient()
+        client.force_authenticate(User(username='tester'))
+        response = client.get('/api/call-events/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(len(json.loads(gzip.decompress(response.content))['results']), 30)
@@ -8,5 +8,9 @@ router.register(r'error-events', views.ErrorEventViewSet, basename='errorevent')
 
 urlpatterns = [
     path("twilio-events", views.twilio_events_webhook, name="twilio_events_webhook"),
+    path("stream-connections/", views.stream_connections, name="stream_connections"),
+    path("heavy-hitters/", views.heavy_hitters, name="heavy_hitters"),
+    path("health/", views.health, name="health"),
+    path("health/ready/", views.readiness, name="readiness"),
     path('', include(router.urls)),
 ]
\ No newline at end of file
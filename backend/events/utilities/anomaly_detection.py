@@ -0,0 +1,381 @@
+"""
+Streaming error-rate anomaly detection on the ingest path.
+
+Per account, error events and failed calls are counted per minute. Each finished minute
+updates an exponentially weighted mean and variance of that count, and the minute in
+progress is compared to the baseline as events arrive: the first time it exceeds
+mean + THRESHOLD standard deviations an alert is raised, once, until a later minute is
+back within the baseline. Counting an event only updates in-process dictionaries.
+
+With the Redis backend the webhook thread only talks to Redis to claim an alert (SET NX),
+so one worker sends it. A background thread syncs every SYNC_SECONDS in one pipelined round
+trip: it adds the process's pending counts to shared per-minute hashes (HINCRBY), reads
+every worker's totals for the minute in progress and for finished minutes (HGETALL), loads
+checkpointed baselines for accounts new to the process and checkpoints its own. Finished
+minutes are folded from the shared totals once every worker has synced them, which keeps the
+workers' baselines in step; a restarted worker resumes from the checkpoint instead of
+warming up again. If Redis is unreachable a worker folds its local counts. The memory
+backend keeps everything per process.
+"""
+import json
+import logging
+import math
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+
+from ..integrations.slack import error_rate_anomaly_notification
+from .heavy_hitters import FAILED_CALL_STATUSES
+
+logger = logging.getLogger(__name__)
+
+ANOMALY_SIGNALS = ('error', 'failed_call')
+
+# Longest run of silent minutes folded into a baseline one by one; beyond it the
+# baseline has decayed to (near) zero anyway.
+MAX_IDLE_MINUTES = 120
+
+# Shared per-minute counts are kept long enough for a restarted worker to fold the minutes it missed
+COUNT_TTL_SECONDS = (MAX_IDLE_MINUTES + 2) * 60
+ALERT_CLAIM_SECONDS = 3600
+
+
+class RateSeries:
+    """EWMA baseline of one signal's per-minute count for one account, folded up to minute."""
+
+    __slots__ = ('minute', 'mean', 'variance', 'minutes_seen', 'alerting')
+
+    # Extra keys are ignored: earlier checkpoints also stored the count of the minute in progress
+    def __init__(self, minute, mean=0.0, variance=0.0, minutes_seen=0, alerting=False, **_):
+        self.minute = minute
+        self.mean = mean
+        self.variance = variance
+        self.minutes_seen = minutes_seen
+        self.alerting = alerting
+
+    def advance(self, minute, counts, alpha, threshold, warmup_minutes, min_count):
+        """Fold the counts of finished minutes, oldest first, into the baseline and start minute."""
+        if minute <= self.minute:
+            return
+        for value in counts:
+            upper_bound = self.upper_bound(threshold)
+            if value <= upper_bound:
+                self.alerting = False
+            elif self.minutes_seen >= warmup_minutes and value >= min_count:
+                # An anomalous minute was alerted on (by some worker); stay quiet until one is normal
+                self.alerting = True
+            if self.minutes_seen >= warmup_minutes:
+                # Clip spikes so one incident does not inflate the baseline and mask the next;
+                # a lasting level shift still raises it a step per minute.
+                value = min(value, upper_bound)
+            # Incremental exponentially weighted mean and variance
+            diff = value - self.mean
+            increment = alpha * diff
+            self.mean += increment
+            self.variance = (1 - alpha) * (self.variance + diff * increment)
+            self.minutes_seen += 1
+        self.minute = minute
+
+    def upper_bound(self, threshold):
+        return self.mean + threshold * math.sqrt(self.variance)
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class ErrorRateDetector:
+    """EWMA detector over per-minute error and failed-call counts, keyed by account."""
+
+    def __init__(self, alpha=0.1, threshold=4.0, min_count=10, warmup_minutes=15,
+                 shared=None, sync_seconds=5, checkpoint_seconds=30):
+        self.alpha = alpha
+        self.threshold = threshold
+        self.min_count = min_count
+        self.warmup_minutes = warmup_minutes
+        self.shared = shared
+        self.sync_seconds = sync_seconds
+        self.checkpoint_seconds = checkpoint_seconds
+
+        self.series = {}
+        # key -> {minute: count} for minutes not folded yet; every worker's events as of the last sync
+        self.counts = defaultdict(dict)
+        # (key, minute) -> events not yet added to the shared counts
+        self.pending = defaultdict(int)
+        # Keys whose checkpointed baseline has not been read yet
+        self.unloaded = set()
+        self.dirty = set()
+        self.last_checkpoint = time.monotonic()
+        self.lock = threading.Lock()
+        self.sync_thread = None
+
+    def observe(self, account_sid, signal, now=None):
+        """Count one event; returns a list with an alert when this event makes the rate anomalous."""
+        now = time.time() if now is None else now
+        minute = int(now // 60)
+        key = (account_sid or '', signal)
+
+        with self.lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = RateSeries(minute)
+                if self.shared is not None:
+                    self.unloaded.add(key)
+            if self.shared is None:
+                self._fold(key, series, minute)
+            else:
+                # Finished minutes are folded by sync() once every worker's counts are in
+                self.pending[(key, minute)] += 1
+            counts = self.counts[key]
+            counts[minute] = counts.get(minute, 0) + 1
+            self.dirty.add(key)
+            alert = self._check(key, series, minute, counts[minute])
+
+        if alert is None or not self._claim(key, minute):
+            return []
+        return [alert]
+
+    def sync(self, now=None):
+        """
+        Exchange counts with the shared state in one round trip and fold the finished minutes
+        every worker has synced. Returns alerts raised by other workers' counts.
+        """
+        now = time.time() if now is None else now
+        minute = int(now // 60)
+        # A worker's events of a finished minute reach the shared totals within sync_seconds
+        folded_minute = min(int((now - 2 * self.sync_seconds) // 60), minute)
+
+        with self.lock:
+            pending, self.pending = self.pending, defaultdict(int)
+            load_keys, self.unloaded = self.unloaded, set()
+            oldest = min((series.minute for series in self.series.values()), default=folded_minute)
+            finished = list(range(max(oldest, folded_minute - MAX_IDLE_MINUTES - 1), folded_minute))
+            checkpoint = None
+            if time.monotonic() - self.last_checkpoint >= self.checkpoint_seconds:
+                checkpoint = {key: self.series[key].to_dict() for key in self.dirty}
+                self.dirty = set()
+                self.last_checkpoint = time.monotonic()
+
+        try:
+            totals, loaded = self.shared.sync(pending, finished + [minute], load_keys, checkpoint)
+        except Exception:
+            logger.warning("Anomaly detector state unavailable, folding local counts", exc_info=True)
+            with self.lock:
+                for pending_key, amount in pending.items():
+                    self.pending[pending_key] += amount
+                self.unloaded |= load_keys
+                self.dirty |= set(checkpoint or ())
+                for key, series in self.series.items():
+                    self._fold(key, series, folded_minute)
+            return []
+
+        alerts = []
+        with self.lock:
+            first_read = finished[0] if finished else folded_minute
+            adopted = set()
+            for key, state in loaded.items():
+                series = self.series.get(key)
+                if series is not None and state.minutes_seen > series.minutes_seen:
+                    # Another worker has the longer history; continue from its checkpoint
+                    self.series[key] = state
+                    adopted.add(key)
+
+            current = totals.get(minute, {})
+            for key, series in self.series.items():
+                if key not in adopted or series.minute >= first_read:
+                    # Minutes before an adopted checkpoint's were not read; fold them next time
+                    self._fold(key, series, folded_minute, totals)
+                if key in current and series.minute <= minute:
+                    # Events counted here while the round trip was in flight are still pending
+                    counts = self.counts[key]
+                    counts[minute] = max(counts.get(minute, 0), current[key] + self.pending.get((key, minute), 0))
+                    alert = self._check(key, series, minute, counts[minute])
+                    if alert is not None:
+                        alerts.append((key, alert))
+
+        return [alert for key, alert in alerts if self._claim(key, minute)]
+
+    def start(self, notify):
+        """Run sync() every sync_seconds on a daemon thread, passing the alerts it returns to notify."""
+        if self.shared is None or self.sync_thread is not None:
+            return
+        self.sync_thread = threading.Thread(target=self._sync_loop, args=(notify,), name='anomaly-sync', daemon=True)
+        self.sync_thread.start()
+
+    def _sync_loop(self, notify):
+        while True:
+            time.sleep(self.sync_seconds)
+            try:
+                for alert in self.sync():
+                    notify(alert)
+            except Exception:
+                logger.exception("Anomaly detector sync failed")
+
+    def _fold(self, key, series, minute, totals=None):
+        """Fold minutes before minute into the baseline from shared totals, or from this process's counts."""
+        if series.minute >= minute:
+            return
+        counts = self.counts[key]
+        values = []
+        for finished_minute in range(max(series.minute, minute - MAX_IDLE_MINUTES - 1), minute):
+            value = counts.get(finished_minute, 0)
+            if totals is not None:
+                value = max(value, totals.get(finished_minute, {}).get(key, 0))
+            values.append(value)
+        for counted_minute in [counted_minute for counted_minute in counts if counted_minute < minute]:
+            del counts[counted_minute]
+        series.advance(minute, values, self.alpha, self.threshold, self.warmup_minutes, self.min_count)
+        self.dirty.add(key)
+
+    def _check(self, key, series, minute, count):
+        if (series.alerting
+                or series.minutes_seen < self.warmup_minutes
+                or count < self.min_count
+                or count <= series.upper_bound(self.threshold)):
+            return None
+        series.alerting = True
+        return {
+            'account_sid': key[0],
+            'signal': key[1],
+            'minute_start': minute * 60,
+            'count': count,
+            'baseline': round(series.mean, 2),
+            'stddev': round(math.sqrt(series.variance), 2),
+            'threshold': self.threshold,
+        }
+
+    def _claim(self, key, minute):
+        if self.shared is None:
+            return True
+        try:
+            return self.shared.claim_alert(key, minute)
+        except Exception:
+            logger.warning("Failed to claim anomaly alert, sending it anyway", exc_info=True)
+            return True
+
+
+class RedisDetectorState:
+    """
+    Detector state shared by all workers, with one field per (signal, account):
+    - per-minute counts in a hash per minute, {key}:{minute}
+    - checkpointed series in the {key} hash
+    - alert claims in {key}:alert:{signal}:{account}:{minute} keys
+    """
+
+    def __init__(self, redis_url, key, ttl_seconds=86400):
+        import redis
+
+        self.client = redis.Redis.from_url(redis_url)
+        self.key = key
+        self.ttl_seconds = ttl_seconds
+
+    @staticmethod
+    def _field(key):
+        account_sid, signal = key
+        return f"{signal}:{account_sid}"
+
+    @staticmethod
+    def _key(field):
+        signal, _, account_sid = field.decode().partition(':')
+        return account_sid, signal
+
+    def sync(self, increments, minutes, load_keys, checkpoint):
+        """
+        In one pipeline: add {(key, minute): count} increments to the shared minutes, read the
+        given minutes' totals and the checkpoints of load_keys, and save checkpoint
+        ({key: series dict}) when given. Returns ({minute: {key: total}}, {key: RateSeries}).
+        """
+        load_keys = list(load_keys)
+        pipeline = self.client.pipeline(transaction=False)
+        incremented = set()
+        for (key, minute), amount in increments.items():
+            pipeline.hincrby(f"{self.key}:{minute}", self._field(key), amount)
+            incremented.add(minute)
+        for minute in incremented:
+            pipeline.expire(f"{self.key}:{minute}", COUNT_TTL_SECONDS)
+        for minute in minutes:
+            pipeline.hgetall(f"{self.key}:{minute}")
+        if load_keys:
+            pipeline.hmget(self.key, [self._field(key) for key in load_keys])
+        if checkpoint:
+            pipeline.hset(self.key, mapping={self._field(key): json.dumps(state) for key, state in checkpoint.items()})
+            pipeline.expire(self.key, self.ttl_seconds)
+
+        results = pipeline.execute()[len(increments) + len(incremented):]
+        totals = {
+            minute: {self._key(field): int(value) for field, value in fields.items()}
+            for minute, fields in zip(minutes, results)
+        }
+        loaded = {}
+        if load_keys:
+            for key, value in zip(load_keys, results[len(minutes)]):
+                if value:
+                    loaded[key] = RateSeries(**json.loads(value))
+        return totals, loaded
+
+    def claim_alert(self, key, minute):
+        """True for the first worker to alert on key in minute."""
+        claim_key = f"{self.key}:alert:{self._field(key)}:{minute}"
+        return bool(self.client.set(claim_key, 1, nx=True, ex=ALERT_CLAIM_SECONDS))
+
+
+_detector = None
+_detector_lock = threading.Lock()
+
+
+def get_anomaly_detector():
+    """Return the configured detector, or None when anomaly detection is disabled."""
+    global _detector
+
+    config = getattr(settings, 'ERROR_RATE_ANOMALY', {})
+    backend = config.get('BACKEND')
+    if not backend:
+        return None
+
+    with _detector_lock:
+        if _detector is None:
+            shared = None
+            if backend == 'redis':
+                shared = RedisDetectorState(
+                    config.get('REDIS_URL', 'redis://127.0.0.1:6379/0'),
+                    config.get('KEY', 'voiceops:error_rate_detector')
+                )
+            _detector = ErrorRateDetector(
+                alpha=config.get('ALPHA', 0.1),
+                threshold=config.get('THRESHOLD', 4.0),
+                min_count=config.get('MIN_COUNT', 10),
+                warmup_minutes=config.get('WARMUP_MINUTES', 15),
+                shared=shared,
+                sync_seconds=config.get('SYNC_SECONDS', 5),
+                checkpoint_seconds=config.get('CHECKPOINT_SECONDS', 30)
+            )
+            _detector.start(_notify)
+    return _detector
+
+
+def observe_error_event(error_event):
+    """Feed a stored ErrorEvent to the detector; returns the alerts it raised."""
+    detector = get_anomaly_detector()
+    if detector is None:
+        return []
+    return _notify_all(detector.observe(error_event.account_sid, 'error'))
+
+
+def observe_call_event(call_event):
+    """Feed a failed call to the detector; returns the alerts it raised."""
+    detector = get_anomaly_detector()
+    if detector is None or call_event.call_status not in FAILED_CALL_STATUSES:
+        return []
+    return _notify_all(detector.observe(call_event.account_sid, 'failed_call'))
+
+
+def _notify_all(alerts):
+    for alert in alerts:
+        _notify(alert)
+    return alerts
+
+
+def _notify(alert):
+    logger.warning("Error rate anomaly: %s", alert)
+    error_rate_anomaly_notification(alert)
@@ -0,0 +1,191 @@
+"""
+Utility functions for bulk loading archived Event Streams payloads.
+
+Worker processes parse and normalize JSONL lines with the same extraction logic as the
+webhook (event_processing.normalize_*). The loader then writes each batch to a temporary
+staging table with Postgres COPY and upserts it into the event table on event_id, in one
+statement per table. Other databases fall back to bulk_create with update_conflicts.
+
+Each upsert commits on its own, at most COMMIT_BATCH_SIZE rows at a time: delta sync only
+hands out rows once the transactions that could still commit lower ingest_seq values have
+ended (ingest_watermark), so long load transactions would hold it back.
+"""
+import gzip
+import io
+import json
+
+from django.db import connection, transaction
+from django.db.models import Max
+
+from ..models import CallEvent, ErrorEvent, next_ingest_seq_sql
+from .event_processing import event_category, normalize_call_event, normalize_error_event
+
+CALL_EVENT_COLUMNS = (
+    'event_id', 'account_sid', 'call_sid', 'conference_sid', 'event_type', 'call_status',
+    'direction', 'from_number', 'to_number', 'timestamp', 'meta_data'
+)
+ERROR_EVENT_COLUMNS = (
+    'event_id', 'account_sid', 'correlation_sid', 'error_code', 'severity', 'product',
+    'error_message', 'request_sid', 'timestamp', 'meta_data'
+)
+
+# Rows per upsert transaction
+COMMIT_BATCH_SIZE = 1000
+
+BACKFILL_TABLES = {
+    'call': (CallEvent, CALL_EVENT_COLUMNS),
+    'error': (ErrorEvent, ERROR_EVENT_COLUMNS),
+}
+
+
+def iter_lines(path, skip=0):
+    """Yield (line_number, line) for non-empty lines of a JSONL or JSONL.gz file after skip lines."""
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8') as lines:
+        for line_number, line in enumerate(lines, start=1):
+            if line_number <= skip or not line.strip():
+                continue
+            yield line_number, line
+
+
+def normalize_lines(lines, copy_format):
+    """
+    Parse and normalize a batch of JSONL lines (each one event or an array of events).
+    Returns ({'call': rows, 'error': rows}, rejected). With copy_format rows are already
+    encoded as COPY text lines; otherwise they are tuples in column order.
+    """
+    rows = {'call': [], 'error': []}
+    rejected = 0
+
+    for line in lines:
+        try:
+            payload = json.loads(line)
+        except ValueError:
+            rejected += 1
+            continue
+        rejected += _add_rows(rows, payload if isinstance(payload, list) else [payload], copy_format)
+
+    return rows, rejected
+
+
+def normalize_events(events, copy_format):
+    """normalize_lines for already parsed event dicts."""
+    rows = {'call': [], 'error': []}
+    rejected = _add_rows(rows, events, copy_format)
+    return rows, rejected
+
+
+def _add_rows(rows, events, copy_format):
+    """Append normalized rows for events to rows by category. Returns the number rejected."""
+    rejected = 0
+    for event_data in events:
+        try:
+            category = event_category(event_data.get('type', ''))
+            if category == 'call':
+                fields = normalize_call_event(event_data)
+            elif category == 'error':
+                fields = normalize_error_event(event_data)
+            else:
+                fields = None
+        except Exception:
+            fields = None
+
+        if not fields or not fields['event_id']:
+            rejected += 1
+            continue
+
+        row = tuple(fields[column] for column in BACKFILL_TABLES[category][1])
+        rows[category].append(_copy_line(row) if copy_format else row)
+    return rejected
+
+
+def _copy_line(row):
+    """One row in COPY text format: tab separated, \\N for NULL, backslash escapes."""
+    values = []
+    for value in row:
+        if value is None:
+            values.append('\\N')
+            continue
+        if isinstance(value, (dict, list)):
+            value = json.dumps(value)
+        elif hasattr(value, 'isoformat'):
+            value = value.isoformat()
+        else:
+            value = str(value)
+        values.append(
+            value.replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+        )
+    return '\t'.join(values) + '\n'
+
+
+def uses_copy():
+    return connection.vendor == 'postgresql'
+
+
+def load_rows(category, rows):
+    """
+    Upsert normalized rows, committing every COMMIT_BATCH_SIZE rows. Returns (inserted, updated).
+    Upserted rows, updated ones included, get a new ingest_seq so delta sync picks them up.
+    """
+    model, columns = BACKFILL_TABLES[category]
+    upsert = _copy_upsert if uses_copy() else _bulk_upsert
+    inserted = updated = 0
+    for start in range(0, len(rows), COMMIT_BATCH_SIZE):
+        batch_inserted, batch_updated = upsert(model, columns, rows[start:start + COMMIT_BATCH_SIZE])
+        inserted += batch_inserted
+        updated += batch_updated
+    return inserted, updated
+
+
+def _copy_upsert(model, columns, lines):
+    table = model._meta.db_table
+    quote_name = connection.ops.quote_name
+    staging = quote_name(f"{table}_backfill")
+    column_list = ', '.join(quote_name(column) for column in columns)
+    updates = ', '.join(
+        f"{quote_name(column)} = EXCLUDED.{quote_name(column)}" for column in (*columns[1:], 'ingest_seq')
+    )
+    next_seq, params = next_ingest_seq_sql(table)
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE TEMPORARY TABLE IF NOT EXISTS {staging} "
+            f"(LIKE {quote_name(table)} INCLUDING DEFAULTS) ON COMMIT DELETE ROWS"
+        )
+        cursor.execute(f"TRUNCATE {staging}")
+        cursor.copy_expert(f"COPY {staging} ({column_list}) FROM STDIN", io.StringIO(''.join(lines)))
+        # DISTINCT ON: a batch may repeat an event_id, and ON CONFLICT cannot touch a row twice.
+        # xmax = 0 only for freshly inserted rows, which separates inserts from updates.
+        cursor.execute(
+            f"INSERT INTO {quote_name(table)} ({column_list}, ingest_seq) "
+            f"SELECT {column_list}, {next_seq} FROM ("
+            f"SELECT DISTINCT ON (event_id) {column_list} FROM {staging} ORDER BY event_id"
+            f") AS batch "
+            f"ON CONFLICT (event_id) DO UPDATE SET {updates} "
+            f"RETURNING (xmax = 0)",
+            params
+        )
+        results = cursor.fetchall()
+
+    inserted = sum(1 for (was_inserted,) in results if was_inserted)
+    return inserted, len(results) - inserted
+
+
+def _bulk_upsert(model, columns, rows):
+    unique_rows = {row[0]: row for row in rows}
+    with transaction.atomic():
+        existing = set(model.objects.filter(pk__in=list(unique_rows)).values_list('pk', flat=True))
+        # Other backends serialize writes, so numbering from MAX inside the transaction is safe
+        next_seq = (model.objects.aggregate(seq=Max('ingest_seq'))['seq'] or 0) + 1
+        instances = []
+        for offset, row in enumerate(unique_rows.values()):
+            instance = model(**dict(zip(columns, row)))
+            instance.ingest_seq = next_seq + offset
+            instances.append(instance)
+        model.objects.bulk_create(
+            instances,
+            update_conflicts=True,
+            unique_fields=['event_id'],
+            update_fields=[*columns[1:], 'ingest_seq']
+        )
+    return len(unique_rows) - len(existing), len(existing)
@@ -0,0 +1,227 @@
+"""
+Utility functions for the performance benchmark suite.
+
+The suite runs against a database seeded with synthetic traffic at a fixed size and
+measures the hot paths end to end: list endpoints with call_sid deduplication, search,
+daily stats, call and conference traces, and webhook ingest. Each scenario records the
+median wall time and the query count per run; compare_results checks them against a
+stored baseline so query count growth or slowdowns beyond a tolerance fail the run.
+"""
+import json
+import statistics
+import time
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from ..models import CallEvent, CallTiming, ErrorEvent, TimingHistogramBucket
+from .call_trace import build_call_trace, build_conference_trace
+from .synthetic_events import SyntheticTraffic
+
+# Dataset name -> stored events
+BENCHMARK_SIZES = {
+    '10k': 10_000,
+    '1m': 1_000_000,
+    '10m': 10_000_000,
+}
+
+# Average events per call leg in the default synthetic traffic mix
+EVENTS_PER_CALL = 6.7
+SEED_CALLS_PER_SECOND = 5.0
+
+BASELINE_PATH = Path(settings.BASE_DIR) / 'benchmarks' / 'baselines.json'
+
+# Timing differences below this are treated as noise
+MIN_REGRESSION_MS = 2.0
+
+
+class BenchmarkError(Exception):
+    pass
+
+
+def stored_event_count():
+    return CallEvent.objects.count() + ErrorEvent.objects.count()
+
+
+def seed_dataset(size, seed=0, stdout=None, stderr=None):
+    """
+    Replace all stored events and call timing data with a synthetic dataset of about
+    size events whose calls end around now, so daily stats cover part of it.
+    """
+    calls = max(1, round(size / EVENTS_PER_CALL))
+    start = timezone.now() - timedelta(seconds=calls / SEED_CALLS_PER_SECOND)
+
+    models = (CallEvent, ErrorEvent, CallTiming, TimingHistogramBucket)
+    if connection.vendor == 'postgresql':
+        tables = ', '.join(connection.ops.quote_name(model._meta.db_table) for model in models)
+        with connection.cursor() as cursor:
+            cursor.execute(f"TRUNCATE {tables}")
+    else:
+        for model in models:
+            model.objects.all().delete()
+
+    call_command(
+        'generate_events',
+        database=True,
+        calls=calls,
+        seed=seed,
+        start=start.isoformat(),
+        calls_per_second=SEED_CALLS_PER_SECOND,
+        stdout=stdout,
+        stderr=stderr
+    )
+
+
+def benchmark_scenarios():
+    """
+    (name, function) pairs for the read paths, using sample SIDs from the stored data.
+    Each function performs one complete request or trace build.
+    """
+    client = Client(HTTP_HOST='localhost')
+    samples = _sample_sids()
+
+    def get(path):
+        def run():
+            response = client.get(path)
+            if response.status_code != 200:
+                raise BenchmarkError(f"GET {path} returned {response.status_code}")
+        return run
+
+    return [
+        ('call_events.list', get('/api/call-events/')),
+        ('call_events.list_no_pagination', get('/api/call-events/?no_pagination=true')),
+        ('call_events.search_call_sid', get(f"/api/call-events/?search={samples['call_sid']}")),
+        ('call_events.search_number', get(f"/api/call-events/?search={samples['from_number']}")),
+        ('call_events.stats', get('/api/call-events/stats/')),
+        ('error_events.list', get('/api/error-events/')),
+        ('error_events.stats', get('/api/error-events/stats/')),
+        ('build_call_trace', lambda: build_call_trace(samples['call_sid'])),
+        ('build_call_trace.no_payload', lambda: build_call_trace(samples['call_sid'], include_payload=False)),
+        ('build_conference_trace', lambda: build_conference_trace(samples['conference_sid'])),
+    ]
+
+
+def _sample_sids():
+    """Most recent completed call with an error, and the most recently ended conference."""
+    completed = CallEvent.objects.filter(event_type__contains='status-callback.call.completed')
+    error_sids = ErrorEvent.objects.order_by('-timestamp').values_list('correlation_sid', flat=True)[:50]
+    call = completed.filter(call_sid__in=list(error_sids)).order_by('-timestamp').first() or \
+        completed.order_by('-timestamp').first()
+    conference = CallEvent.objects.filter(
+        event_type__contains='status-callback.conference.updated',
+        call_status='conference-end'
+    ).order_by('-timestamp').first()
+    if call is None or conference is None:
+        raise BenchmarkError("No completed calls or conferences stored; seed the dataset first")
+    return {
+        'call_sid': call.call_sid,
+        'from_number': call.from_number,
+        'conference_sid': conference.conference_sid,
+    }
+
+
+def measure(func, repeat, warmup=1):
+    """Run func warmup + repeat times; median/min/max milliseconds and queries of the last run."""
+    for _ in range(warmup):
+        func()
+
+    timings = []
+    queries = 0
+    for _ in range(repeat):
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - start) * 1000)
+        queries = len(captured.captured_queries)
+
+    return {
+        'p50_ms': round(statistics.median(timings), 3),
+        'min_ms': round(min(timings), 3),
+        'max_ms': round(max(timings), 3),
+        'queries': queries,
+    }
+
+
+def measure_ingest(calls, seed=0):
+    """
+    POST freshly generated deliveries to the webhook inside a transaction that is rolled
+    back, so the dataset is unchanged. Error events are left out because they notify Slack.
+    Returns per-delivery latency, events per second and queries per event.
+    """
+    traffic = SyntheticTraffic(seed=seed, error_rate=0, duplicate_rate=0)
+    bodies = [(json.dumps(events), len(events)) for _, events in traffic.deliveries(calls)]
+    client = Client(HTTP_HOST='localhost')
+
+    timings = []
+    event_count = 0
+    with transaction.atomic():
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            for body, size in bodies:
+                start = time.perf_counter()
+                response = client.post('/api/twilio-events', data=body, content_type='application/json')
+                timings.append((time.perf_counter() - start) * 1000)
+                if response.status_code != 204:
+                    raise BenchmarkError(f"Webhook returned {response.status_code}")
+                event_count += size
+            elapsed = time.perf_counter() - started
+        transaction.set_rollback(True)
+
+    return {
+        'p50_ms': round(statistics.median(timings), 3),
+        'min_ms': round(min(timings), 3),
+        'max_ms': round(max(timings), 3),
+        'queries': round(len(captured.captured_queries) / event_count, 2),
+        'events_per_second': round(event_count / elapsed, 1),
+    }
+
+
+def load_baselines(path=BASELINE_PATH):
+    try:
+        with open(path) as baseline_file:
+            return json.load(baseline_file)
+    except FileNotFoundError:
+        return {}
+
+
+def save_baseline(results, size, event_count, path=BASELINE_PATH):
+    """Store results as the baseline for this database vendor and dataset size."""
+    baselines = load_baselines(path)
+    baselines.setdefault(connection.vendor, {})[size] = {'events': event_count, 'results': results}
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w') as baseline_file:
+        json.dump(baselines, baseline_file, indent=2, sort_keys=True)
+        baseline_file.write('\n')
+
+
+def baseline_results(baselines, size):
+    return baselines.get(connection.vendor, {}).get(size, {}).get('results', {})
+
+
+def compare_results(results, baseline, time_tolerance):
+    """
+    Regression messages for results against baseline results. More queries than the
+    baseline is always a regression; a median more than time_tolerance (a fraction) and
+    MIN_REGRESSION_MS slower than the baseline is one too.
+    """
+    regressions = []
+    for name, result in results.items():
+        expected = baseline.get(name)
+        if not expected:
+            continue
+        if result['queries'] > expected['queries']:
+            regressions.append(f"{name}: {result['queries']} queries, baseline {expected['queries']}")
+        limit = expected['p50_ms'] * (1 + time_tolerance)
+        if result['p50_ms'] > limit and result['p50_ms'] - expected['p50_ms'] >= MIN_REGRESSION_MS:
+            regressions.append(
+                f"{name}: median {result['p50_ms']:.2f} ms, baseline {expected['p50_ms']:.2f} ms "
+                f"(+{(result['p50_ms'] / expected['p50_ms'] - 1) * 100:.0f}%)"
+            )
+    return regressions
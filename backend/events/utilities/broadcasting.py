@@ -0,0 +1,246 @@
+"""
+Utilities for broadcasting ingested events to WebSocket clients.
+"""
+import asyncio
+import logging
+import re
+
+from asgiref.sync import async_to_sync
+from voiceops import tracing
+from voiceops.metrics import SIZE_BUCKETS, Histogram
+
+from ..serializers import call_event_values, error_event_values
+from .call_trace import format_call_event, format_error_event
+from .stream_buffer import get_stream_buffer
+
+logger = logging.getLogger(__name__)
+
+
+EVENTS_GROUP_NAME = 'twilio_events'
+
+TRACE_TOPICS = ('call_sid', 'conference_sid')
+
+STREAM_CATEGORIES = ('call', 'error')
+
+# Filter dimension, besides account_sid, used for each category's sub-groups.
+STREAM_VALUE_FILTERS = {
+    'call': 'status',
+    'error': 'severity',
+}
+
+STREAM_WILDCARD = 'all'
+
+MAX_STREAM_FILTER_GROUPS = 100
+
+# Twilio SIDs are alphanumeric; this also keeps group names valid for the channel layer.
+SID_PATTERN = re.compile(r'^[A-Za-z0-9]{1,64}$')
+
+STREAM_VALUE_PATTERN = re.compile(r'^[a-z0-9_-]{1,32}$')
+
+BROADCAST_SECONDS = Histogram(
+    'voiceops_broadcast_seconds', 'Time to send one event to its channel layer groups, by kind (stream, trace)',
+    ['kind']
+)
+BROADCAST_FANOUT = Histogram(
+    'voiceops_broadcast_fanout', 'Channel layer groups one event is sent to, by kind', ['kind'], buckets=SIZE_BUCKETS
+)
+
+
+class StreamFilterError(ValueError):
+    """Stream subscription filters that cannot be satisfied; the message is sent to the client."""
+
+
+def _stream_group_name(category, account_sid, value):
+    return f"stream.{category}.{account_sid}.{value}"
+
+
+def _stream_account_key(account_sid):
+    if account_sid and SID_PATTERN.match(account_sid):
+        return account_sid
+    return None
+
+
+def _stream_value_key(value):
+    value = (value or '').lower()
+    if STREAM_VALUE_PATTERN.match(value):
+        return value
+    return None
+
+
+def stream_group_names(category, account_sid, value):
+    """
+    Filtered stream groups an event is published to.
+    Each event goes to every wildcard combination of its account_sid and
+    status/severity, so a subscriber only needs to join the groups for its own filters.
+    """
+    account_keys = [STREAM_WILDCARD]
+    account_key = _stream_account_key(account_sid)
+    if account_key:
+        account_keys.append(account_key)
+
+    value_keys = [STREAM_WILDCARD]
+    value_key = _stream_value_key(value)
+    if value_key:
+        value_keys.append(value_key)
+
+    return [
+        _stream_group_name(category, account, value)
+        for account in account_keys
+        for value in value_keys
+    ]
+
+
+def filter_group_names(filters):
+    """
+    Groups a connection joins for the given subscription filters.
+    filters may contain category, account_sid, status and severity, each a list of values.
+    Returns [EVENTS_GROUP_NAME] when no filter is set. Raises StreamFilterError when a value
+    is invalid, a status/severity filter names a category that is not selected, or the
+    filters expand to more than MAX_STREAM_FILTER_GROUPS groups.
+    """
+    categories = filters.get('category') or []
+    account_sids = filters.get('account_sid') or []
+    if not any(filters.get(key) for key in ('category', 'account_sid', 'status', 'severity')):
+        return [EVENTS_GROUP_NAME]
+
+    if any(category not in STREAM_CATEGORIES for category in categories):
+        raise StreamFilterError('Invalid category filter')
+
+    if categories:
+        for category, key in STREAM_VALUE_FILTERS.items():
+            if filters.get(key) and category not in categories:
+                raise StreamFilterError(f"A {key} filter requires the {category} category")
+
+    account_keys = [_stream_account_key(account_sid) for account_sid in account_sids] or [STREAM_WILDCARD]
+    if None in account_keys:
+        raise StreamFilterError('Invalid account_sid filter')
+
+    group_names = []
+    for category in categories or STREAM_CATEGORIES:
+        key = STREAM_VALUE_FILTERS[category]
+        value_keys = [_stream_value_key(value) for value in filters.get(key) or []] or [STREAM_WILDCARD]
+        if None in value_keys:
+            raise StreamFilterError(f"Invalid {key} filter")
+        group_names.extend(
+            _stream_group_name(category, account, value)
+            for account in account_keys
+            for value in value_keys
+        )
+
+    group_names = list(dict.fromkeys(group_names))
+    if len(group_names) > MAX_STREAM_FILTER_GROUPS:
+        raise StreamFilterError(f"Filters match more than {MAX_STREAM_FILTER_GROUPS} stream groups")
+    return group_names
+
+
+def trace_group_name(topic, sid):
+    """Channel layer group for live trace subscribers of a call_sid or conference_sid."""
+    if topic not in TRACE_TOPICS or not sid or not SID_PATTERN.match(sid):
+        return None
+    return f"trace.{topic}.{sid}"
+
+
+def broadcast_call_event(channel_layer, call_event):
+    """Send a created CallEvent to the dashboard stream, matching filtered streams and trace subscribers."""
+    sends = {
+        'stream': _stream_sends(
+            [EVENTS_GROUP_NAME] + stream_group_names('call', call_event.account_sid, call_event.call_status),
+            {
+                'type': 'event_message',
+                'event_type': 'call_event',
+                'data': call_event_values.instance_representation(call_event)
+            }
+        )
+    }
+
+    trace_groups = [
+        (topic, sid, trace_group_name(topic, sid))
+        for topic, sid in (('call_sid', call_event.call_sid), ('conference_sid', call_event.conference_sid))
+    ]
+    trace_groups = [group for group in trace_groups if group[2]]
+    if trace_groups:
+        sends['trace'] = _trace_sends(trace_groups, format_call_event(call_event, include_payload=False))
+
+    _group_send(channel_layer, sends)
+
+
+def broadcast_error_event(channel_layer, error_event):
+    """Send a created ErrorEvent to the dashboard stream, matching filtered streams and trace subscribers of its call."""
+    sends = {
+        'stream': _stream_sends(
+            [EVENTS_GROUP_NAME] + stream_group_names('error', error_event.account_sid, error_event.severity),
+            {
+                'type': 'event_message',
+                'event_type': 'error_event',
+                'data': error_event_values.instance_representation(error_event)
+            }
+        )
+    }
+
+    group_name = trace_group_name('call_sid', error_event.correlation_sid)
+    if group_name:
+        sends['trace'] = _trace_sends(
+            [('call_sid', error_event.correlation_sid, group_name)],
+            format_error_event(error_event, include_payload=False)
+        )
+
+    _group_send(channel_layer, sends)
+
+
+def _stream_sends(group_names, message):
+    # Record the message for replay first so live subscribers see the same cursor.
+    stream_buffer = get_stream_buffer()
+    if stream_buffer is not None:
+        try:
+            with tracing.span('stream_buffer.append'):
+                message['cursor'] = stream_buffer.append(group_names, message)
+        except Exception as e:
+            logger.warning("Failed to append event to stream buffer: %s", e)
+
+    # A connection's groups share one wildcard shape per category, so it matches at most one of these.
+    return [(group_name, message) for group_name in group_names]
+
+
+def _trace_sends(trace_groups, formatted_event):
+    return [
+        (
+            group_name,
+            {
+                'type': 'trace_message',
+                'topic': topic,
+                'sid': sid,
+                'data': formatted_event
+            }
+        )
+        for topic, sid, group_name in trace_groups
+    ]
+
+
+def _group_send(channel_layer, sends):
+    """
+    Send {kind: [(group_name, message)]} to the channel layer. All sends run concurrently in
+    one event loop call, so an event costs about one channel layer round trip however many
+    groups it goes to.
+    """
+    for kind, group_sends in sends.items():
+        BROADCAST_FANOUT.observe(len(group_sends), kind=kind)
+    async_to_sync(_group_send_all)(channel_layer, sends)
+
+
+async def _group_send_all(channel_layer, sends):
+    await asyncio.gather(*(
+        _group_send_kind(channel_layer, kind, group_sends)
+        for kind, group_sends in sends.items()
+    ))
+
+
+async def _group_send_kind(channel_layer, kind, group_sends):
+    with BROADCAST_SECONDS.time(kind=kind), _group_send_span(kind, len(group_sends)):
+        await asyncio.gather(*(
+            channel_layer.group_send(group_name, message)
+            for group_name, message in group_sends
+        ))
+
+
+def _group_send_span(kind, group_count):
+    return tracing.span('channel_layer.group_send', **{'broadcast.kind': kind, 'broadcast.groups': group_count})
@@ -0,0 +1,136 @@
+"""
+Utility functions for call timing analytics.
+
+Status callbacks update a per-call CallTiming row at ingest. When both ends of an interval
+are known the measurement is added to hourly, per-account histograms, so percentiles over
+any range are answered from histogram buckets without reading raw events.
+
+A call's first callback only inserts its row, and the row is deleted once every phase is
+known, so the table holds calls in progress. Calls that never reach every phase (busy,
+no-answer, or statuses the account does not subscribe to) are removed by prune_call_timings.
+"""
+from datetime import timezone as dt_timezone
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q, Sum
+
+from ..models import CallTiming, TimingHistogramBucket
+from .histograms import Histogram, bucket_index
+
+# CallStatus value -> CallTiming field holding its first timestamp
+CALL_PHASE_FIELDS = {
+    'initiated': 'initiated_at',
+    'ringing': 'ringing_at',
+    'in-progress': 'answered_at',
+    'completed': 'completed_at',
+}
+
+# metric -> (start field, end field)
+TIMING_METRICS = {
+    'post_dial_delay': ('initiated_at', 'ringing_at'),
+    'ring_time': ('ringing_at', 'answered_at'),
+    'time_to_answer': ('initiated_at', 'answered_at'),
+    'talk_time': ('answered_at', 'completed_at'),
+}
+
+DEFAULT_PERCENTILES = (50, 95, 99)
+
+
+def record_call_timing(call_event):
+    """
+    Update the call's timing state from a status-callback.call event and record every
+    measurement it completes. Returns the recorded (metric, milliseconds) pairs.
+    """
+    field = CALL_PHASE_FIELDS.get(call_event.call_status)
+    if field is None or not call_event.call_sid or 'status-callback.call' not in call_event.event_type:
+        return []
+
+    with transaction.atomic():
+        timing = CallTiming.objects.select_for_update().filter(call_sid=call_event.call_sid).first()
+        if timing is None:
+            # First callback of the call: a single timestamp completes no measurement
+            try:
+                with transaction.atomic():
+                    CallTiming.objects.create(
+                        call_sid=call_event.call_sid,
+                        account_sid=call_event.account_sid,
+                        **{field: call_event.timestamp}
+                    )
+                return []
+            except IntegrityError:
+                # Created concurrently by another worker
+                timing = CallTiming.objects.select_for_update().get(call_sid=call_event.call_sid)
+
+        if getattr(timing, field) is not None:
+            # Retried or duplicate callback: keep the first timestamp
+            return []
+        setattr(timing, field, call_event.timestamp)
+
+        measurements = []
+        for metric, (start_field, end_field) in TIMING_METRICS.items():
+            start, end = getattr(timing, start_field), getattr(timing, end_field)
+            if metric in timing.recorded_metrics or start is None or end is None or end < start:
+                continue
+            measurements.append((metric, int((end - start).total_seconds() * 1000), end))
+
+        if all(getattr(timing, phase_field) is not None for phase_field in CALL_PHASE_FIELDS.values()):
+            # Every phase is known, so no later callback can complete a measurement
+            timing.delete()
+        else:
+            timing.recorded_metrics = timing.recorded_metrics + [metric for metric, _, _ in measurements]
+            timing.save(update_fields=[field, 'recorded_metrics'])
+
+        for metric, value, measured_at in measurements:
+            _increment_bucket(timing.account_sid or '', metric, _period_start(measured_at), bucket_index(value))
+
+    return [(metric, value) for metric, value, _ in measurements]
+
+
+def prune_call_timings(before):
+    """Delete CallTiming rows with no phase timestamp at or after before; returns the number deleted."""
+    stale = Q()
+    for phase_field in CALL_PHASE_FIELDS.values():
+        stale &= Q(**{f'{phase_field}__lt': before}) | Q(**{f'{phase_field}__isnull': True})
+    deleted, _ = CallTiming.objects.filter(stale).delete()
+    return deleted
+
+
+def timing_histograms(start, end, account_sid=None, metrics=None):
+    """
+    Merge the hourly histograms overlapping [start, end) into one Histogram per metric.
+    Hours are whole buckets, so the range is effectively widened to hour boundaries.
+    """
+    metrics = list(metrics or TIMING_METRICS)
+    queryset = TimingHistogramBucket.objects.filter(
+        metric__in=metrics,
+        period_start__gte=_period_start(start),
+        period_start__lt=end
+    )
+    if account_sid:
+        queryset = queryset.filter(account_sid=account_sid)
+
+    histograms = {metric: Histogram() for metric in metrics}
+    for row in queryset.values('metric', 'bucket').annotate(total=Sum('count')):
+        histograms[row['metric']].add_bucket(row['bucket'], row['total'])
+    return histograms
+
+
+def timing_summary(histogram, percents=DEFAULT_PERCENTILES):
+    """Count and percentiles (milliseconds) of a merged histogram."""
+    return {'count': histogram.total, **histogram.percentiles(percents)}
+
+
+def _period_start(value):
+    return value.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+def _increment_bucket(account_sid, metric, period_start, bucket):
+    lookup = {'account_sid': account_sid, 'metric': metric, 'period_start': period_start, 'bucket': bucket}
+    if TimingHistogramBucket.objects.filter(**lookup).update(count=F('count') + 1):
+        return
+    try:
+        with transaction.atomic():
+            TimingHistogramBucket.objects.create(count=1, **lookup)
+    except IntegrityError:
+        # Created concurrently by another worker
+        TimingHistogramBucket.objects.filter(**lookup).update(count=F('count') + 1)
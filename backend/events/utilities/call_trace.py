@@ -1,10 +1,23 @@
 """
 Utility functions for building structured call trace templates.
 """
+import heapq
+import itertools
+
+from django.db.models.fields.json import KeyTransform
+from voiceops.metrics import Histogram
+
 from ..models import CallEvent, ErrorEvent
 
 
-def build_call_trace(call_sid):
+TRACE_STREAM_CHUNK_SIZE = 200
+
+# Streamed traces are timed up to the header; their events are built while the response is sent.
+TRACE_BUILD_SECONDS = Histogram('voiceops_trace_build_seconds', 'Time to build a trace, by kind', ['kind'])
+
+
+@TRACE_BUILD_SECONDS.time(kind='call')
+def build_call_trace(call_sid, include_payload=True):
     """
     Build a structured call trace for a given call_sid.
     Fetches all events from the database and formats them according to event type.
@@ -12,20 +25,150 @@ def build_call_trace(call_sid):
     Returns a dictionary with:
     - header: Call SID, final status, direction, from, to
     - events: List of formatted events with timestamp and type-specific details
+
+    When include_payload is False, meta_data is not loaded from the database and
+    events are returned without their raw payload.
     """
     # Fetch once and iterate once to avoid repeated QuerySet evaluations.
-    call_events = list(CallEvent.objects.filter(call_sid=call_sid).order_by('timestamp'))
+    call_events = list(_call_event_queryset(include_payload).filter(call_sid=call_sid).order_by('timestamp'))
 
     if not call_events:
         return None
 
-    header_source_event = call_events[0]
+    error_events = _error_event_queryset(include_payload).filter(correlation_sid=call_sid).order_by('timestamp')
+    return _assemble_call_trace(call_sid, call_events, error_events, include_payload)
+
+
+@TRACE_BUILD_SECONDS.time(kind='call_batch')
+def build_call_traces(call_sids, include_payload=True):
+    """
+    Build call traces for many call_sids at once.
+    Uses one call_sid__in query and one correlation_sid__in query, then groups in memory,
+    so the query count does not grow with the number of requested calls.
+
+    Returns a dictionary keyed by call_sid. Call SIDs without events are omitted.
+    """
+    call_sids = list(dict.fromkeys(sid for sid in call_sids if sid))
+    if not call_sids:
+        return {}
+
+    call_events_by_sid = {}
+    call_events = _call_event_queryset(include_payload).filter(call_sid__in=call_sids).order_by('timestamp')
+    for event in call_events:
+        call_events_by_sid.setdefault(event.call_sid, []).append(event)
+
+    if not call_events_by_sid:
+        return {}
+
+    error_events_by_sid = {}
+    error_events = _error_event_queryset(include_payload).filter(
+        correlation_sid__in=list(call_events_by_sid)
+    ).order_by('timestamp')
+    for error_event in error_events:
+        error_events_by_sid.setdefault(error_event.correlation_sid, []).append(error_event)
+
+    return {
+        call_sid: _assemble_call_trace(
+            call_sid,
+            call_events_by_sid[call_sid],
+            error_events_by_sid.get(call_sid, []),
+            include_payload
+        )
+        for call_sid in call_sids
+        if call_sid in call_events_by_sid
+    }
+
+
+@TRACE_BUILD_SECONDS.time(kind='call_stream')
+def stream_call_trace(call_sid, include_payload=True):
+    """
+    Build a call trace as a header plus a lazily evaluated event iterator.
+    The header is computed from a payload-free pass; events are then read in chunks
+    (with their payloads when include_payload is True) and formatted one by one as the
+    iterator is consumed.
+
+    Returns (header, events) or None when the call has no events.
+    """
+    # Both passes read through chunked cursors, so memory does not grow with the call length.
+    header_events = _nonempty(
+        _call_event_queryset(False).filter(call_sid=call_sid).order_by('timestamp').iterator(
+            chunk_size=TRACE_STREAM_CHUNK_SIZE
+        )
+    )
+    if header_events is None:
+        return None
+
+    header = _call_trace_header(call_sid, header_events)
+
+    call_events = _call_event_queryset(include_payload).filter(
+        call_sid=call_sid
+    ).order_by('timestamp').iterator(chunk_size=TRACE_STREAM_CHUNK_SIZE)
+    error_events = _error_event_queryset(include_payload).filter(
+        correlation_sid=call_sid
+    ).order_by('timestamp').iterator(chunk_size=TRACE_STREAM_CHUNK_SIZE)
+
+    return header, _merge_formatted_events(call_events, error_events, include_payload)
+
+
+def _call_event_queryset(include_payload):
+    """
+    CallEvent queryset for trace building.
+    Without payloads, meta_data is deferred and only the data.request subtree
+    (needed by the detail handlers) is selected as request_meta.
+    """
+    queryset = CallEvent.objects.all()
+    if include_payload:
+        return queryset
+    return queryset.defer('meta_data').annotate(
+        request_meta=KeyTransform('request', KeyTransform('data', 'meta_data'))
+    )
+
+
+def _error_event_queryset(include_payload):
+    queryset = ErrorEvent.objects.all()
+    if include_payload:
+        return queryset
+    return queryset.defer('meta_data')
+
+
+def _event_meta_data(event):
+    """
+    Return meta_data for an event without triggering a deferred-field query.
+    Payload-free querysets only carry data.request, which is all the parsers read.
+    """
+    if 'meta_data' in event.get_deferred_fields():
+        return {'data': {'request': getattr(event, 'request_meta', None) or {}}}
+    return event.meta_data or {}
+
+
+def _merge_formatted_events(call_events, error_events, include_payload):
+    """Merge timestamp-ordered call and error events into one formatted stream."""
+    formatted_calls = (format_call_event(event, include_payload) for event in call_events)
+    formatted_errors = (format_error_event(error_event, include_payload) for error_event in error_events)
+    merged = heapq.merge(formatted_calls, formatted_errors, key=lambda x: x['timestamp'])
+    return (event for event in merged if event)
+
+
+def _nonempty(events):
+    """The events iterator with its first item put back, or None when it is empty."""
+    first_event = next(events, None)
+    if first_event is None:
+        return None
+    return itertools.chain((first_event,), events)
+
+
+def _call_trace_header(call_sid, call_events):
+    """Build the call trace header from timestamp-ordered call events (any non-empty iterable)."""
+    header_source_event = None
+    last_event = None
     completed_event = None
     participant_label = None
-    events = []
     found_header_source = False
 
     for event in call_events:
+        if header_source_event is None:
+            header_source_event = event
+        last_event = event
         event_type = event.event_type or ''
 
         if not found_header_source and (
@@ -37,18 +180,13 @@ def build_call_trace(call_sid):
         if completed_event is None and 'status-callback.call.completed' in event_type:
             completed_event = event
 
-        meta_data = event.meta_data or {}
-        request_params = meta_data.get('data', {}).get('request', {}).get('parameters', {})
         if participant_label is None:
+            meta_data = _event_meta_data(event)
+            request_params = meta_data.get('data', {}).get('request', {}).get('parameters', {})
             participant_label = request_params.get('ParticipantLabel')
 
-        formatted_event = format_call_event(event)
-        if formatted_event:
-            events.append(formatted_event)
+    final_status_event = completed_event if completed_event else last_event
 
-    final_status_event = completed_event if completed_event else call_events[-1]
-
-    # Build header
     header = {
         'call_sid': call_sid,
         'account_sid': header_source_event.account_sid if header_source_event.account_sid else 'N/A',
@@ -62,35 +200,35 @@ def build_call_trace(call_sid):
     if participant_label:
         header['participant_label'] = participant_label
 
-    # Fetch error events related to this call_sid
-    error_events = ErrorEvent.objects.filter(correlation_sid=call_sid).order_by('timestamp')
-    for error_event in error_events:
-        formatted_error = format_error_event(error_event)
-        if formatted_error:
-            events.append(formatted_error)
-    
-    # Sort all events by timestamp
-    events.sort(key=lambda x: x['timestamp'])
-    
+    return header
+
+
+def _assemble_call_trace(call_sid, call_events, error_events, include_payload=True):
+    """Build header and event list from already loaded, timestamp-ordered events."""
+    header = _call_trace_header(call_sid, call_events)
+    events = list(_merge_formatted_events(call_events, error_events, include_payload))
+
     return {
         'header': header,
         'events': events
     }
 
 
-def format_call_event(event):
+def format_call_event(event, include_payload=True):
     """Format a single call event using a dispatcher-based event parser."""
     event_type = event.event_type or ''
-    meta_data = event.meta_data or {}
+    meta_data = _event_meta_data(event)
     
     # Base event structure
     formatted = {
+        'event_id': event.event_id,
         'timestamp': event.timestamp.isoformat(),
         'event_type': event_type,
         'category': 'call',
         'details': {},
-        'payload': meta_data
     }
+    if include_payload:
+        formatted['payload'] = meta_data
     
     # Extract request parameters from meta_data if available
     request_params = meta_data.get('data', {}).get('request', {}).get('parameters', {})
@@ -236,9 +374,10 @@ CALL_EVENT_HANDLER_MAP = {
 }
 
 
-def format_error_event(error_event):
+def format_error_event(error_event, include_payload=True):
     """Format a single error event."""
-    return {
+    formatted = {
+        'event_id': error_event.event_id,
         'timestamp': error_event.timestamp.isoformat(),
         'event_type': 'error-logs.error.logged',
         'category': 'error',
@@ -248,11 +387,14 @@ def format_error_event(error_event):
             'error_message': error_event.error_message or 'N/A',
             'product': error_event.product or 'N/A'
         },
-        'payload': error_event.meta_data or {}
     }
+    if include_payload:
+        formatted['payload'] = error_event.meta_data or {}
+    return formatted
 
 
-def build_conference_trace(conference_sid):
+@TRACE_BUILD_SECONDS.time(kind='conference')
+def build_conference_trace(conference_sid, include_payload=True):
     """
     Build a structured conference trace for a given conference_sid.
     Fetches all events from the database and formats them according to event type.
@@ -261,48 +403,77 @@ def build_conference_trace(conference_sid):
     - header: Conference SID, friendly name (if available)
     - events: List of formatted events with timestamp and type-specific details
     """
-    # Fetch all conference events for this conference_sid
-    conference_events = CallEvent.objects.filter(conference_sid=conference_sid).order_by('timestamp')
+    # Fetch once so header extraction and formatting share a single query.
+    conference_events = list(
+        _call_event_queryset(include_payload).filter(conference_sid=conference_sid).order_by('timestamp')
+    )
     
-    if not conference_events.exists():
+    if not conference_events:
         return None
     
-    # Extract friendly name if available from any event
-    friendly_name = None
-    for event in conference_events:
-        meta_data = event.meta_data or {}
-        request_params = meta_data.get('data', {}).get('request', {}).get('parameters', {})
-        friendly_name = request_params.get('FriendlyName')
-        if friendly_name:
-            break
+    header = _conference_trace_header(conference_sid, conference_events)
+    events = [format_call_event(event, include_payload) for event in conference_events]
     
-    # Extract reason ended and ended by from last status-callback.conference.updated event
+    return {
+        'header': header,
+        'events': events
+    }
+
+
+@TRACE_BUILD_SECONDS.time(kind='conference_stream')
+def stream_conference_trace(conference_sid, include_payload=True):
+    """
+    Build a conference trace as a header plus a lazily evaluated event iterator.
+    See stream_call_trace for how payloads are loaded.
+
+    Returns (header, events) or None when the conference has no events.
+    """
+    header_events = _nonempty(
+        _call_event_queryset(False).filter(conference_sid=conference_sid).order_by('timestamp').iterator(
+            chunk_size=TRACE_STREAM_CHUNK_SIZE
+        )
+    )
+    if header_events is None:
+        return None
+
+    header = _conference_trace_header(conference_sid, header_events)
+
+    conference_events = _call_event_queryset(include_payload).filter(
+        conference_sid=conference_sid
+    ).order_by('timestamp').iterator(chunk_size=TRACE_STREAM_CHUNK_SIZE)
+
+    return header, (format_call_event(event, include_payload) for event in conference_events)
+
+
+def _conference_trace_header(conference_sid, conference_events):
+    """Build the conference trace header from timestamp-ordered conference events."""
+    friendly_name = None
     reason_ended = None
     ended_by = None
-
-    # Iterate in reverse to get the last occurrence
-    for event in reversed(list(conference_events)):
-        meta_data = event.meta_data or {}
-        request_params = meta_data.get('data', {}).get('request', {}).get('parameters', {})
-        reason_ended = request_params.get('ReasonConferenceEnded')
-        ended_by = request_params.get('CallSidEndingConference')
-        if reason_ended: 
-            break
-    
-    # Extract unique call_sids and their participant labels
     participants = {}
+
     for event in conference_events:
+        meta_data = _event_meta_data(event)
+        request_params = meta_data.get('data', {}).get('request', {}).get('parameters', {})
+
+        # First friendly name wins
+        if not friendly_name:
+            friendly_name = request_params.get('FriendlyName')
+
+        # Last event with an end reason wins
+        if request_params.get('ReasonConferenceEnded'):
+            reason_ended = request_params.get('ReasonConferenceEnded')
+            ended_by = request_params.get('CallSidEndingConference')
+
+        # Unique call_sids and their participant labels
         call_sid = event.call_sid
         if call_sid and call_sid not in participants:
-            meta_data = event.meta_data or {}
-            request_params = meta_data.get('data', {}).get('request', {}).get('parameters', {})
             participant_label = request_params.get('ParticipantLabel')
             participants[call_sid] = {
                 'call_sid': call_sid,
                 'label': participant_label if participant_label else None
             }
     
-    # Build header
     header = {
         'conference_sid': conference_sid,
         'participant_count': len(participants),
@@ -315,18 +486,5 @@ def build_conference_trace(conference_sid):
         header['reason_ended'] = reason_ended
     if ended_by:
         header['ended_by'] = ended_by
-    
-    # Build events list
-    events = []
-    for event in conference_events:
-        formatted_event = format_call_event(event)
-        if formatted_event:
-            events.append(formatted_event)
-    
-    # Sort all events by timestamp
-    events.sort(key=lambda x: x['timestamp'])
-    
-    return {
-        'header': header,
-        'events': events
-    }
+
+    return header
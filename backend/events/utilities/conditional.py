@@ -0,0 +1,119 @@
+"""
+Utility functions for conditional GET (ETag) handling on read endpoints.
+
+Validators are derived from ingest_seq high-water marks instead of hashing the built
+response, so an unchanged resource costs one indexed MAX query and a 304. On PostgreSQL a
+MAX above the ingest watermark also carries the watermark (final_version), since a row
+with a lower ingest_seq can still commit after it.
+"""
+import hashlib
+from functools import wraps
+
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.http import parse_etags
+from rest_framework.response import Response
+
+from ..models import CallEvent, ErrorEvent
+from .ingest_watermark import final_version
+
+
+def table_version(model):
+    """Ingest high-water mark of a table; changes whenever a row is stored."""
+    return final_version((model, model.objects.aggregate(version=Max('ingest_seq'))['version']))
+
+
+def call_trace_version(call_sid):
+    """Version of a call trace: newest stored call event and error event for the call_sid."""
+    call_version = CallEvent.objects.filter(call_sid=call_sid).aggregate(version=Max('ingest_seq'))['version']
+    error_version = ErrorEvent.objects.filter(correlation_sid=call_sid).aggregate(version=Max('ingest_seq'))['version']
+    return final_version((CallEvent, call_version), (ErrorEvent, error_version))
+
+
+def conference_trace_version(conference_sid):
+    """Version of a conference trace: newest stored event for the conference_sid."""
+    version = CallEvent.objects.filter(conference_sid=conference_sid).aggregate(version=Max('ingest_seq'))['version']
+    return final_version((CallEvent, version))
+
+
+def conditional(etag_func):
+    """
+    Decorator for viewset handlers: answer 304 when the client's ETag is current.
+    etag_func receives the handler's request and URL kwargs and must be cheap; it returns
+    None for requests that are not cached.
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, request, *args, **kwargs):
+            etag = etag_func(request, *args, **kwargs)
+            return conditional_response(request, etag, lambda: method(self, request, *args, **kwargs))
+        return wrapper
+    return decorator
+
+
+def table_etag(model, kind, daily=False):
+    """
+    ETag function for a whole-table resource; daily resources also change at midnight.
+    Delta sync requests (?since=) are not cached: rows below the high-water mark can still
+    become visible to them without the mark changing.
+    """
+    def etag_func(request, *args, **kwargs):
+        if 'since' in request.query_params:
+            return None
+        version = table_version(model)
+        if daily:
+            version = f"{version}.{timezone.now().date().isoformat()}"
+        return build_etag(request, kind, version)
+    return etag_func
+
+
+def call_trace_etag(request, call_sid=None, **kwargs):
+    return build_etag(request, 'call-trace', call_trace_version(call_sid))
+
+
+def conference_trace_etag(request, conference_sid=None, **kwargs):
+    return build_etag(request, 'conference-trace', conference_trace_version(conference_sid))
+
+
+def build_etag(request, kind, version):
+    """
+    Weak ETag for a resource version.
+    The full path is included so every query string variant gets its own validator.
+    """
+    variant = hashlib.sha1(request.get_full_path().encode()).hexdigest()[:12]
+    return f'W/"{kind}-{version}-{variant}"'
+
+
+def conditional_response(request, etag, build_response):
+    """
+    Return 304 Not Modified when If-None-Match matches etag, otherwise build the response
+    and attach the validator. Runs inside DRF handlers, so authentication has already happened.
+    """
+    if etag is None:
+        return build_response()
+    if _etag_matches(request, etag):
+        response = Response(status=304)
+    else:
+        response = build_response()
+        if response.status_code != 200:
+            return response
+
+    response['ETag'] = etag
+    # Let browsers store the response but revalidate it on every use.
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def _etag_matches(request, etag):
+    if_none_match = request.headers.get('If-None-Match')
+    if not if_none_match:
+        return False
+    etags = parse_etags(if_none_match)
+    if '*' in etags:
+        return True
+    # Weak comparison, as required for If-None-Match
+    return _strip_weak(etag) in {_strip_weak(candidate) for candidate in etags}
+
+
+def _strip_weak(etag):
+    return etag[2:] if etag.startswith('W/') else etag
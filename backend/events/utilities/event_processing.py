@@ -1,12 +1,26 @@
 import json
+import logging
 import re
 from datetime import datetime
 from functools import wraps
 from email.utils import parsedate_to_datetime
 from urllib.parse import parse_qs, unquote
+from voiceops import tracing
+from voiceops.metrics import Counter, Histogram
 from ..models import CallEvent, ErrorEvent
 from ..integrations.slack import database_call_notification, database_error_notification
 
+logger = logging.getLogger(__name__)
+
+EVENT_HANDLER_SECONDS = Histogram(
+    'voiceops_event_handler_seconds', 'Time to extract event fields, by handler', ['handler']
+)
+DB_WRITE_SECONDS = Histogram('voiceops_db_write_seconds', 'Time to insert an ingested event', ['model'])
+EVENTS_PROCESSED = Counter(
+    'voiceops_events_processed_total', 'Ingested events by handler and outcome (stored, failed)',
+    ['handler', 'outcome']
+)
+
 
 def _handle_processing_errors(event_label, notifier):
     """Decorator to standardize processing error handling and notification."""
@@ -16,7 +30,7 @@ def _handle_processing_errors(event_label, notifier):
             try:
                 return func(event_data, *args, **kwargs)
             except Exception as e:
-                print(f"Error processing {event_label} event: {e}")
+                logger.exception("Error processing %s event", event_label)
                 notifier(event_data)
                 return None
         return wrapper
@@ -31,32 +45,31 @@ def _extract_call_event_context(event_data):
     return data, request, request_params
 
 
-def _create_call_event(event_data, *, timestamp_str, account_sid='', call_sid='', conference_sid='',
+def _call_event_fields(event_data, *, timestamp_str, account_sid='', call_sid='', conference_sid='',
                        call_status='', direction='', from_number='', to_number=''):
-    """Create a CallEvent with consistent field defaults and event metadata."""
+    """CallEvent field values with consistent defaults and event metadata."""
     data, _, _ = _extract_call_event_context(event_data)
-    return CallEvent.objects.create(
-        event_id=data.get('eventSid', ''),
-        account_sid=account_sid,
-        call_sid=call_sid,
-        conference_sid=conference_sid,
-        event_type=event_data.get('type', ''),
-        call_status=call_status,
-        direction=direction,
-        from_number=from_number,
-        to_number=to_number,
-        timestamp=parsedate_to_datetime(timestamp_str),
-        meta_data=event_data
-    )
+    return {
+        'event_id': data.get('eventSid', ''),
+        'account_sid': account_sid,
+        'call_sid': call_sid,
+        'conference_sid': conference_sid,
+        'event_type': event_data.get('type', ''),
+        'call_status': call_status,
+        'direction': direction,
+        'from_number': from_number,
+        'to_number': to_number,
+        'timestamp': parsedate_to_datetime(timestamp_str),
+        'meta_data': event_data
+    }
 
 
-@_handle_processing_errors('status-callback.call', database_call_notification)
 def status_callback_call(event_data):
-    """Process and store a status-callback.call event"""
+    """Extract CallEvent fields from a status-callback.call event"""
     data, _, request_params = _extract_call_event_context(event_data)
     timestamp_str = request_params.get('Timestamp', event_data.get('time', ''))
 
-    return _create_call_event(
+    return _call_event_fields(
         event_data,
         timestamp_str=timestamp_str,
         account_sid=request_params.get('AccountSid', ''),
@@ -68,13 +81,12 @@ def status_callback_call(event_data):
     )
 
 
-@_handle_processing_errors('status-callback.conference-participant', database_call_notification)
 def status_callback_conference_participant(event_data):
-    """Process and store a status-callback.conference-participant event"""
+    """Extract CallEvent fields from a status-callback.conference-participant event"""
     _, _, request_params = _extract_call_event_context(event_data)
     timestamp_str = request_params.get('Timestamp', event_data.get('time', ''))
 
-    return _create_call_event(
+    return _call_event_fields(
         event_data,
         timestamp_str=timestamp_str,
         account_sid=request_params.get('AccountSid', ''),
@@ -84,13 +96,12 @@ def status_callback_conference_participant(event_data):
     )
 
 
-@_handle_processing_errors('status-callback.conference', database_call_notification)
 def status_callback_conference(event_data):
-    """Process and store a status-callback.conference event"""
+    """Extract CallEvent fields from a status-callback.conference event"""
     _, _, request_params = _extract_call_event_context(event_data)
     timestamp_str = request_params.get('Timestamp', event_data.get('time', ''))
 
-    return _create_call_event(
+    return _call_event_fields(
         event_data,
         timestamp_str=timestamp_str,
         account_sid=request_params.get('AccountSid', ''),
@@ -99,13 +110,12 @@ def status_callback_conference(event_data):
     )
 
 
-@_handle_processing_errors('api-request.call', database_call_notification)
 def api_request_call(event_data):
-    """Process and store an api-request.call event"""
+    """Extract CallEvent fields from an api-request.call event"""
     data, _, request_params = _extract_call_event_context(event_data)
     timestamp_str = data.get('requestDateCreated', event_data.get('time', ''))
 
-    return _create_call_event(
+    return _call_event_fields(
         event_data,
         timestamp_str=timestamp_str,
         account_sid=request_params.get('AccountSid', ''),
@@ -115,9 +125,8 @@ def api_request_call(event_data):
     )
 
 
-@_handle_processing_errors('api-request.conference-participant.created', database_call_notification)
 def api_request_conference_participant_created(event_data): 
-    """Process and store an api-request.conference-participant.created event"""
+    """Extract CallEvent fields from an api-request.conference-participant.created event"""
     data, request, request_params = _extract_call_event_context(event_data)
     timestamp_str = data.get('requestDateCreated', event_data.get('time', ''))
 
@@ -127,7 +136,7 @@ def api_request_conference_participant_created(event_data):
     if account_match:
         account_sid = account_match.group(1)
 
-    return _create_call_event(
+    return _call_event_fields(
         event_data,
         timestamp_str=timestamp_str,
         account_sid=account_sid,
@@ -137,9 +146,8 @@ def api_request_conference_participant_created(event_data):
     )
 
 
-@_handle_processing_errors('api-request.conference-participant.modified', database_call_notification)
 def api_request_conference_participant_modified(event_data): # also covers api-request.conference-participant.deleted
-    """Process and store an api-request.conference-participant.modified event"""
+    """Extract CallEvent fields from an api-request.conference-participant.modified event"""
     data, request, _ = _extract_call_event_context(event_data)
     timestamp_str = data.get('requestDateCreated', event_data.get('time', ''))
 
@@ -154,7 +162,7 @@ def api_request_conference_participant_modified(event_data): # also covers api-r
     if participant_match:
         call_sid = participant_match.group(1)
 
-    return _create_call_event(
+    return _call_event_fields(
         event_data,
         timestamp_str=timestamp_str,
         account_sid=account_sid,
@@ -163,15 +171,14 @@ def api_request_conference_participant_modified(event_data): # also covers api-r
     )
 
 
-@_handle_processing_errors('twiml.call', database_call_notification)
 def twiml_call(event_data):
-    """Process and store a twiml.call event"""
+    """Extract CallEvent fields from a twiml.call event"""
     data, _, request_params = _extract_call_event_context(event_data)
     timestamp_str = data.get('requestDateCreated', event_data.get('time', ''))
 
     call_status = request_params.get('CallStatus') or str(data.get('response', {}).get('responseCode', ''))
 
-    return _create_call_event(
+    return _call_event_fields(
         event_data,
         timestamp_str=timestamp_str,
         account_sid=request_params.get('AccountSid', ''),
@@ -183,35 +190,75 @@ def twiml_call(event_data):
     )
 
 
+CALL_EVENT_HANDLERS = (
+    ('status-callback.call', status_callback_call),
+    ('status-callback.conference.participant.updated', status_callback_conference_participant),
+    ('status-callback.conference.updated', status_callback_conference),
+    ('api-request.call', api_request_call),
+    ('api-request.conference-participant.created', api_request_conference_participant_created),
+    ('api-request.conference-participant.modified', api_request_conference_participant_modified),
+    ('api-request.conference-participant.deleted', api_request_conference_participant_modified),
+    ('twiml.call', twiml_call),
+)
+
+
+def event_category(event_type):
+    """'call' or 'error' for an Event Streams type, as routed by the webhook; None when unknown."""
+    if 'com.twilio.voice' in event_type or 'call' in event_type.lower():
+        return 'call'
+    if 'error' in event_type.lower():
+        return 'error'
+    return None
+
+
+def _call_event_handler(event_type):
+    for marker, handler in CALL_EVENT_HANDLERS:
+        if marker in event_type:
+            return marker, handler
+    return None, None
+
+
+def normalize_call_event(event_data):
+    """
+    CallEvent field values for a call event without storing it, or None when no handler
+    matches its type. Raises on malformed events.
+    """
+    _, handler = _call_event_handler(event_data.get('type', ''))
+    if handler is None:
+        return None
+    return handler(event_data)
+
+
 def process_call_event(event_data):
     """
     Router function to process call events based on event type.
-    Routes the event to the appropriate handler function.
+    Routes the event to the appropriate handler function and stores the result.
     """
     event_type = event_data.get('type', '')
-    
-    event_handlers = (
-        ('status-callback.call', status_callback_call),
-        ('status-callback.conference.participant.updated', status_callback_conference_participant),
-        ('status-callback.conference.updated', status_callback_conference),
-        ('api-request.call', api_request_call),
-        ('api-request.conference-participant.created', api_request_conference_participant_created),
-        ('api-request.conference-participant.modified', api_request_conference_participant_modified),
-        ('api-request.conference-participant.deleted', api_request_conference_participant_modified),
-        ('twiml.call', twiml_call),
-    )
 
-    for marker, handler in event_handlers:
-        if marker in event_type:
-            return handler(event_data)
+    marker, handler = _call_event_handler(event_type)
+    if handler is None:
+        logger.warning("No handler found for call event type: %s", event_type)
+        return None
 
-    print(f"No handler found for call event type: {event_type}")
-    return None
+    with tracing.span('process_call_event', handler=marker, event_id=event_data.get('id', '')) as span:
+        call_event = _store_call_event(event_data, marker, handler)
+        if call_event is None:
+            span.set_error('Call event processing failed')
+    EVENTS_PROCESSED.inc(handler=marker, outcome='stored' if call_event else 'failed')
+    return call_event
 
 
-@_handle_processing_errors('error', database_error_notification)
-def process_error_event(event_data):
-    """Process and store an error event"""
+@_handle_processing_errors('call', database_call_notification)
+def _store_call_event(event_data, marker, handler):
+    with EVENT_HANDLER_SECONDS.time(handler=marker):
+        fields = handler(event_data)
+    with DB_WRITE_SECONDS.time(model='CallEvent'), tracing.span('db.insert', model='CallEvent'):
+        return CallEvent.objects.create(**fields)
+
+
+def normalize_error_event(event_data):
+    """ErrorEvent field values for an error event without storing it. Raises on malformed events."""
     event_id = event_data.get('id', '')
     data = event_data.get('data', {})
 
@@ -244,17 +291,35 @@ def process_error_event(event_data):
     except Exception:
         pass
 
-    error_event = ErrorEvent.objects.create(
-        event_id=event_id,
-        account_sid=data.get('account_sid', ''),
-        correlation_sid=data.get('correlation_sid', ''),
-        error_code=data.get('error_code', ''),
-        severity=data.get('level', 'UNKNOWN'),
-        product=data.get('product_name', ''),
-        error_message=error_message,
-        request_sid=data.get('request_sid', ''),
-        timestamp=datetime.fromisoformat(event_data.get('time', '').replace('Z', '+00:00')),
-        meta_data=event_data
-    )
-    print(f"Created error event: {error_event.event_id}")
+    return {
+        'event_id': event_id,
+        'account_sid': data.get('account_sid', ''),
+        'correlation_sid': data.get('correlation_sid', ''),
+        'error_code': data.get('error_code', ''),
+        'severity': data.get('level', 'UNKNOWN'),
+        'product': data.get('product_name', ''),
+        'error_message': error_message,
+        'request_sid': data.get('request_sid', ''),
+        'timestamp': datetime.fromisoformat(event_data.get('time', '').replace('Z', '+00:00')),
+        'meta_data': event_data
+    }
+
+
+def process_error_event(event_data):
+    """Process and store an error event"""
+    with tracing.span('process_error_event', event_id=event_data.get('id', '')) as span:
+        error_event = _store_error_event(event_data)
+        if error_event is None:
+            span.set_error('Error event processing failed')
+    EVENTS_PROCESSED.inc(handler='error', outcome='stored' if error_event else 'failed')
+    return error_event
+
+
+@_handle_processing_errors('error', database_error_notification)
+def _store_error_event(event_data):
+    with EVENT_HANDLER_SECONDS.time(handler='error'):
+        fields = normalize_error_event(event_data)
+    with DB_WRITE_SECONDS.time(model='ErrorEvent'), tracing.span('db.insert', model='ErrorEvent'):
+        error_event = ErrorEvent.objects.create(**fields)
+    logger.info("Created error event: %s", error_event.event_id)
     return error_event
@@ -0,0 +1,180 @@
+"""
+Utility functions for bulk event export.
+
+Rows are read with a server-side cursor (values_list().iterator(chunk_size=...)) and
+encoded chunk by chunk, so an export of any size is streamed to the HTTP response or a
+file without holding the result in memory. Parquet output needs the optional pyarrow
+package.
+"""
+import csv
+import json
+from datetime import timezone as dt_timezone
+
+import orjson
+from django.db import models
+
+from ..models import CallEvent, ErrorEvent
+from ..serializers import call_event_values, error_event_values
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # Parquet export is optional
+    pyarrow = None
+
+EXPORT_MODELS = {
+    'call-events': (CallEvent, call_event_values),
+    'error-events': (ErrorEvent, error_event_values),
+}
+
+EXPORT_CONTENT_TYPES = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+EXPORT_CHUNK_SIZE = 2000
+
+
+def export_rows(model, values_serializer, start=None, end=None, account_sid=None, include_meta_data=False):
+    """
+    Columns and a lazy row iterator for the export, ordered by timestamp.
+    Rows are tuples in column order, read from a server-side cursor.
+    """
+    columns = list(values_serializer.field_names) + ['ingest_seq']
+    if include_meta_data:
+        columns.append('meta_data')
+
+    queryset = model.objects.order_by('timestamp', 'event_id')
+    if start is not None:
+        queryset = queryset.filter(timestamp__gte=start)
+    if end is not None:
+        queryset = queryset.filter(timestamp__lt=end)
+    if account_sid:
+        queryset = queryset.filter(account_sid=account_sid)
+
+    return columns, queryset.values_list(*columns).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+def export_chunks(model, columns, rows, output_format):
+    """Encode rows as a stream of bytes chunks in csv, ndjson or parquet."""
+    if output_format == 'csv':
+        return _csv_chunks(model, columns, rows)
+    if output_format == 'ndjson':
+        return _ndjson_chunks(columns, rows)
+    if output_format == 'parquet':
+        if pyarrow is None:
+            raise ValueError('Parquet export requires the pyarrow package')
+        return _parquet_chunks(model, columns, rows)
+    raise ValueError(f"Unsupported export format: {output_format}")
+
+
+class _Echo:
+    """File-like object for csv.writer that hands back each encoded row."""
+
+    def write(self, value):
+        return value
+
+
+def _csv_chunks(model, columns, rows):
+    writer = csv.writer(_Echo())
+    # Cell encoders for columns that are not plain strings or numbers
+    converters = []
+    for index, column in enumerate(columns):
+        field = model._meta.get_field(column)
+        if isinstance(field, models.DateTimeField):
+            converters.append((index, _csv_datetime))
+        elif isinstance(field, models.JSONField):
+            converters.append((index, json.dumps))
+
+    yield writer.writerow(columns).encode()
+    for batch in _batched(rows, EXPORT_CHUNK_SIZE):
+        lines = []
+        for row in batch:
+            if converters:
+                row = list(row)
+                for index, convert in converters:
+                    if row[index] is not None:
+                        row[index] = convert(row[index])
+            lines.append(writer.writerow(row))
+        yield ''.join(lines).encode()
+
+
+def _csv_datetime(value):
+    return value.astimezone(dt_timezone.utc).isoformat().replace('+00:00', 'Z')
+
+
+def _ndjson_chunks(columns, rows):
+    for batch in _batched(rows, EXPORT_CHUNK_SIZE):
+        yield b''.join(
+            orjson.dumps(dict(zip(columns, row)), option=orjson.OPT_UTC_Z | orjson.OPT_APPEND_NEWLINE)
+            for row in batch
+        )
+
+
+class _ChunkSink:
+    """Write-only stream that collects Parquet output until it is drained."""
+
+    def __init__(self):
+        self.buffer = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        data = bytes(data)
+        self.buffer.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b''.join(self.buffer)
+        self.buffer = []
+        return data
+
+
+def _parquet_chunks(model, columns, rows):
+    schema = pyarrow.schema([(column, _arrow_type(model._meta.get_field(column))) for column in columns])
+    json_columns = [index for index, column in enumerate(columns) if column == 'meta_data']
+
+    sink = _ChunkSink()
+    writer = pyarrow.parquet.ParquetWriter(sink, schema, compression='zstd')
+    try:
+        # One row group per cursor chunk
+        for batch in _batched(rows, EXPORT_CHUNK_SIZE):
+            arrays = [list(values) for values in zip(*batch)]
+            for index in json_columns:
+                arrays[index] = [json.dumps(value) for value in arrays[index]]
+            writer.write_table(pyarrow.Table.from_arrays(arrays, schema=schema))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def _arrow_type(field):
+    if isinstance(field, models.DateTimeField):
+        return pyarrow.timestamp('us', tz='UTC')
+    if isinstance(field, models.BigIntegerField):
+        return pyarrow.int64()
+    # Char, text and JSON (serialized) columns
+    return pyarrow.string()
+
+
+def _batched(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
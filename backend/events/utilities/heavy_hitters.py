@@ -0,0 +1,239 @@
+"""
+Streaming heavy-hitter detection for incident triage.
+
+Ingest feeds error codes, correlation_sids and the to_numbers of failed calls into
+Space-Saving sketches, one per dimension per minute. A "top N over the last W minutes"
+query merges at most W sketches of fixed capacity, so time and memory stay bounded
+regardless of event volume. Counts are upper bounds; each item's possible overcount
+is reported as its error.
+"""
+import heapq
+import threading
+import time
+
+from django.conf import settings
+
+HEAVY_HITTER_DIMENSIONS = ('error_code', 'to_number', 'correlation_sid')
+
+FAILED_CALL_STATUSES = ('failed', 'busy', 'no-answer', 'canceled')
+
+
+class SpaceSaving:
+    """
+    Space-Saving sketch: tracks at most capacity items with (count, error) each.
+
+    The smallest counter is found with a min-heap of (count, item) entries, ordered like the
+    Redis sorted set below. An increment pushes a new entry instead of updating the old one;
+    outdated entries are skipped when they reach the top, and the heap is rebuilt from the
+    counters once it holds twice as many entries as counters, so add() is O(log capacity)
+    amortized.
+    """
+
+    def __init__(self, capacity, counters=None):
+        self.capacity = capacity
+        self.counters = {}
+        self.heap = []
+        if counters:
+            self.counters = {item: list(counter) for item, counter in counters.items()}
+            self._rebuild()
+
+    def add(self, item, count=1):
+        counter = self.counters.get(item)
+        if counter is not None:
+            counter[0] += count
+        elif len(self.counters) < self.capacity:
+            counter = self.counters[item] = [count, 0]
+        else:
+            # Replace the smallest counter; the new item inherits its count as error
+            floor = self._smallest()
+            del self.counters[heapq.heappop(self.heap)[1]]
+            counter = self.counters[item] = [floor + count, floor]
+
+        heapq.heappush(self.heap, (counter[0], item))
+        if len(self.heap) > 2 * len(self.counters) + 16:
+            self._rebuild()
+
+    def merge(self, other):
+        """
+        Combine two sketches. An item missing from a full sketch may have occurred up to
+        that sketch's smallest count, so that floor is added to both its count and error.
+        """
+        self_floor, other_floor = self._floor(), other._floor()
+        merged = {}
+        for item in self.counters.keys() | other.counters.keys():
+            count, error = self.counters.get(item, (self_floor, self_floor))
+            other_count, other_error = other.counters.get(item, (other_floor, other_floor))
+            merged[item] = [count + other_count, error + other_error]
+
+        ranked = sorted(merged.items(), key=_rank)
+        self.counters = dict(ranked[:self.capacity])
+        self._rebuild()
+        return self
+
+    def _floor(self):
+        if len(self.counters) < self.capacity:
+            return 0
+        return self._smallest()
+
+    def _smallest(self):
+        """Smallest count; drops outdated entries from the top of the heap."""
+        while True:
+            count, item = self.heap[0]
+            counter = self.counters.get(item)
+            if counter is not None and counter[0] == count:
+                return count
+            heapq.heappop(self.heap)
+
+    def _rebuild(self):
+        self.heap = [(counter[0], item) for item, counter in self.counters.items()]
+        heapq.heapify(self.heap)
+
+    def top(self, limit):
+        ranked = sorted(self.counters.items(), key=_rank)[:limit]
+        return [{'value': item, 'count': count, 'error': error} for item, (count, error) in ranked]
+
+
+class LocalHeavyHitters:
+    """Per-minute sketches in process memory. Only sees events ingested by this worker."""
+
+    def __init__(self, window_minutes, capacity):
+        self.window_minutes = window_minutes
+        self.capacity = capacity
+        self.slots = {dimension: {} for dimension in HEAVY_HITTER_DIMENSIONS}
+        self.lock = threading.Lock()
+
+    def add(self, dimension, item, now=None):
+        minute = _minute(now)
+        with self.lock:
+            slots = self.slots[dimension]
+            sketch = slots.get(minute)
+            if sketch is None:
+                sketch = slots[minute] = SpaceSaving(self.capacity)
+                for expired in [slot for slot in slots if slot <= minute - self.window_minutes]:
+                    del slots[expired]
+            sketch.add(item)
+
+    def top(self, dimension, window_minutes, limit, now=None):
+        minute = _minute(now)
+        merged = SpaceSaving(self.capacity)
+        with self.lock:
+            for slot, sketch in self.slots[dimension].items():
+                if minute - window_minutes < slot <= minute:
+                    merged.merge(sketch)
+        return merged.top(limit)
+
+
+# Space-Saving update of one sorted set (scores are counts) plus a hash of per-item errors.
+_SPACE_SAVING_SCRIPT = """
+local counts, errors = KEYS[1], KEYS[2]
+local item, capacity, ttl = ARGV[1], tonumber(ARGV[2]), tonumber(ARGV[3])
+if redis.call('ZSCORE', counts, item) or redis.call('ZCARD', counts) < capacity then
+    redis.call('ZINCRBY', counts, 1, item)
+else
+    local smallest = redis.call('ZRANGE', counts, 0, 0, 'WITHSCORES')
+    local floor = tonumber(smallest[2])
+    redis.call('ZREM', counts, smallest[1])
+    redis.call('HDEL', errors, smallest[1])
+    redis.call('ZADD', counts, floor + 1, item)
+    redis.call('HSET', errors, item, floor)
+end
+redis.call('EXPIRE', counts, ttl)
+redis.call('EXPIRE', errors, ttl)
+"""
+
+
+class RedisHeavyHitters:
+    """Per-minute sketches in Redis, shared by all workers and expired after the window."""
+
+    def __init__(self, redis_url, key_prefix, window_minutes, capacity):
+        import redis
+
+        self.client = redis.Redis.from_url(redis_url)
+        self.key_prefix = key_prefix
+        self.window_minutes = window_minutes
+        self.capacity = capacity
+        self.script = self.client.register_script(_SPACE_SAVING_SCRIPT)
+
+    def add(self, dimension, item, now=None):
+        counts_key, errors_key = self._keys(dimension, _minute(now))
+        self.script(keys=[counts_key, errors_key], args=[item, self.capacity, (self.window_minutes + 1) * 60])
+
+    def top(self, dimension, window_minutes, limit, now=None):
+        minute = _minute(now)
+        pipeline = self.client.pipeline(transaction=False)
+        for slot in range(minute - window_minutes + 1, minute + 1):
+            counts_key, errors_key = self._keys(dimension, slot)
+            pipeline.zrange(counts_key, 0, -1, withscores=True)
+            pipeline.hgetall(errors_key)
+        replies = pipeline.execute()
+
+        merged = SpaceSaving(self.capacity)
+        for counts, errors in zip(replies[::2], replies[1::2]):
+            sketch = SpaceSaving(self.capacity, {
+                item.decode(): [int(count), int(errors.get(item, 0))] for item, count in counts
+            })
+            merged.merge(sketch)
+        return merged.top(limit)
+
+    def _keys(self, dimension, minute):
+        base = f"{self.key_prefix}:{dimension}:{minute}"
+        return f"{base}:counts", f"{base}:errors"
+
+
+def _rank(entry):
+    # Highest count first; ties by item, so results do not depend on dict or set order
+    item, (count, _) = entry
+    return -count, item
+
+
+def _minute(now=None):
+    return int((time.time() if now is None else now) // 60)
+
+
+_heavy_hitters = None
+_heavy_hitters_lock = threading.Lock()
+
+
+def get_heavy_hitters():
+    """Return the configured heavy-hitter tracker, or None when disabled."""
+    global _heavy_hitters
+
+    config = getattr(settings, 'HEAVY_HITTERS', {})
+    backend = config.get('BACKEND')
+    if not backend:
+        return None
+
+    with _heavy_hitters_lock:
+        if _heavy_hitters is None:
+            window_minutes = config.get('WINDOW_MINUTES', 60)
+            capacity = config.get('CAPACITY', 200)
+            if backend == 'redis':
+                _heavy_hitters = RedisHeavyHitters(
+                    config.get('REDIS_URL', 'redis://127.0.0.1:6379/0'),
+                    config.get('KEY_PREFIX', 'voiceops:heavy_hitters'),
+                    window_minutes,
+                    capacity
+                )
+            else:
+                _heavy_hitters = LocalHeavyHitters(window_minutes, capacity)
+    return _heavy_hitters
+
+
+def record_error_event_hitters(error_event):
+    """Count a stored ErrorEvent's error_code and correlation_sid."""
+    heavy_hitters = get_heavy_hitters()
+    if heavy_hitters is None:
+        return
+    if error_event.error_code:
+        heavy_hitters.add('error_code', error_event.error_code)
+    if error_event.correlation_sid:
+        heavy_hitters.add('correlation_sid', error_event.correlation_sid)
+
+
+def record_call_event_hitters(call_event):
+    """Count the to_number of a failed call."""
+    heavy_hitters = get_heavy_hitters()
+    if heavy_hitters is None:
+        return
+    if call_event.call_status in FAILED_CALL_STATUSES and call_event.to_number:
+        heavy_hitters.add('to_number', call_event.to_number)
@@ -0,0 +1,77 @@
+"""
+Mergeable log-linear histograms for timing measurements.
+
+Values (milliseconds) map to fixed buckets in the HdrHistogram style: exact below
+2**SUB_BUCKET_BITS, then 2**(SUB_BUCKET_BITS - 1) linear sub-buckets per power of two,
+which bounds the relative error of any reported percentile to under 1%. Every histogram
+shares the same boundaries, so histograms merge by adding their bucket counts.
+"""
+import math
+
+SUB_BUCKET_BITS = 8
+SUB_BUCKET_HALF = 1 << (SUB_BUCKET_BITS - 1)
+
+
+def bucket_index(value):
+    """Bucket holding a non-negative integer value."""
+    value = max(0, int(value))
+    if value < (1 << SUB_BUCKET_BITS):
+        return value
+    shift = value.bit_length() - SUB_BUCKET_BITS
+    return (shift * SUB_BUCKET_HALF) + (value >> shift)
+
+
+def bucket_bounds(index):
+    """Inclusive (lowest, highest) values stored in a bucket."""
+    if index < (1 << SUB_BUCKET_BITS):
+        return index, index
+    shift = index // SUB_BUCKET_HALF - 1
+    lowest = (index - shift * SUB_BUCKET_HALF) << shift
+    return lowest, lowest + (1 << shift) - 1
+
+
+class Histogram:
+    """Sparse bucket counts with percentile queries."""
+
+    def __init__(self, counts=None):
+        self.counts = {}
+        for index, count in (counts or {}).items():
+            self.add_bucket(index, count)
+
+    def record(self, value, count=1):
+        self.add_bucket(bucket_index(value), count)
+
+    def add_bucket(self, index, count):
+        index = int(index)
+        self.counts[index] = self.counts.get(index, 0) + count
+
+    def merge(self, other):
+        for index, count in other.counts.items():
+            self.add_bucket(index, count)
+        return self
+
+    @property
+    def total(self):
+        return sum(self.counts.values())
+
+    def percentile(self, percent):
+        """
+        Value at the given percentile (0-100), reported as the midpoint of its bucket,
+        or None for an empty histogram.
+        """
+        total = self.total
+        if not total:
+            return None
+
+        rank = max(1, math.ceil(total * percent / 100))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                lowest, highest = bucket_bounds(index)
+                return (lowest + highest) // 2
+        return bucket_bounds(max(self.counts))[1]
+
+    def percentiles(self, percents):
+        """{'p50': value, ...} for each requested percentile."""
+        return {f"p{percent:g}": self.percentile(percent) for percent in percents}
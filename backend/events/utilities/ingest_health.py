@@ -0,0 +1,270 @@
+"""
+Utility functions for the health and readiness endpoints.
+
+The webhook processes deliveries synchronously, so the pending ingest work of a worker is
+its in-flight deliveries, and its Slack backlog is its in-flight Slack requests. The
+tracker keeps those plus per-second delivery, event and Slack counts for a short window
+in process memory; recording and reading cost a few microseconds. Dependency checks
+(database, channel layer, Redis) are cached for INGEST_HEALTH['CACHE_SECONDS'], so
+probes from several load balancers cost one round trip per dependency per interval.
+
+A worker is ready when the database and channel layer answer and its ingest lag is at
+most MAX_LAG_SECONDS. Lag is the age of its oldest in-flight delivery or the mean
+delivery time over LAG_WINDOW_SECONDS, whichever is larger.
+"""
+import asyncio
+import itertools
+import threading
+import time
+from collections import deque
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import connection
+
+HEALTH_GROUP_NAME = 'health.ping'
+
+# Settings whose Redis is checked when their BACKEND is redis
+REDIS_FEATURES = ('EVENT_STREAM_REPLAY', 'HEAVY_HITTERS', 'ERROR_RATE_ANOMALY', 'METRICS')
+
+BUCKET_FIELDS = (
+    'deliveries', 'server_errors', 'delivery_seconds', 'events', 'failed_events',
+    'slack_requests', 'slack_failures',
+)
+
+
+def _health_setting(key, default):
+    return getattr(settings, 'INGEST_HEALTH', {}).get(key, default)
+
+
+class IngestHealthTracker:
+    """In-flight work and per-second counts for this process."""
+
+    def __init__(self, window_seconds):
+        self.lock = threading.Lock()
+        self.window_seconds = window_seconds
+        self.tokens = itertools.count()
+        self.deliveries_in_flight = {}
+        self.slack_in_flight = {}
+        # [second, counts by BUCKET_FIELDS], oldest first
+        self.buckets = deque()
+
+    def delivery_started(self):
+        token = next(self.tokens)
+        with self.lock:
+            self.deliveries_in_flight[token] = time.monotonic()
+        return token
+
+    def delivery_finished(self, token, status_code):
+        with self.lock:
+            started = self.deliveries_in_flight.pop(token, None)
+            counts = self._bucket()
+            counts['deliveries'] += 1
+            counts['server_errors'] += status_code >= 500
+            if started is not None:
+                counts['delivery_seconds'] += time.monotonic() - started
+
+    def events_processed(self, events, failed_events):
+        with self.lock:
+            counts = self._bucket()
+            counts['events'] += events
+            counts['failed_events'] += failed_events
+
+    def slack_started(self):
+        token = next(self.tokens)
+        with self.lock:
+            self.slack_in_flight[token] = time.monotonic()
+        return token
+
+    def slack_finished(self, token, ok):
+        with self.lock:
+            self.slack_in_flight.pop(token, None)
+            counts = self._bucket()
+            counts['slack_requests'] += 1
+            counts['slack_failures'] += not ok
+
+    def _bucket(self):
+        second = int(time.monotonic())
+        if not self.buckets or self.buckets[-1][0] != second:
+            self.buckets.append((second, dict.fromkeys(BUCKET_FIELDS, 0)))
+            self._trim(second)
+        return self.buckets[-1][1]
+
+    def _trim(self, second):
+        while self.buckets and self.buckets[0][0] <= second - self.window_seconds:
+            self.buckets.popleft()
+
+    def totals(self, seconds):
+        """Counts summed over the last seconds (at most the tracker window)."""
+        now = time.monotonic()
+        totals = dict.fromkeys(BUCKET_FIELDS, 0)
+        with self.lock:
+            for second, counts in self.buckets:
+                if second > now - seconds:
+                    for field, value in counts.items():
+                        totals[field] += value
+        return totals
+
+    def oldest_in_flight(self):
+        """(count, age in seconds of the oldest) for in-flight deliveries and Slack requests."""
+        now = time.monotonic()
+        with self.lock:
+            deliveries = list(self.deliveries_in_flight.values())
+            slack = list(self.slack_in_flight.values())
+        return (
+            (len(deliveries), now - min(deliveries) if deliveries else 0.0),
+            (len(slack), now - min(slack) if slack else 0.0),
+        )
+
+
+_tracker = None
+_tracker_lock = threading.Lock()
+
+
+def get_ingest_health():
+    """Process-wide tracker."""
+    global _tracker
+    if _tracker is None:
+        with _tracker_lock:
+            if _tracker is None:
+                window = max(_health_setting('LAG_WINDOW_SECONDS', 10), _health_setting('ERROR_WINDOW_SECONDS', 60))
+                _tracker = IngestHealthTracker(window)
+    return _tracker
+
+
+def check_database():
+    start = time.perf_counter()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+            cursor.fetchone()
+    except Exception as e:
+        return {'ok': False, 'error': str(e)}
+    return {'ok': True, 'round_trip_ms': round((time.perf_counter() - start) * 1000, 3)}
+
+
+def check_channel_layer(timeout):
+    """Send to a group nobody joins; a Redis channel layer makes its usual round trips."""
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return {'ok': False, 'error': 'No channel layer configured'}
+
+    async def ping():
+        await asyncio.wait_for(channel_layer.group_send(HEALTH_GROUP_NAME, {'type': 'health.ping'}), timeout)
+
+    start = time.perf_counter()
+    try:
+        async_to_sync(ping)()
+    except Exception as e:
+        return {'ok': False, 'error': str(e) or type(e).__name__}
+    return {'ok': True, 'round_trip_ms': round((time.perf_counter() - start) * 1000, 3)}
+
+
+_redis_clients = {}
+
+
+def check_redis(timeout):
+    """Ping each Redis used by an enabled feature; {url: result}, empty when none uses Redis."""
+    import redis
+
+    urls = {
+        config.get('REDIS_URL', 'redis://127.0.0.1:6379/0')
+        for config in (getattr(settings, feature, {}) for feature in REDIS_FEATURES)
+        if config.get('BACKEND') == 'redis'
+    }
+    results = {}
+    for url in sorted(urls):
+        client = _redis_clients.get(url)
+        if client is None:
+            client = _redis_clients[url] = redis.Redis.from_url(
+                url, socket_timeout=timeout, socket_connect_timeout=timeout
+            )
+        start = time.perf_counter()
+        try:
+            client.ping()
+        except Exception as e:
+            results[_redact(url)] = {'ok': False, 'error': str(e)}
+            continue
+        results[_redact(url)] = {'ok': True, 'round_trip_ms': round((time.perf_counter() - start) * 1000, 3)}
+    return results
+
+
+def _redact(url):
+    # Keep passwords in REDIS_URL out of the response
+    scheme, _, rest = url.partition('://')
+    return f"{scheme}://{rest.rpartition('@')[2]}"
+
+
+_checks = None
+_checks_at = 0.0
+_checks_lock = threading.Lock()
+
+
+def dependency_checks():
+    """Database, channel layer and Redis results, refreshed at most every CACHE_SECONDS."""
+    global _checks, _checks_at
+    with _checks_lock:
+        if _checks is None or time.monotonic() - _checks_at >= _health_setting('CACHE_SECONDS', 1.0):
+            timeout = _health_setting('CHECK_TIMEOUT_SECONDS', 0.5)
+            _checks = {
+                'database': check_database(),
+                'channel_layer': check_channel_layer(timeout),
+                'redis': check_redis(timeout),
+            }
+            _checks_at = time.monotonic()
+        return _checks
+
+
+def health_report(websocket_connections):
+    """
+    Health of this worker. websocket_connections is consumers.connection_stats(), whose
+    queues show how far behind WebSocket broadcast delivery is.
+    """
+    tracker = get_ingest_health()
+    checks = dependency_checks()
+    lag_window = _health_setting('LAG_WINDOW_SECONDS', 10)
+    error_window = _health_setting('ERROR_WINDOW_SECONDS', 60)
+    max_lag = _health_setting('MAX_LAG_SECONDS', 5.0)
+
+    (deliveries_in_flight, oldest_delivery), (slack_in_flight, oldest_slack) = tracker.oldest_in_flight()
+    recent = tracker.totals(lag_window)
+    mean_delivery = recent['delivery_seconds'] / recent['deliveries'] if recent['deliveries'] else 0.0
+    lag = max(oldest_delivery, mean_delivery)
+    errors = tracker.totals(error_window)
+
+    reasons = [f"{name} unreachable" for name in ('database', 'channel_layer') if not checks[name]['ok']]
+    if lag > max_lag:
+        reasons.append(f"ingest lag {lag:.1f}s over {max_lag:g}s")
+    degraded = [f"redis {url} unreachable" for url, result in checks['redis'].items() if not result['ok']]
+
+    return {
+        'status': 'unready' if reasons else 'degraded' if degraded else 'ok',
+        'ready': not reasons,
+        'reasons': reasons + degraded,
+        'checks': checks,
+        'ingest': {
+            'lag_seconds': round(lag, 3),
+            'max_lag_seconds': max_lag,
+            'deliveries_in_flight': deliveries_in_flight,
+            'oldest_in_flight_seconds': round(oldest_delivery, 3),
+            'mean_delivery_seconds': round(mean_delivery, 3),
+            'window_seconds': error_window,
+            'deliveries': errors['deliveries'],
+            'server_errors': errors['server_errors'],
+            'events': errors['events'],
+            'failed_events': errors['failed_events'],
+            'error_rate': round(errors['failed_events'] / errors['events'], 4) if errors['events'] else 0.0,
+        },
+        'slack': {
+            'in_flight': slack_in_flight,
+            'oldest_in_flight_seconds': round(oldest_slack, 3),
+            'requests': errors['slack_requests'],
+            'failures': errors['slack_failures'],
+        },
+        'websocket': {
+            'connections': len(websocket_connections),
+            'queued': sum(item['queue_depth'] for item in websocket_connections),
+            'oldest_queued_seconds': max((item['oldest_queued_seconds'] for item in websocket_connections), default=0),
+        },
+    }
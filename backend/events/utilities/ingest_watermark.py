@@ -0,0 +1,127 @@
+"""
+Utility functions for the ingest_seq high-water mark below which every row is final.
+
+On PostgreSQL an ingest_seq value is drawn when a row is inserted but becomes visible
+when its transaction commits, so a concurrent webhook or a long backfill transaction can
+commit a row below values clients have already seen: delta sync cursors would move past
+it and MAX(ingest_seq) validators would not change. safe_ingest_seq() returns a value at
+or below which every row is final:
+
+- Values are drawn only after the inserting transaction has an id (next_ingest_seq_sql).
+- An observation reads the sequence's last value, then the current snapshot's xmax: every
+  value up to that last value was drawn by a transaction with an id below xmax.
+- Once the snapshot xmin (oldest running transaction) reaches that xmax, all of those
+  transactions have committed or rolled back, and the observed value is safe.
+
+Each process keeps its recent observations per table, so a row reaches delta responses
+once the write transactions running at an earlier poll have ended, and a write
+transaction left open holds deltas back until it ends. final_version() builds ETag
+versions from it. Other backends serialize writes, so they need no watermark:
+safe_ingest_seq() returns None there and final_version() the plain MAX.
+"""
+import threading
+from collections import deque
+
+from django.db import connection
+
+# Observations kept per table while waiting for their transactions to end
+MAX_OBSERVATIONS = 256
+
+
+class IngestWatermark:
+    """Safe ingest_seq per table from this process's sequence and snapshot observations."""
+
+    def __init__(self, max_observations=MAX_OBSERVATIONS):
+        self.lock = threading.Lock()
+        # table -> deque of (snapshot xmax, sequence last value), oldest first
+        self.observations = {}
+        self.safe = {}
+        self.max_observations = max_observations
+
+    def known(self, table):
+        """Highest value already known to be safe; it only grows, so no query is needed."""
+        with self.lock:
+            return self.safe.get(table, 0)
+
+    def observe(self, *tables):
+        """Record an observation of tables; returns {table: highest safe value}."""
+        last_values, xmin, xmax = self._read(tables)
+        return {table: self.record(table, last_value, xmin, xmax) for table, last_value in zip(tables, last_values)}
+
+    def record(self, table, last_value, xmin, xmax):
+        """Add an observation of table and return its highest safe value."""
+        with self.lock:
+            observations = self.observations.setdefault(table, deque(maxlen=self.max_observations))
+            observations.append((xmax, last_value))
+            while observations and observations[0][0] <= xmin:
+                _, value = observations.popleft()
+                self.safe[table] = max(self.safe.get(table, 0), value)
+            return self.safe.get(table, 0)
+
+    def _read(self, tables):
+        """(sequence last values, xmin, xmax): the sequences must be read before the snapshot, in separate statements."""
+        quote_name = connection.ops.quote_name
+        sequences = [quote_name(f'{table}_ingest_seq') for table in tables]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT " + ", ".join(
+                    f"(SELECT CASE WHEN is_called THEN last_value ELSE last_value - 1 END FROM {sequence})"
+                    for sequence in sequences
+                )
+            )
+            last_values = cursor.fetchone()
+            # Oldest transaction still running besides this one; its own rows are visible to it
+            cursor.execute(
+                "SELECT (SELECT MIN(xid::text::bigint) FROM pg_snapshot_xip(s) AS xid), "
+                "pg_snapshot_xmax(s)::text::bigint FROM pg_current_snapshot() AS s"
+            )
+            oldest_running, xmax = cursor.fetchone()
+        return last_values, (xmax if oldest_running is None else oldest_running), xmax
+
+
+_watermark = None
+_watermark_lock = threading.Lock()
+
+
+def get_ingest_watermark():
+    """Process-wide watermark."""
+    global _watermark
+    if _watermark is None:
+        with _watermark_lock:
+            if _watermark is None:
+                _watermark = IngestWatermark()
+    return _watermark
+
+
+def uses_watermark():
+    return connection.vendor == 'postgresql'
+
+
+def safe_ingest_seq(model):
+    """Highest ingest_seq of model that delta sync may hand out, or None when every row is final."""
+    if not uses_watermark():
+        return None
+    table = model._meta.db_table
+    return get_ingest_watermark().observe(table)[table]
+
+
+def final_version(*versions):
+    """
+    Validator string for (model, MAX(ingest_seq)) pairs. A MAX at or below the watermark is
+    final: no row can still commit below it, so it is used as is. Otherwise the watermark is
+    appended, so a row committing late below the MAX changes the version once it is safe.
+    The watermark is only read from the database when a MAX is above the known safe value.
+    """
+    if not uses_watermark():
+        return '.'.join(str(version or 0) for _, version in versions)
+
+    watermark = get_ingest_watermark()
+    tables = [model._meta.db_table for model, _ in versions]
+    pending = [table for table, (_, version) in zip(tables, versions) if (version or 0) > watermark.known(table)]
+    safe = watermark.observe(*dict.fromkeys(pending)) if pending else {}
+
+    parts = []
+    for table, (_, version) in zip(tables, versions):
+        version = version or 0
+        parts.append(str(version) if table not in safe or version <= safe[table] else f"{version}~{safe[table]}")
+    return '.'.join(parts)
@@ -0,0 +1,142 @@
+"""
+Bounded replay buffer for the WebSocket event stream.
+
+Every broadcast stream message is appended with a monotonically increasing cursor,
+so reconnecting clients can ask for the messages they missed instead of reloading
+whole lists. Backed by a Redis Stream trimmed to MAX_EVENTS entries, or by an
+in-process ring buffer for single-process development.
+"""
+import itertools
+import json
+import threading
+from collections import deque
+
+from django.conf import settings
+
+
+def cursor_key(cursor):
+    """Sortable key for a cursor ("<ms>-<seq>"), or None if it is malformed."""
+    try:
+        first, _, second = str(cursor).partition('-')
+        return int(first), int(second or 0)
+    except (TypeError, ValueError):
+        return None
+
+
+class LocalStreamBuffer:
+    """In-process ring buffer. Only suitable when a single process serves WebSockets."""
+
+    def __init__(self, max_events):
+        self.entries = deque(maxlen=max_events)
+        self.counter = itertools.count(1)
+        self.lock = threading.Lock()
+
+    def append(self, groups, message):
+        with self.lock:
+            cursor = f"{next(self.counter)}-0"
+            self.entries.append((cursor, groups, message))
+        return cursor
+
+    def since(self, cursor, limit):
+        """
+        Entries after cursor as (cursor, groups, message) tuples.
+        Returns None when the gap cannot be replayed: the cursor is unknown, entries after it
+        were trimmed or lost (an empty buffer after a restart), or more than limit are missing.
+        """
+        after = cursor_key(cursor)
+        with self.lock:
+            entries = list(self.entries)
+
+        bounds = (entries[0][0], entries[-1][0]) if entries else None
+        # Cursors here are consecutive counters, so the oldest entry may directly follow the client's
+        if after is None or not _is_replayable(after, bounds, contiguous=True):
+            return None
+
+        missed = [entry for entry in entries if cursor_key(entry[0]) > after]
+        if len(missed) > limit:
+            return None
+        return missed
+
+
+class RedisStreamBuffer:
+    """Redis Stream shared by all workers, trimmed approximately to max_events."""
+
+    def __init__(self, redis_url, key, max_events):
+        import redis
+
+        self.client = redis.Redis.from_url(redis_url)
+        self.key = key
+        self.max_events = max_events
+
+    def append(self, groups, message):
+        cursor = self.client.xadd(
+            self.key,
+            {'groups': json.dumps(groups), 'message': json.dumps(message)},
+            maxlen=self.max_events,
+            approximate=True
+        )
+        return cursor.decode()
+
+    def since(self, cursor, limit):
+        """See LocalStreamBuffer.since."""
+        after = cursor_key(cursor)
+        if after is None:
+            return None
+
+        oldest = self.client.xrange(self.key, count=1)
+        newest = self.client.xrevrange(self.key, count=1)
+        bounds = (oldest[0][0].decode(), newest[0][0].decode()) if oldest and newest else None
+        if not _is_replayable(after, bounds, contiguous=False):
+            return None
+
+        entries = self.client.xrange(self.key, min=f"({after[0]}-{after[1]}", count=limit + 1)
+        if len(entries) > limit:
+            return None
+
+        return [
+            (entry_id.decode(), json.loads(fields[b'groups']), json.loads(fields[b'message']))
+            for entry_id, fields in entries
+        ]
+
+
+def _is_replayable(after, bounds, contiguous):
+    """
+    Whether every entry after the client's cursor is still buffered. bounds is the
+    (oldest, newest) buffered cursor pair, or None for an empty buffer, which only a client
+    that has seen nothing (cursor 0) can replay from: otherwise a restart, trim or flush
+    dropped what it missed. The client's last seen entry must still be buffered, or with
+    contiguous cursors be the one right before the oldest; a cursor newer than anything
+    buffered means the buffer was reset.
+    """
+    if bounds is None:
+        return after == (0, 0)
+    oldest, newest = cursor_key(bounds[0]), cursor_key(bounds[1])
+    first_missed = (after[0] + 1, 0) if contiguous else after
+    return oldest <= first_missed and after <= newest
+
+
+_stream_buffer = None
+_stream_buffer_lock = threading.Lock()
+
+
+def get_stream_buffer():
+    """Return the configured replay buffer, or None when replay is disabled."""
+    global _stream_buffer
+
+    config = getattr(settings, 'EVENT_STREAM_REPLAY', {})
+    backend = config.get('BACKEND')
+    if not backend:
+        return None
+
+    with _stream_buffer_lock:
+        if _stream_buffer is None:
+            max_events = config.get('MAX_EVENTS', 10000)
+            if backend == 'redis':
+                _stream_buffer = RedisStreamBuffer(
+                    config.get('REDIS_URL', 'redis://127.0.0.1:6379/0'),
+                    config.get('KEY', 'voiceops:event_stream'),
+                    max_events
+                )
+            else:
+                _stream_buffer = LocalStreamBuffer(max_events)
+    return _stream_buffer
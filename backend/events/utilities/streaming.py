@@ -0,0 +1,30 @@
+"""
+Utility functions for streaming responses backed by database cursors.
+
+Under ASGI, Django consumes a synchronous StreamingHttpResponse iterator with
+sync_to_async(list), so the whole body is built in memory before the first byte is
+sent. iterate_in_thread() wraps a synchronous iterator in an async one that produces
+each item with a thread-sensitive sync_to_async call: items are sent as they are
+produced, and the database cursor behind the iterator stays on the thread that ran the
+view. Each item costs one thread hop, so iterators should yield chunks, not rows.
+"""
+from asgiref.sync import sync_to_async
+
+_END = object()
+
+
+async def iterate_in_thread(iterator):
+    """Async iterator over a synchronous one; closes it on the same thread when done or abandoned."""
+    iterator = iter(iterator)
+    next_item = sync_to_async(next, thread_sensitive=True)
+    try:
+        while True:
+            item = await next_item(iterator, _END)
+            if item is _END:
+                return
+            yield item
+    finally:
+        # Releases the server-side cursor when the client disconnects mid-stream
+        close = getattr(iterator, 'close', None)
+        if close is not None:
+            await sync_to_async(close, thread_sensitive=True)()
@@ -0,0 +1,559 @@
+"""
+Utility functions for generating synthetic Twilio Event Streams traffic.
+
+SyntheticTraffic produces seeded, reproducible event graphs shaped like production
+deliveries and accepted by event_processing and call_trace:
+- single calls (outbound-api and inbound) with api-request.call, twiml.call and
+  status-callback.call events through initiated/ringing/in-progress and a final status
+- conferences whose participants are calls of their own: participant API requests,
+  join/hold/unhold/mute/unmute/leave callbacks and conference start/end callbacks
+- error-logs events correlated with the failing call and phase
+
+Each event gets a random delivery delay and some are delivered twice, and events are
+emitted in delivery order as batches like the Event Streams webhook sink, so consumers
+see out-of-order and duplicate events. Generation is streamed: memory is bounded by
+the calls still in flight, not by the number of calls generated.
+"""
+import heapq
+import json
+import math
+import random
+from datetime import datetime, timedelta, timezone as dt_timezone
+from email.utils import format_datetime
+from urllib.parse import urlencode
+
+VOICE_TYPE_PREFIX = 'com.twilio.voice.'
+ERROR_EVENT_TYPE = 'com.twilio.error-logs.error.logged'
+DEFAULT_START = datetime(2026, 1, 1, tzinfo=dt_timezone.utc)
+
+WEBHOOK_BASE_URL = 'https://voice.example.com/twilio'
+API_BASE_URL = 'https://api.twilio.com/2010-04-01'
+
+# (area code, city, state, zip)
+NUMBER_REGIONS = (
+    ('212', 'NEW YORK', 'NY', '10001'),
+    ('415', 'SAN FRANCISCO', 'CA', '94103'),
+    ('312', 'CHICAGO', 'IL', '60601'),
+    ('512', 'AUSTIN', 'TX', '78701'),
+    ('617', 'BOSTON', 'MA', '02108'),
+    ('206', 'SEATTLE', 'WA', '98101'),
+    ('305', 'MIAMI', 'FL', '33101'),
+    ('720', 'DENVER', 'CO', '80202'),
+)
+
+# Final status of a single call -> weight
+CALL_OUTCOMES = {'completed': 0.74, 'no-answer': 0.11, 'busy': 0.06, 'failed': 0.05, 'canceled': 0.04}
+
+SIP_RESPONSE_CODES = {'completed': '200', 'no-answer': '487', 'busy': '486', 'failed': '404', 'canceled': '487'}
+
+# error code -> (level, message)
+ERROR_CODES = {
+    '11200': ('ERROR', 'HTTP retrieval failure'),
+    '11205': ('ERROR', 'HTTP connection failure'),
+    '12100': ('ERROR', 'Document parse failure'),
+    '13227': ('WARNING', 'Dial: No International Authorization'),
+    '21211': ('ERROR', "Invalid 'To' Phone Number"),
+    '31005': ('ERROR', 'Connection error: the call was disconnected unexpectedly'),
+    '32011': ('WARNING', 'Error communicating with your SIP communications infrastructure'),
+    '82002': ('WARNING', 'Error on Twiml Execution'),
+}
+
+# Errors raised in each call phase
+PHASE_ERROR_CODES = {
+    'dial': ('21211', '13227'),
+    'twiml': ('11200', '11205', '12100', '82002'),
+    'media': ('31005', '32011'),
+}
+
+
+class SyntheticTraffic:
+    """
+    Seeded generator of Event Streams deliveries.
+    Calls start as a Poisson process at calls_per_second, spread over accounts with a
+    Zipf-like skew; each new call graph is a conference with probability conference_share.
+    """
+
+    def __init__(self, seed=0, start=None, calls_per_second=5.0, accounts=20, conference_share=0.2,
+                 error_rate=0.03, duplicate_rate=0.01, max_delay=30.0, max_batch=10):
+        self.rng = random.Random(seed)
+        self.start = start or DEFAULT_START
+        self.calls_per_second = calls_per_second
+        self.conference_share = conference_share
+        self.error_rate = error_rate
+        self.duplicate_rate = duplicate_rate
+        self.max_delay = max_delay
+        self.max_batch = max_batch
+
+        self.accounts = [self._sid('AC') for _ in range(accounts)]
+        self.account_weights = [1 / (rank + 1) for rank in range(accounts)]
+        self.account_numbers = {
+            account_sid: [self._number() for _ in range(self.rng.randint(2, 20))] for account_sid in self.accounts
+        }
+
+    def deliveries(self, calls):
+        """Yield (delivered_at, events) batches in delivery order until calls call legs are generated."""
+        pending = []
+        sequence = 0
+        generated = 0
+        clock = self.start
+        batch = []
+        batch_size = self.rng.randint(1, self.max_batch)
+
+        while generated < calls:
+            clock += timedelta(seconds=self.rng.expovariate(self.calls_per_second))
+            graph = []
+            if self.rng.random() < self.conference_share:
+                generated += self._conference(clock, graph)
+            else:
+                self._single_call(clock, graph)
+                generated += 1
+
+            for occurred_at, event in graph:
+                for _ in range(2 if self.rng.random() < self.duplicate_rate else 1):
+                    heapq.heappush(pending, (occurred_at + timedelta(seconds=self._delay()), sequence, event))
+                    sequence += 1
+
+            # Later graphs start after clock, so anything due by now is final in order
+            while pending and pending[0][0] <= clock:
+                delivered_at, _, event = heapq.heappop(pending)
+                batch.append(event)
+                if len(batch) >= batch_size:
+                    yield delivered_at, batch
+                    batch = []
+                    batch_size = self.rng.randint(1, self.max_batch)
+
+        while pending:
+            delivered_at, _, event = heapq.heappop(pending)
+            batch.append(event)
+            if len(batch) >= batch_size or not pending:
+                yield delivered_at, batch
+                batch = []
+                batch_size = self.rng.randint(1, self.max_batch)
+
+    def _delay(self):
+        """Delivery delay in seconds: mostly sub-second with a long tail, capped at max_delay."""
+        return min(self.max_delay, self.rng.lognormvariate(math.log(0.4), 1.3))
+
+    def _sid(self, prefix):
+        return f"{prefix}{self.rng.getrandbits(128):032x}"
+
+    def _number(self):
+        area_code, city, state, zip_code = self.rng.choice(NUMBER_REGIONS)
+        return {
+            'number': f"+1{area_code}{self.rng.randint(2000000, 9999999)}",
+            'city': city,
+            'state': state,
+            'zip': zip_code,
+        }
+
+    def _account(self):
+        return self.rng.choices(self.accounts, self.account_weights)[0]
+
+    def _new_call(self, account_sid, direction):
+        business_number = self.rng.choice(self.account_numbers[account_sid])
+        customer_number = self._number()
+        inbound = direction == 'inbound'
+        return {
+            'sid': self._sid('CA'),
+            'account_sid': account_sid,
+            'direction': direction,
+            'from': customer_number if inbound else business_number,
+            'to': business_number if inbound else customer_number,
+            'sequence': 0,
+        }
+
+    # Single calls
+
+    def _single_call(self, at, graph):
+        call = self._new_call(self._account(), self.rng.choice(('outbound-api', 'inbound')))
+        outcome = self.rng.choices(list(CALL_OUTCOMES), list(CALL_OUTCOMES.values()))[0]
+        failing_phase = self._failing_phase(outcome)
+
+        if call['direction'] == 'outbound-api':
+            graph.append((at, self._api_call_request(call, at)))
+            at = self._after(at, 0.05, 0.3)
+        graph.append((at, self._status(call, 'initiated', at)))
+
+        if outcome == 'failed':
+            at = self._after(at, 0.3, 2)
+            if failing_phase == 'dial':
+                graph.append((at, self._error(call, self.rng.choice(PHASE_ERROR_CODES['dial']), at)))
+            graph.append((at, self._status(call, 'failed', at)))
+            return
+
+        at = self._after(at, 1, 6)
+        graph.append((at, self._status(call, 'ringing', at)))
+        if call['direction'] == 'inbound':
+            at = self._after(at, 0.1, 0.5)
+            graph.append((at, self._twiml(call, 'ringing', at, failing_phase == 'twiml')))
+            if failing_phase == 'twiml':
+                graph.append((at, self._error(call, self.rng.choice(PHASE_ERROR_CODES['twiml']), at)))
+
+        if outcome != 'completed':
+            at = self._after(at, *{'no-answer': (25, 35), 'busy': (0.5, 3), 'canceled': (2, 20)}[outcome])
+            graph.append((at, self._status(call, outcome, at)))
+            return
+
+        at = self._after(at, 2, 25)
+        answered_at = at
+        if call['direction'] == 'outbound-api':
+            graph.append((at, self._twiml(call, 'in-progress', at, failing_phase == 'twiml')))
+            if failing_phase == 'twiml':
+                graph.append((at, self._error(call, self.rng.choice(PHASE_ERROR_CODES['twiml']), at)))
+        at = self._after(at, 0.05, 0.3)
+        graph.append((at, self._status(call, 'in-progress', at)))
+
+        at = at + timedelta(seconds=self._talk_seconds(90))
+        if failing_phase == 'media':
+            graph.append((at, self._error(call, self.rng.choice(PHASE_ERROR_CODES['media']), at)))
+        graph.append((at, self._status(call, 'completed', at, duration=(at - answered_at).total_seconds())))
+
+    def _failing_phase(self, outcome):
+        if self.rng.random() >= self.error_rate:
+            return None
+        if outcome == 'failed':
+            return 'dial'
+        if outcome == 'completed':
+            return self.rng.choice(('twiml', 'media'))
+        return None
+
+    # Conferences
+
+    def _conference(self, at, graph):
+        """Add a conference graph starting at at. Returns the number of call legs in it."""
+        account_sid = self._account()
+        conference = {
+            'sid': self._sid('CF'),
+            'account_sid': account_sid,
+            'friendly_name': f"support-{self.rng.randint(1, 99999)}",
+            'sequence': 0,
+        }
+        participant_count = self.rng.choice((2, 2, 2, 3, 3, 4, 5))
+
+        # The customer calls in and is placed in the conference by TwiML
+        customer = self._new_call(account_sid, 'inbound')
+        graph.append((at, self._status(customer, 'initiated', at)))
+        at = self._after(at, 0.5, 2)
+        graph.append((at, self._status(customer, 'ringing', at)))
+        at = self._after(at, 0.1, 0.5)
+        graph.append((at, self._twiml(customer, 'ringing', at, False, conference)))
+        at = self._after(at, 0.2, 1)
+        customer_answered_at = at
+        graph.append((at, self._status(customer, 'in-progress', at)))
+
+        at = self._after(at, 0.3, 1)
+        participants = [(customer, 'customer', {'EndConferenceOnExit': 'true', 'Coaching': 'false'})]
+        graph.append((at, self._participant(conference, customer, 'customer', 'participant-join', at,
+                                            participants[0][2])))
+        graph.append((at, self._conference_event(conference, 'conference-start', at)))
+
+        # Agents (and a coaching supervisor in larger rooms) are dialed in through the API
+        joined = []
+        agent_at = at
+        for index in range(1, participant_count):
+            label = 'supervisor' if index == 3 else f"agent-{self.rng.randint(1, 400)}"
+            flags = {'EndConferenceOnExit': 'false', 'Coaching': 'true' if label == 'supervisor' else 'false'}
+            agent = self._new_call(account_sid, 'outbound-api')
+            agent_at = self._after(agent_at, 2, 20)
+            graph.append((agent_at, self._participant_request(conference, agent, 'created', agent_at, {
+                'From': agent['from']['number'], 'To': agent['to']['number'], 'Label': label,
+                'Coaching': flags['Coaching'], 'Muted': 'false', 'Beep': 'onEnter',
+            })))
+            call_at = self._after(agent_at, 0.05, 0.3)
+            graph.append((call_at, self._status(agent, 'initiated', call_at)))
+            call_at = self._after(call_at, 1, 4)
+            graph.append((call_at, self._status(agent, 'ringing', call_at)))
+            call_at = self._after(call_at, 2, 12)
+            graph.append((call_at, self._status(agent, 'in-progress', call_at)))
+            join_at = self._after(call_at, 0.2, 0.8)
+            graph.append((join_at, self._participant(conference, agent, label, 'participant-join', join_at, flags)))
+            participants.append((agent, label, flags))
+            joined.append((agent, label, flags, call_at, join_at))
+
+        end_at = agent_at + timedelta(seconds=self._talk_seconds(240))
+
+        # Supervisors and extra agents may leave early; the customer's exit ends the conference
+        early_leaves = {}
+        for agent, label, _, _, join_at in joined[1:]:
+            if self.rng.random() < 0.5:
+                early_leaves[agent['sid']] = (self._between(join_at, end_at), self.rng.random() < 0.5)
+
+        # Customer hold episodes requested by the first agent, agent mute episodes
+        if joined and self.rng.random() < 0.4:
+            hold_at = self._between(joined[0][4], end_at)
+            unhold_at = min(end_at - timedelta(seconds=1), hold_at + timedelta(seconds=self.rng.uniform(10, 120)))
+            if unhold_at > hold_at:
+                self._participant_update(graph, conference, participants[0], 'Hold', hold_at, unhold_at)
+        for agent, label, flags, _, join_at in joined:
+            if self.rng.random() < 0.2:
+                until = early_leaves.get(agent['sid'], (end_at,))[0]
+                mute_at = self._between(join_at, until)
+                unmute_at = min(until - timedelta(seconds=1), mute_at + timedelta(seconds=self.rng.uniform(5, 60)))
+                if unmute_at > mute_at:
+                    self._participant_update(graph, conference, (agent, label, flags), 'Muted', mute_at, unmute_at)
+
+        remaining = []
+        for agent, label, flags, answered_at, _ in joined:
+            if agent['sid'] not in early_leaves:
+                remaining.append((agent, label, flags, answered_at))
+                continue
+            leave_at, removed = early_leaves[agent['sid']]
+            if removed:
+                graph.append((leave_at, self._participant_request(conference, agent, 'deleted', leave_at, {})))
+                leave_at = self._after(leave_at, 0.1, 0.4)
+            reason = 'participant_updated_via_api' if removed else 'participant_hung_up'
+            self._participant_leave(graph, conference, agent, label, flags, answered_at, leave_at, reason)
+
+        self._participant_leave(graph, conference, customer, 'customer', participants[0][2],
+                                customer_answered_at, end_at, 'participant_hung_up')
+        end_conference_at = self._after(end_at, 0.05, 0.2)
+        graph.append((end_conference_at, self._conference_event(conference, 'conference-end', end_conference_at, {
+            'ReasonConferenceEnded': 'participant-with-end-conference-on-exit-left',
+            'CallSidEndingConference': customer['sid'],
+            'ParticipantLabelEndingConference': 'customer',
+        })))
+        for agent, label, flags, answered_at in remaining:
+            leave_at = self._after(end_conference_at, 0.05, 0.3)
+            self._participant_leave(graph, conference, agent, label, flags, answered_at, leave_at,
+                                    'participant_with_end_conference_on_exit_left')
+
+        return participant_count
+
+    def _participant_update(self, graph, conference, participant, flag, on_at, off_at):
+        call, label, flags = participant
+        callback = {'Hold': 'hold', 'Muted': 'mute'}[flag]
+        for value, at in (('true', on_at), ('false', off_at)):
+            graph.append((at, self._participant_request(conference, call, 'modified', at, {flag: value})))
+            at = self._after(at, 0.1, 0.4)
+            flags = dict(flags, **{flag: value})
+            status = f"participant-{callback}" if value == 'true' else f"participant-un{callback}"
+            graph.append((at, self._participant(conference, call, label, status, at, flags)))
+
+    def _participant_leave(self, graph, conference, call, label, flags, answered_at, at, reason):
+        graph.append((at, self._participant(conference, call, label, 'participant-leave', at, flags,
+                                            {'ReasonParticipantLeft': reason})))
+        if self.rng.random() < self.error_rate:
+            graph.append((at, self._error(call, self.rng.choice(PHASE_ERROR_CODES['media']), at)))
+        at = self._after(at, 0.1, 0.5)
+        graph.append((at, self._status(call, 'completed', at, duration=(at - answered_at).total_seconds())))
+
+    # Timing helpers
+
+    def _after(self, at, low, high):
+        return at + timedelta(seconds=self.rng.uniform(low, high))
+
+    def _between(self, start, end):
+        return start + (end - start) * self.rng.random()
+
+    def _talk_seconds(self, median):
+        return min(3600.0, self.rng.lognormvariate(math.log(median), 0.9))
+
+    # Event payloads
+
+    def _envelope(self, event_type, source, at, data, schema):
+        event_sid = self._sid('EZ')
+        return {
+            'specversion': '1.0',
+            'type': f"{VOICE_TYPE_PREFIX}{event_type}",
+            'source': source,
+            'id': event_sid,
+            'dataschema': f"https://events-schemas.twilio.com/{schema}/1",
+            'datacontenttype': 'application/json',
+            'time': _iso(at),
+            'data': {'eventSid': event_sid, **data},
+        }
+
+    def _call_parameters(self, call, at):
+        parameters = {'AccountSid': call['account_sid'], 'ApiVersion': '2010-04-01', 'CallSid': call['sid']}
+        for prefix, party in (('Called', call['to']), ('Caller', call['from']),
+                              ('From', call['from']), ('To', call['to'])):
+            parameters[prefix] = party['number']
+            parameters[f"{prefix}City"] = party['city']
+            parameters[f"{prefix}Country"] = 'US'
+            parameters[f"{prefix}State"] = party['state']
+            parameters[f"{prefix}Zip"] = party['zip']
+        parameters['Direction'] = call['direction']
+        parameters['Timestamp'] = format_datetime(at)
+        return parameters
+
+    def _status(self, call, status, at, duration=None):
+        parameters = self._call_parameters(call, at)
+        parameters.update({
+            'CallStatus': status,
+            'CallbackSource': 'call-progress-events',
+            'SequenceNumber': str(call['sequence']),
+        })
+        if status in SIP_RESPONSE_CODES:
+            parameters['SipResponseCode'] = SIP_RESPONSE_CODES[status]
+        if duration is not None:
+            parameters['CallDuration'] = str(int(duration))
+            parameters['Duration'] = str(int(duration // 60) + 1)
+        call['sequence'] += 1
+
+        return self._envelope(
+            f"status-callback.call.{status}",
+            f"/2010-04-01/Accounts/{call['account_sid']}/Calls/{call['sid']}.json",
+            at,
+            {'request': {'method': 'POST', 'url': f"{WEBHOOK_BASE_URL}/status", 'parameters': parameters}},
+            'VoiceStatusCallback.Call'
+        )
+
+    def _api_call_request(self, call, at):
+        url = f"{API_BASE_URL}/Accounts/{call['account_sid']}/Calls.json"
+        return self._envelope('api-request.call.created', url, at, {
+            'sid': call['sid'],
+            'requestDateCreated': format_datetime(at),
+            'request': {
+                'method': 'POST',
+                'url': url,
+                'parameters': {
+                    'AccountSid': call['account_sid'],
+                    'From': call['from']['number'],
+                    'To': call['to']['number'],
+                    'Url': f"{WEBHOOK_BASE_URL}/outbound",
+                    'StatusCallback': f"{WEBHOOK_BASE_URL}/status",
+                    'StatusCallbackEvent': 'initiated ringing answered completed',
+                    'MachineDetection': self.rng.choice(('Enable', 'DetectMessageEnd', '')),
+                },
+            },
+            'response': {'responseCode': 201, 'contentType': 'application/json'},
+        }, 'VoiceApiRequest.Call')
+
+    def _twiml(self, call, status, at, failed, conference=None):
+        url = f"{WEBHOOK_BASE_URL}/{'inbound' if call['direction'] == 'inbound' else 'outbound'}"
+        parameters = self._call_parameters(call, at)
+        parameters['CallStatus'] = status
+        if conference:
+            body = (
+                '<?xml version="1.0" encoding="UTF-8"?><Response><Say voice="Polly.Joanna">'
+                'Thanks for calling. Connecting you to an agent.</Say><Dial><Conference '
+                'startConferenceOnEnter="true" endConferenceOnExit="true" statusCallback="'
+                f"{WEBHOOK_BASE_URL}/conference\" statusCallbackEvent=\"start end join leave mute hold\">"
+                f"{conference['friendly_name']}</Conference></Dial></Response>"
+            )
+        else:
+            body = (
+                '<?xml version="1.0" encoding="UTF-8"?><Response><Gather input="speech dtmf" '
+                f"action=\"{WEBHOOK_BASE_URL}/menu\" timeout=\"5\"><Say voice=\"Polly.Joanna\">"
+                'Press 1 for sales or 2 for support.</Say></Gather><Redirect>'
+                f"{WEBHOOK_BASE_URL}/voicemail</Redirect></Response>"
+            )
+        response = {'responseCode': 200, 'contentType': 'text/xml', 'body': body}
+        if failed:
+            response = {'responseCode': self.rng.choice((500, 502, 504)), 'contentType': 'text/html', 'body': ''}
+
+        return self._envelope('twiml.call.requested', url, at, {
+            'requestDateCreated': format_datetime(at),
+            'responseDateCreated': format_datetime(at + timedelta(milliseconds=self.rng.randint(20, 900))),
+            'request': {'method': 'POST', 'url': url, 'parameters': parameters},
+            'response': response,
+        }, 'VoiceTwiml.Call')
+
+    def _participant(self, conference, call, label, status_event, at, flags, extra=None):
+        parameters = {
+            'AccountSid': conference['account_sid'],
+            'CallSid': call['sid'],
+            'ConferenceSid': conference['sid'],
+            'FriendlyName': conference['friendly_name'],
+            'ParticipantLabel': label,
+            'StatusCallbackEvent': status_event,
+            'Muted': flags.get('Muted', 'false'),
+            'Hold': flags.get('Hold', 'false'),
+            'Coaching': flags.get('Coaching', 'false'),
+            'EndConferenceOnExit': flags.get('EndConferenceOnExit', 'false'),
+            'StartConferenceOnEnter': 'true',
+            'SequenceNumber': str(conference['sequence']),
+            'Timestamp': format_datetime(at),
+            **(extra or {}),
+        }
+        conference['sequence'] += 1
+        return self._envelope(
+            'status-callback.conference.participant.updated',
+            f"/2010-04-01/Accounts/{conference['account_sid']}/Conferences/{conference['sid']}",
+            at,
+            {'request': {'method': 'POST', 'url': f"{WEBHOOK_BASE_URL}/conference", 'parameters': parameters}},
+            'VoiceStatusCallback.ConferenceParticipant'
+        )
+
+    def _conference_event(self, conference, status_event, at, extra=None):
+        parameters = {
+            'AccountSid': conference['account_sid'],
+            'ConferenceSid': conference['sid'],
+            'FriendlyName': conference['friendly_name'],
+            'StatusCallbackEvent': status_event,
+            'SequenceNumber': str(conference['sequence']),
+            'Timestamp': format_datetime(at),
+            **(extra or {}),
+        }
+        conference['sequence'] += 1
+        return self._envelope(
+            'status-callback.conference.updated',
+            f"/2010-04-01/Accounts/{conference['account_sid']}/Conferences/{conference['sid']}",
+            at,
+            {'request': {'method': 'POST', 'url': f"{WEBHOOK_BASE_URL}/conference", 'parameters': parameters}},
+            'VoiceStatusCallback.Conference'
+        )
+
+    def _participant_request(self, conference, call, action, at, parameters):
+        url = f"{API_BASE_URL}/Accounts/{conference['account_sid']}/Conferences/{conference['sid']}/Participants"
+        url = f"{url}.json" if action == 'created' else f"{url}/{call['sid']}.json"
+        method = {'created': 'POST', 'modified': 'POST', 'deleted': 'DELETE'}[action]
+        return self._envelope(f"api-request.conference-participant.{action}", url, at, {
+            'sid': conference['sid'],
+            'requestDateCreated': format_datetime(at),
+            'request': {'method': method, 'url': url, 'parameters': parameters},
+            'response': {'responseCode': 204 if action == 'deleted' else 200, 'contentType': 'application/json'},
+        }, 'VoiceApiRequest.ConferenceParticipant')
+
+    def _error(self, call, error_code, at):
+        level, message = ERROR_CODES[error_code]
+        at = at + timedelta(milliseconds=self.rng.randint(5, 1500))
+        alert_sid = self._sid('NO')
+        request_url = f"{WEBHOOK_BASE_URL}/{'inbound' if call['direction'] == 'inbound' else 'outbound'}"
+
+        # Alerts carry either a message or a form-encoded message_text, as in production
+        if self.rng.random() < 0.6:
+            payload = {
+                'resource_sid': call['sid'],
+                'service_sid': None,
+                'error_code': error_code,
+                'message': message,
+                'more_info': {'url': request_url, 'sourceComponent': '12000'},
+                'webhook': {
+                    'type': 'application/json',
+                    'request': {'url': request_url, 'method': 'POST', 'headers': {}},
+                    'response': {'status_code': 502, 'headers': {}, 'body': ''},
+                },
+            }
+        else:
+            payload = {
+                'resource_sid': call['sid'],
+                'error_code': error_code,
+                'message_text': urlencode({'Msg': message, 'url': request_url, 'LogLevel': level}),
+            }
+
+        return {
+            'specversion': '1.0',
+            'type': ERROR_EVENT_TYPE,
+            'source': f"/v1/Accounts/{call['account_sid']}/Alerts/{alert_sid}",
+            'id': alert_sid,
+            'dataschema': 'https://events-schemas.twilio.com/ErrorLogs.Error/1',
+            'datacontenttype': 'application/json',
+            'time': _iso(at),
+            'data': {
+                'sid': alert_sid,
+                'account_sid': call['account_sid'],
+                'parent_account_sid': None,
+                'correlation_sid': call['sid'],
+                'request_sid': self._sid('RQ'),
+                'error_code': error_code,
+                'level': level,
+                'product_name': 'Programmable Voice',
+                'date_created': _iso(at),
+                'payload': json.dumps(payload),
+            },
+        }
+
+
+def _iso(at):
+    return at.isoformat(timespec='milliseconds').replace('+00:00', 'Z')
@@ -2,8 +2,12 @@
 Validation utilities for Twilio webhooks and event streams.
 """
 import hashlib
+import logging
+
 from django.http import HttpResponse
 
+logger = logging.getLogger(__name__)
+
 
 def validate_twilio_event_stream(request):
     expected_hash = request.GET.get('bodySHA256', '')
@@ -45,7 +49,7 @@ def validate_twilio_webhook(request, auth_token):
         
     # Validate signature
     if not validator.validate(url, params, signature):
-        print('Invalid Twilio signature!')
+        logger.warning('Invalid Twilio signature for %s', request.path)
         return (False, HttpResponse('Forbidden - Invalid signature', status=403))
     
     return (True, None)
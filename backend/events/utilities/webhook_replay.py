@@ -0,0 +1,301 @@
+"""
+Utility functions for replaying recorded webhook deliveries against the ingest endpoint.
+
+Deliveries are read lazily from:
+- *.json files: one delivery each (the event_logs/ format, named %Y%m%d_%H%M%S_%f.json)
+- *.jsonl / *.jsonl.gz files: one JSON delivery (array or single event) per line;
+  lines that are not valid JSON are sent verbatim
+- *.form files: one form-encoded delivery body per line
+- directories: every supported file inside, in name order
+
+A scheduler paces sends by a fixed rate or by the recorded arrival times divided by a
+time-compression factor, and a pool of threads sends them in-process (Django test client)
+or over HTTP. Latency is measured both from the actual send and from the scheduled send
+time, so a saturated server cannot hide queueing delay.
+"""
+import gzip
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+
+import requests
+
+from .histograms import Histogram
+
+JSON_CONTENT_TYPE = 'application/json'
+FORM_CONTENT_TYPE = 'application/x-www-form-urlencoded'
+
+REPORT_PERCENTILES = (50, 90, 99, 99.9)
+
+
+class Delivery:
+    """One webhook request body plus its recorded arrival time (epoch seconds), if known."""
+
+    __slots__ = ('body', 'content_type', 'recorded_at', 'event_count')
+
+    def __init__(self, body, content_type, recorded_at=None, event_count=1):
+        self.body = body
+        self.content_type = content_type
+        self.recorded_at = recorded_at
+        self.event_count = event_count
+
+
+def load_deliveries(paths, batch_size=0, rewrite_ids=False):
+    """
+    Lazily yield Deliveries from files or directories.
+    batch_size > 0 regroups JSON events into arrays of that many events; rewrite_ids gives
+    every event a fresh id so a recording can be replayed into a database that already has it.
+    """
+    deliveries = _iter_recorded(paths)
+    if rewrite_ids:
+        deliveries = _rewrite_ids(deliveries, uuid.uuid4().hex)
+    if batch_size > 0:
+        deliveries = _rebatch(deliveries, batch_size)
+    for events, body, content_type, recorded_at in deliveries:
+        if events is not None:
+            yield Delivery(json.dumps(events).encode(), JSON_CONTENT_TYPE, recorded_at, len(events))
+        else:
+            yield Delivery(body, content_type, recorded_at)
+
+
+def _iter_recorded(paths):
+    """Yield (events or None, raw body, content type, recorded_at) for each recorded delivery."""
+    for path in paths:
+        if os.path.isdir(path):
+            names = sorted(os.listdir(path))
+            yield from _iter_recorded([os.path.join(path, name) for name in names if _is_supported(name)])
+        elif path.endswith('.json'):
+            with open(path) as delivery_file:
+                events = _as_events(json.load(delivery_file))
+            yield events, None, JSON_CONTENT_TYPE, _filename_time(path) or _events_time(events)
+        elif path.endswith('.jsonl') or path.endswith('.jsonl.gz'):
+            opener = gzip.open if path.endswith('.gz') else open
+            with opener(path, 'rt', encoding='utf-8') as lines:
+                for line in lines:
+                    if not line.strip():
+                        continue
+                    try:
+                        events = _as_events(json.loads(line))
+                    except ValueError:
+                        # Malformed recordings are replayed verbatim
+                        yield None, line.strip().encode(), JSON_CONTENT_TYPE, None
+                        continue
+                    yield events, None, JSON_CONTENT_TYPE, _events_time(events)
+        elif path.endswith('.form'):
+            with open(path, 'rb') as lines:
+                for line in lines:
+                    if line.strip():
+                        yield None, line.strip(), FORM_CONTENT_TYPE, None
+        else:
+            raise ValueError(f"Unsupported delivery file: {path}")
+
+
+def _is_supported(name):
+    return name.endswith(('.json', '.jsonl', '.jsonl.gz', '.form'))
+
+
+def _as_events(payload):
+    return payload if isinstance(payload, list) else [payload]
+
+
+def _filename_time(path):
+    try:
+        stem = os.path.basename(path).rsplit('.', 1)[0]
+        return datetime.strptime(stem, '%Y%m%d_%H%M%S_%f').timestamp()
+    except ValueError:
+        return None
+
+
+def _events_time(events):
+    times = []
+    for event in events:
+        try:
+            times.append(datetime.fromisoformat(event.get('time', '').replace('Z', '+00:00')).timestamp())
+        except (AttributeError, ValueError):
+            continue
+    return max(times) if times else None
+
+
+def _rewrite_ids(deliveries, run_token):
+    for events, body, content_type, recorded_at in deliveries:
+        if events is not None:
+            events = [_with_new_id(event, run_token) for event in events]
+        yield events, body, content_type, recorded_at
+
+
+def _with_new_id(event, run_token):
+    data = event.get('data')
+    original = (data.get('eventSid') if isinstance(data, dict) else None) or event.get('id') or ''
+    new_id = (original[:2] or 'EV') + hashlib.sha1(f"{original}:{run_token}".encode()).hexdigest()[:32]
+
+    event = dict(event, id=new_id)
+    if isinstance(data, dict) and 'eventSid' in data:
+        event['data'] = dict(data, eventSid=new_id)
+    return event
+
+
+def _rebatch(deliveries, batch_size):
+    batch, batch_time = [], None
+    for events, body, content_type, recorded_at in deliveries:
+        if events is None:
+            yield events, body, content_type, recorded_at
+            continue
+        for event in events:
+            if not batch:
+                batch_time = recorded_at
+            batch.append(event)
+            if len(batch) == batch_size:
+                yield batch, None, JSON_CONTENT_TYPE, batch_time
+                batch = []
+    if batch:
+        yield batch, None, JSON_CONTENT_TYPE, batch_time
+
+
+class InProcessSender:
+    """Posts through the Django test client, exercising the full middleware and view stack."""
+
+    def __init__(self, path):
+        from django.test import Client
+
+        self.path = path
+        self.client = Client(raise_request_exception=False, HTTP_HOST='localhost')
+
+    def send(self, delivery):
+        return self.client.post(self.path, data=delivery.body, content_type=delivery.content_type).status_code
+
+    def close(self):
+        from django.db import connections
+
+        connections.close_all()
+
+
+class HttpSender:
+    """Posts to a running server over HTTP with a keep-alive session."""
+
+    def __init__(self, url, timeout=30):
+        self.url = url
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def send(self, delivery):
+        response = self.session.post(
+            self.url, data=delivery.body, headers={'Content-Type': delivery.content_type}, timeout=self.timeout
+        )
+        return response.status_code
+
+    def close(self):
+        self.session.close()
+
+
+class ReplayStats:
+    """Thread-safe latency histograms (microseconds) and outcome counters for one run."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.service = Histogram()
+        self.response = Histogram()
+        self.statuses = Counter()
+        self.exceptions = Counter()
+        self.deliveries = 0
+        self.events = 0
+        self.started = time.monotonic()
+        self.finished = None
+
+    def record(self, delivery, scheduled_at, sent_at, done_at, status=None, exception=None):
+        with self.lock:
+            self.deliveries += 1
+            self.events += delivery.event_count
+            self.service.record((done_at - sent_at) * 1e6)
+            self.response.record((done_at - scheduled_at) * 1e6)
+            if exception is not None:
+                self.exceptions[type(exception).__name__] += 1
+            else:
+                self.statuses[status] += 1
+
+    def report(self):
+        elapsed = (self.finished or time.monotonic()) - self.started
+        errors = sum(self.exceptions.values()) + sum(
+            count for status, count in self.statuses.items() if not 200 <= status < 300
+        )
+        return {
+            'deliveries': self.deliveries,
+            'events': self.events,
+            'elapsed_seconds': round(elapsed, 3),
+            'deliveries_per_second': round(self.deliveries / elapsed, 1) if elapsed else 0,
+            'events_per_second': round(self.events / elapsed, 1) if elapsed else 0,
+            'errors': errors,
+            'statuses': dict(self.statuses),
+            'exceptions': dict(self.exceptions),
+            'service_latency_ms': _percentiles_ms(self.service),
+            'response_latency_ms': _percentiles_ms(self.response),
+        }
+
+
+def _percentiles_ms(histogram):
+    return {
+        name: round(value / 1000, 2) if value is not None else None
+        for name, value in histogram.percentiles(REPORT_PERCENTILES).items()
+    }
+
+
+def replay(deliveries, sender_factory, concurrency=1, rate=None, time_compression=None):
+    """
+    Send deliveries with concurrency worker threads and return the run's ReplayStats.
+    rate paces sends at that many deliveries per second; time_compression replays recorded
+    gaps divided by that factor (deliveries without a recorded time are sent immediately);
+    with neither, deliveries are sent as fast as the workers allow.
+    """
+    stats = ReplayStats()
+    pending = queue.Queue(maxsize=concurrency * 4)
+
+    def worker():
+        sender = sender_factory()
+        try:
+            while True:
+                item = pending.get()
+                if item is None:
+                    return
+                scheduled_at, delivery = item
+                sent_at = time.monotonic()
+                try:
+                    status = sender.send(delivery)
+                except Exception as e:
+                    stats.record(delivery, scheduled_at, sent_at, time.monotonic(), exception=e)
+                else:
+                    stats.record(delivery, scheduled_at, sent_at, time.monotonic(), status=status)
+        finally:
+            sender.close()
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+
+    start = time.monotonic()
+    first_recorded_at = None
+    for index, delivery in enumerate(deliveries):
+        scheduled_at = time.monotonic()
+        if rate:
+            scheduled_at = start + index / rate
+        elif time_compression and delivery.recorded_at is not None:
+            if first_recorded_at is None:
+                first_recorded_at = delivery.recorded_at
+            scheduled_at = start + max(0.0, delivery.recorded_at - first_recorded_at) / time_compression
+
+        delay = scheduled_at - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        pending.put((scheduled_at, delivery))
+
+    for _ in threads:
+        pending.put(None)
+    for thread in threads:
+        thread.join()
+
+    stats.finished = time.monotonic()
+    return stats
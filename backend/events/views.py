@@ -2,39 +2,270 @@
 Views for handling webhook endpoints.
 """
 import json
+import logging
 import os
+import time
 from datetime import timedelta
-from django.http import JsonResponse, HttpResponse
+from functools import wraps
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.conf import settings
 from django.utils import timezone
-from django.db import connection
-from django.db.models import Count, Exists, OuterRef, Q, Subquery
+from django.utils.dateparse import parse_datetime
+from django.db.models import Case, Count, F, IntegerField, Value, When, Window
+from django.db.models.functions import RowNumber
 from rest_framework import viewsets, filters
-from rest_framework.decorators import action
+from rest_framework.decorators import action, api_view
 from rest_framework.response import Response
 from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
+from voiceops.metrics import SIZE_BUCKETS, Counter, Histogram
+from voiceops import tracing
+from voiceops.query_profiling import query_budget
 
 from .models import CallEvent, ErrorEvent
-from .serializers import CallEventSerializer, ErrorEventSerializer
+from .serializers import CallEventSerializer, ErrorEventSerializer, call_event_values, error_event_values
 from .utilities.validators import validate_twilio_webhook
-from .utilities.event_processing import process_call_event, process_error_event
-from .utilities.call_trace import build_call_trace, build_conference_trace
+from .utilities.event_processing import event_category, process_call_event, process_error_event
+from .utilities.broadcasting import broadcast_call_event, broadcast_error_event
+from .utilities.conditional import conditional, table_etag, call_trace_etag, conference_trace_etag
+from .utilities.call_timing import TIMING_METRICS, DEFAULT_PERCENTILES, record_call_timing, timing_histograms, timing_summary
+from .utilities.heavy_hitters import (
+    HEAVY_HITTER_DIMENSIONS,
+    get_heavy_hitters,
+    record_call_event_hitters,
+    record_error_event_hitters,
+)
+from .utilities.anomaly_detection import observe_call_event, observe_error_event
+from .utilities.ingest_health import get_ingest_health, health_report
+from .utilities.ingest_watermark import safe_ingest_seq
+from .utilities.export import EXPORT_CONTENT_TYPES, EXPORT_MODELS, export_chunks, export_rows
+from .consumers import connection_stats
+from .utilities.streaming import iterate_in_thread
+from .utilities.call_trace import (
+    TRACE_STREAM_CHUNK_SIZE,
+    build_call_trace,
+    build_call_traces,
+    build_conference_trace,
+    stream_call_trace,
+    stream_conference_trace,
+)
 from .integrations.slack import twilio_error_notification, webhook_error_notification
 
+logger = logging.getLogger(__name__)
 
-class CallEventViewSet(viewsets.ReadOnlyModelViewSet):
+
+TRACE_EVENT_FIELDS = ('event_id', 'timestamp', 'event_type', 'category', 'details', 'payload')
+
+
+def _trace_options(request):
+    """
+    Parse trace query params.
+    - include_payload=false skips loading meta_data from the database.
+    - fields=a,b limits the keys returned per event; payload is only loaded when requested.
+    - stream=ndjson sends the header and then one event per line.
+    """
+    fields = None
+    fields_param = request.query_params.get('fields')
+    if fields_param:
+        fields = [field.strip() for field in fields_param.split(',') if field.strip() in TRACE_EVENT_FIELDS]
+
+    include_payload = request.query_params.get('include_payload') != 'false'
+    if fields is not None and 'payload' not in fields:
+        include_payload = False
+
+    stream = request.query_params.get('stream') == 'ndjson'
+    return include_payload, fields, stream
+
+
+def _project_trace_event(event, fields):
+    if fields is None:
+        return event
+    return {key: event[key] for key in fields if key in event}
+
+
+def _project_trace(trace_data, fields):
+    if fields is None:
+        return trace_data
+    return {
+        'header': trace_data['header'],
+        'events': [_project_trace_event(event, fields) for event in trace_data['events']]
+    }
+
+
+def _ndjson_trace_response(header, events, fields):
+    """
+    Stream a trace as NDJSON: a header line followed by one line per event.
+    Events are sent in chunks of TRACE_STREAM_CHUNK_SIZE lines, each built in the view's
+    thread, so under ASGI the header goes out before any payload is read.
+    """
+    def chunks():
+        yield json.dumps({'header': header}) + '\n'
+        lines = []
+        for event in events:
+            lines.append(json.dumps({'event': _project_trace_event(event, fields)}) + '\n')
+            if len(lines) == TRACE_STREAM_CHUNK_SIZE:
+                yield ''.join(lines)
+                lines = []
+        if lines:
+            yield ''.join(lines)
+
+    return StreamingHttpResponse(iterate_in_thread(chunks()), content_type='application/x-ndjson')
+
+
+def _parse_range_param(value):
+    """Aware datetime from an ISO 8601 query param; None when absent, False when invalid."""
+    if not value:
+        return None
+    try:
+        parsed = parse_datetime(value)
+    except ValueError:
+        return False
+    if parsed is None:
+        return False
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+class ExportMixin:
+    """
+    Adds GET export/: streams every row in a time range as csv, ndjson or parquet,
+    read through a server-side cursor instead of paginated OFFSET queries.
+    """
+    export_resource = None
+
+    @action(detail=False, methods=['get'])
+    @query_budget(2)
+    def export(self, request):
+        """
+        Query params: start, end (ISO 8601, optional), account_sid, output (csv, ndjson or
+        parquet; default csv), include_meta_data=true to add the raw payload column.
+        """
+        start = _parse_range_param(request.query_params.get('start'))
+        end = _parse_range_param(request.query_params.get('end'))
+        if start is False or end is False or (start and end and start >= end):
+            return Response({'error': 'start and end must be ISO 8601 datetimes with start before end'}, status=400)
+
+        # "format" is reserved by DRF for renderer selection
+        output_format = request.query_params.get('output', 'csv')
+        if output_format not in EXPORT_CONTENT_TYPES:
+            return Response({'error': f"output must be one of: {', '.join(EXPORT_CONTENT_TYPES)}"}, status=400)
+
+        model, values_serializer = EXPORT_MODELS[self.export_resource]
+        columns, rows = export_rows(
+            model,
+            values_serializer,
+            start=start,
+            end=end,
+            account_sid=request.query_params.get('account_sid'),
+            include_meta_data=request.query_params.get('include_meta_data') == 'true'
+        )
+        try:
+            chunks = export_chunks(model, columns, rows, output_format)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=400)
+
+        # An async iterator, so ASGI sends chunks as the cursor produces them
+        response = StreamingHttpResponse(iterate_in_thread(chunks), content_type=EXPORT_CONTENT_TYPES[output_format])
+        response['Content-Disposition'] = f'attachment; filename="{self.export_resource}.{output_format}"'
+        return response
+
+
+WEBHOOK_DELIVERIES = Counter(
+    'voiceops_webhook_deliveries_total', 'Webhook deliveries by outcome (accepted, bad_request, error)', ['outcome']
+)
+WEBHOOK_DELIVERY_SECONDS = Histogram('voiceops_webhook_delivery_seconds', 'Time to process a webhook delivery')
+WEBHOOK_DELIVERY_EVENTS = Histogram(
+    'voiceops_webhook_delivery_events', 'Events per webhook delivery', buckets=SIZE_BUCKETS
+)
+WEBHOOK_EVENTS = Counter('voiceops_webhook_events_total', 'Received webhook events by category', ['category'])
+LIST_QUERY_SECONDS = Histogram(
+    'voiceops_list_query_seconds', 'Time to build a list response, by resource and mode (page, delta)',
+    ['resource', 'mode']
+)
+
+
+class ValuesListMixin:
+    """
+    Serves list responses through the viewset's values_serializer: rows are fetched with
+    values_list() and turned into dicts directly, with the same schema as serializer_class.
+    """
+    values_serializer = None
+
+    def list(self, request, *args, **kwargs):
+        with LIST_QUERY_SECONDS.time(resource=self.basename, mode='page'):
+            queryset = self.filter_queryset(self.get_queryset())
+            rows = self.values_serializer.values_list(queryset)
+
+            page = self.paginate_queryset(rows)
+            if page is not None:
+                return self.get_paginated_response(self.values_serializer.to_representation(page))
+            return Response(self.values_serializer.to_representation(rows))
+
+
+class DeltaSyncMixin:
+    """
+    Adds ?since=<cursor> to list endpoints: returns rows stored after the cursor that match
+    the list's search and filters, in ingest order, plus the cursor to use for the next poll.
+    Backed by the indexed ingest_seq column, so each poll is a range scan over new rows only;
+    on PostgreSQL rows are handed out only up to the ingest watermark (safe_ingest_seq).
+    """
+    MAX_DELTA_RESULTS = 1000
+
+    def list(self, request, *args, **kwargs):
+        if 'since' not in request.query_params:
+            return super().list(request, *args, **kwargs)
+
+        try:
+            since = int(request.query_params.get('since') or 0)
+            limit = int(request.query_params.get('limit') or self.MAX_DELTA_RESULTS)
+        except ValueError:
+            return Response({'error': 'since and limit must be integers'}, status=400)
+        limit = max(1, min(limit, self.MAX_DELTA_RESULTS))
+
+        # Same search and filters as the full list, in ingest order
+        queryset = self.filter_queryset(self.queryset).filter(ingest_seq__gt=since).order_by('ingest_seq')
+        with LIST_QUERY_SECONDS.time(resource=self.basename, mode='delta'):
+            # Rows above the watermark may still have lower values committing after them
+            safe_seq = safe_ingest_seq(queryset.model)
+            if safe_seq is not None:
+                queryset = queryset.filter(ingest_seq__lte=safe_seq)
+            # Fetch one extra row to know whether another poll is needed right away.
+            rows = list(self.values_serializer.values_list(queryset, 'ingest_seq')[:limit + 1])
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        if has_more or safe_seq is None:
+            next_cursor = rows[-1][-1] if rows else since
+        else:
+            # Every row up to the watermark is final, including those the filters skipped
+            next_cursor = max(since, safe_seq)
+        return Response({
+            'results': self.values_serializer.to_representation(rows),
+            'next_cursor': str(next_cursor),
+            'has_more': has_more
+        })
+
+
+class CallEventViewSet(ExportMixin, DeltaSyncMixin, ValuesListMixin, viewsets.ReadOnlyModelViewSet):
     """
     API endpoint for viewing call events
     """
     queryset = CallEvent.objects.filter(call_sid__isnull=False).exclude(call_sid='').order_by('-timestamp')
     serializer_class = CallEventSerializer
+    values_serializer = call_event_values
+    export_resource = 'call-events'
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['call_sid', 'from_number', 'to_number', 'account_sid']
     ordering_fields = ['timestamp', 'created_at']
     MAX_NO_PAGINATION_RESULTS = 1000
+    MAX_BATCH_TRACE_SIDS = 100
+
+    @conditional(table_etag(CallEvent, 'call-events'))
+    @query_budget(6)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
     
     def get_queryset(self):
         """
@@ -54,29 +285,21 @@ class CallEventViewSet(viewsets.ReadOnlyModelViewSet):
                 return queryset[:self.MAX_NO_PAGINATION_RESULTS]
             return queryset
 
-        if connection.vendor == 'postgresql':
-            latest_per_call_ids = queryset.order_by('call_sid', '-timestamp').distinct('call_sid').values('event_id')
-            queryset = queryset.filter(event_id__in=Subquery(latest_per_call_ids)).order_by('-timestamp')
-        else:
-            # Fallback for non-PostgreSQL backends.
-            has_completed_event = CallEvent.objects.filter(
-                call_sid=OuterRef('call_sid'),
-                event_type__contains='status-callback.call.completed'
+        # One row per call_sid: its completed event if there is one, else its latest event.
+        # ROW_NUMBER() is supported by PostgreSQL and SQLite 3.25+; Django filters on it
+        # through a subquery.
+        is_completed = Case(
+            When(event_type__contains='status-callback.call.completed', then=Value(1)),
+            default=Value(0),
+            output_field=IntegerField()
+        )
+        queryset = queryset.annotate(
+            call_rank=Window(
+                RowNumber(),
+                partition_by=F('call_sid'),
+                order_by=[is_completed.desc(), F('timestamp').desc(), F('event_id').desc()]
             )
-
-            completed_event_id = CallEvent.objects.filter(
-                call_sid=OuterRef('call_sid'),
-                event_type__contains='status-callback.call.completed'
-            ).order_by('timestamp').values('event_id')[:1]
-
-            latest_event_id = CallEvent.objects.filter(
-                call_sid=OuterRef('call_sid')
-            ).order_by('-timestamp').values('event_id')[:1]
-
-            queryset = queryset.filter(
-                Q(event_id__in=Subquery(completed_event_id)) |
-                (Q(event_id__in=Subquery(latest_event_id)) & ~Exists(has_completed_event))
-            ).distinct().order_by('-timestamp')
+        ).filter(call_rank=1).order_by('-timestamp')
 
         if no_pagination:
             return queryset[:self.MAX_NO_PAGINATION_RESULTS]
@@ -84,6 +307,8 @@ class CallEventViewSet(viewsets.ReadOnlyModelViewSet):
         return queryset
     
     @action(detail=False, methods=['get'])
+    @conditional(table_etag(CallEvent, 'call-stats', daily=True))
+    @query_budget(5)
     def stats(self, request):
         """Get statistics about call events for today"""
         
@@ -105,32 +330,143 @@ class CallEventViewSet(viewsets.ReadOnlyModelViewSet):
         return Response({
             'by_event_type': by_event_type
         })
+
+    @action(detail=False, methods=['get'], url_path='timing-stats')
+    @query_budget(2)
+    def timing_stats(self, request):
+        """
+        Call timing percentiles (milliseconds) from the ingest-time histograms.
+        Query params: start, end (ISO 8601, default last 24 hours), account_sid, metric,
+        percentiles (comma separated, default 50,95,99).
+        """
+        start = _parse_range_param(request.query_params.get('start'))
+        end = _parse_range_param(request.query_params.get('end'))
+        if start is not False and end is not False:
+            end = end or timezone.now()
+            start = start or end - timedelta(hours=24)
+        if start is False or end is False or start >= end:
+            return Response({'error': 'start and end must be ISO 8601 datetimes with start before end'}, status=400)
+
+        metrics = request.query_params.getlist('metric') or list(TIMING_METRICS)
+        unknown = [metric for metric in metrics if metric not in TIMING_METRICS]
+        if unknown:
+            return Response({'error': f"Unknown metric(s): {', '.join(unknown)}"}, status=400)
+
+        try:
+            percents = [
+                float(percent) for percent in request.query_params.get('percentiles', '').split(',') if percent.strip()
+            ] or list(DEFAULT_PERCENTILES)
+        except ValueError:
+            return Response({'error': 'percentiles must be numbers between 0 and 100'}, status=400)
+        if any(not 0 < percent <= 100 for percent in percents):
+            return Response({'error': 'percentiles must be numbers between 0 and 100'}, status=400)
+
+        account_sid = request.query_params.get('account_sid')
+        histograms = timing_histograms(start, end, account_sid=account_sid, metrics=metrics)
+
+        return Response({
+            'start': start,
+            'end': end,
+            'account_sid': account_sid,
+            'unit': 'ms',
+            'metrics': {metric: timing_summary(histogram, percents) for metric, histogram in histograms.items()}
+        })
     
     @action(detail=False, methods=['get'], url_path='call-trace/(?P<call_sid>[^/.]+)')
+    @conditional(call_trace_etag)
+    @query_budget(7)
     def call_trace(self, request, call_sid=None):
         """Get structured call trace for a specific call_sid"""
         if not call_sid:
             return Response({'error': 'call_sid is required'}, status=400)
+
+        include_payload, fields, stream = _trace_options(request)
+
+        if stream:
+            streamed_trace = stream_call_trace(call_sid, include_payload=include_payload)
+            if streamed_trace is None:
+                return Response({'error': 'No events found for this call_sid'}, status=404)
+            return _ndjson_trace_response(*streamed_trace, fields)
         
-        trace_data = build_call_trace(call_sid)
+        trace_data = build_call_trace(call_sid, include_payload=include_payload)
         
         if trace_data is None:
             return Response({'error': 'No events found for this call_sid'}, status=404)
         
-        return Response(trace_data)
+        return Response(_project_trace(trace_data, fields))
+    
+    @action(detail=False, methods=['get', 'post'], url_path='call-traces')
+    @query_budget(3)
+    def call_traces(self, request):
+        """
+        Get structured call traces for many call_sids in one request.
+        Accepts call_sids as a JSON list in the POST body or as a comma-separated query param.
+        """
+        if request.method == 'POST':
+            if not isinstance(request.data, dict):
+                return Response({'error': 'Request body must be a JSON object with a call_sids list'}, status=400)
+            call_sids = request.data.get('call_sids', [])
+        else:
+            call_sids = request.query_params.get('call_sids', '').split(',')
+
+        if not isinstance(call_sids, list):
+            return Response({'error': 'call_sids must be a list'}, status=400)
+
+        call_sids = [str(sid).strip() for sid in call_sids if str(sid).strip()]
+        if not call_sids:
+            return Response({'error': 'call_sids is required'}, status=400)
+        if len(call_sids) > self.MAX_BATCH_TRACE_SIDS:
+            return Response(
+                {'error': f'At most {self.MAX_BATCH_TRACE_SIDS} call_sids are allowed per request'},
+                status=400
+            )
+
+        include_payload, fields, _ = _trace_options(request)
+        traces = build_call_traces(call_sids, include_payload=include_payload)
+
+        return Response({
+            'traces': {sid: _project_trace(trace, fields) for sid, trace in traces.items()},
+            'missing': [sid for sid in dict.fromkeys(call_sids) if sid not in traces]
+        })
     
     @action(detail=False, methods=['get'], url_path='conference-trace/(?P<conference_sid>[^/.]+)')
+    @conditional(conference_trace_etag)
+    @query_budget(5)
     def conference_trace(self, request, conference_sid=None):
         """Get structured conference trace for a specific conference_sid"""
         if not conference_sid:
             return Response({'error': 'conference_sid is required'}, status=400)
+
+        include_payload, fields, stream = _trace_options(request)
+
+        if stream:
+            streamed_trace = stream_conference_trace(conference_sid, include_payload=include_payload)
+            if streamed_trace is None:
+                return Response({'error': 'No events found for this conference_sid'}, status=404)
+            return _ndjson_trace_response(*streamed_trace, fields)
         
-        trace_data = build_conference_trace(conference_sid)
+        trace_data = build_conference_trace(conference_sid, include_payload=include_payload)
         
         if trace_data is None:
             return Response({'error': 'No events found for this conference_sid'}, status=404)
         
-        return Response(trace_data)
+        return Response(_project_trace(trace_data, fields))
+
+    @action(detail=False, methods=['get'], url_path='event-payload/(?P<event_id>[^/.]+)')
+    @query_budget(2)
+    def event_payload(self, request, event_id=None):
+        """Get the raw payload of a single call or error event, for traces fetched without payloads"""
+        payload = CallEvent.objects.filter(event_id=event_id).values_list('meta_data', flat=True).first()
+        if payload is None:
+            payload = ErrorEvent.objects.filter(event_id=event_id).values_list('meta_data', flat=True).first()
+
+        if payload is None:
+            return Response({'error': 'No event found for this event_id'}, status=404)
+
+        return Response({
+            'event_id': event_id,
+            'payload': payload
+        })
     
     def paginate_queryset(self, queryset):
         if self.request.query_params.get('no_pagination') == 'true':
@@ -138,17 +474,24 @@ class CallEventViewSet(viewsets.ReadOnlyModelViewSet):
         return super().paginate_queryset(queryset)
 
 
-class ErrorEventViewSet(viewsets.ReadOnlyModelViewSet):
+class ErrorEventViewSet(ExportMixin, DeltaSyncMixin, ValuesListMixin, viewsets.ReadOnlyModelViewSet):
     """
     API endpoint for viewing error events
     """
     queryset = ErrorEvent.objects.all().order_by('-timestamp')
     serializer_class = ErrorEventSerializer
+    values_serializer = error_event_values
+    export_resource = 'error-events'
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['error_code', 'correlation_sid', 'account_sid']
     ordering_fields = ['timestamp', 'created_at']
     MAX_NO_PAGINATION_RESULTS = 1000
 
+    @conditional(table_etag(ErrorEvent, 'error-events'))
+    @query_budget(6)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
     def get_queryset(self):
         queryset = super().get_queryset()
         if self.request.query_params.get('no_pagination') == 'true':
@@ -156,6 +499,8 @@ class ErrorEventViewSet(viewsets.ReadOnlyModelViewSet):
         return queryset
     
     @action(detail=False, methods=['get'])
+    @conditional(table_etag(ErrorEvent, 'error-stats', daily=True))
+    @query_budget(5)
     def stats(self, request):
         """Get statistics about error events for today"""
         today_start = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
@@ -176,8 +521,114 @@ class ErrorEventViewSet(viewsets.ReadOnlyModelViewSet):
         return super().paginate_queryset(queryset)
 
 
+@query_budget(1)
+@api_view(['GET'])
+def stream_connections(request):
+    """
+    Queue depth and lag metrics for the WebSocket connections served by this process.
+    """
+    connections = connection_stats()
+    return Response({
+        'connection_count': len(connections),
+        'connections': sorted(connections, key=lambda item: item['oldest_queued_seconds'], reverse=True)
+    })
+
+
+@query_budget(2)
+@api_view(['GET'])
+def health(request):
+    """
+    Health of the worker that answers: dependency round trips, ingest lag and error rate,
+    Slack backlog and WebSocket queues. Always 200 so the details stay readable when unready.
+    """
+    return Response(health_report(connection_stats()))
+
+
+@query_budget(2)
+@api_view(['GET'])
+def readiness(request):
+    """200 while this worker should receive webhook traffic, 503 with the reasons otherwise."""
+    report = health_report(connection_stats())
+    return Response(
+        {'ready': report['ready'], 'status': report['status'], 'reasons': report['reasons']},
+        status=200 if report['ready'] else 503
+    )
+
+
+@query_budget(1)
+@api_view(['GET'])
+def heavy_hitters(request):
+    """
+    Approximate top error codes, correlation_sids and failing to_numbers over a recent window.
+    Query params: dimension (repeatable, default all), window (minutes, default 5), limit (default 10).
+    """
+    tracker = get_heavy_hitters()
+    if tracker is None:
+        return Response({'error': 'Heavy-hitter tracking is disabled'}, status=503)
+
+    dimensions = request.query_params.getlist('dimension') or list(HEAVY_HITTER_DIMENSIONS)
+    unknown = [dimension for dimension in dimensions if dimension not in HEAVY_HITTER_DIMENSIONS]
+    if unknown:
+        return Response({'error': f"Unknown dimension(s): {', '.join(unknown)}"}, status=400)
+
+    try:
+        window = int(request.query_params.get('window') or 5)
+        limit = int(request.query_params.get('limit') or 10)
+    except ValueError:
+        return Response({'error': 'window and limit must be integers'}, status=400)
+    window = max(1, min(window, tracker.window_minutes))
+    limit = max(1, min(limit, tracker.capacity))
+
+    return Response({
+        'window_minutes': window,
+        'results': {dimension: tracker.top(dimension, window, limit) for dimension in dimensions}
+    })
+
+
+def _run_ingest_hook(hook, created_event):
+    """Run a best-effort ingest side effect; failures are logged and never fail the webhook."""
+    try:
+        with tracing.span(f"ingest_hook.{hook.__name__}"):
+            hook(created_event)
+    except Exception as e:
+        logger.exception("%s failed for %s", hook.__name__, created_event.event_id)
+
+
+def _record_delivery(view):
+    """
+    Count, time and trace webhook deliveries, and track them as in flight for the health
+    endpoint; the delivery span is the root of its trace.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        start = time.perf_counter()
+        ingest_health = get_ingest_health()
+        token = ingest_health.delivery_started()
+        status_code = 500
+        with tracing.span(
+            f"{request.method} {request.path}",
+            kind=tracing.SPAN_KIND_SERVER,
+            parent=tracing.extract_traceparent(request.META.get('HTTP_TRACEPARENT')),
+            **{'http.request.method': request.method, 'url.path': request.path}
+        ) as delivery_span:
+            try:
+                response = view(request, *args, **kwargs)
+                status_code = response.status_code
+            finally:
+                ingest_health.delivery_finished(token, status_code)
+            delivery_span.set_attribute('http.response.status_code', status_code)
+            if status_code >= 500:
+                delivery_span.set_error('Webhook processing failed')
+        WEBHOOK_DELIVERY_SECONDS.observe(time.perf_counter() - start)
+        outcome = {204: 'accepted', 400: 'bad_request'}.get(response.status_code, 'error')
+        WEBHOOK_DELIVERIES.inc(outcome=outcome)
+        return response
+    return wrapper
+
+
 @csrf_exempt
 @require_http_methods(["POST"])
+@_record_delivery
 def twilio_events_webhook(request):
     """
     Webhook endpoint for receiving event streams from Twilio.
@@ -194,14 +645,12 @@ def twilio_events_webhook(request):
         '''
         
         content_type = request.content_type
-        if 'application/json' in content_type:
-            data = json.loads(request.body)
-        else:
-            data = dict(request.POST)
+        with tracing.span('webhook.parse', content_type=content_type, body_bytes=len(request.body)):
+            if 'application/json' in content_type:
+                data = json.loads(request.body)
+            else:
+                data = dict(request.POST)
         
-        print("Received Twilio event:")
-        print(json.dumps(data, indent=2))
-
         '''
         # for logging (will be removed later) [line 43 - 52]
         event_logs_dir = os.path.join(settings.BASE_DIR, 'event_logs')
@@ -217,61 +666,63 @@ def twilio_events_webhook(request):
 
         # Process event(s): Twilio Event Streams sends an array of events
         events_to_process = data if isinstance(data, list) else [data]
+        WEBHOOK_DELIVERY_EVENTS.observe(len(events_to_process))
+        tracing.current_span().set_attribute('twilio.event_count', len(events_to_process))
         
         channel_layer = get_channel_layer()
+        failed_events = 0
         
         for event in events_to_process:
             event_type = event.get('type', '')
+            category = event_category(event_type)
+            WEBHOOK_EVENTS.inc(category=category or 'unknown')
             created_event = None
-            
-            if 'com.twilio.voice' in event_type or 'call' in event_type.lower():
-                created_event = process_call_event(event)
-                if created_event:
-                    # Broadcast to WebSocket clients
-                    async_to_sync(channel_layer.group_send)(
-                        'twilio_events',
-                        {
-                            'type': 'event_message',
-                            'event_type': 'call_event',
-                            'data': CallEventSerializer(created_event).data
-                        }
-                    )
-            elif 'error' in event_type.lower():
-                created_event = process_error_event(event)
-                if created_event:
-                    # Broadcast to WebSocket clients
-                    async_to_sync(channel_layer.group_send)(
-                        'twilio_events',
-                        {
-                            'type': 'event_message',
-                            'event_type': 'error_event',
-                            'data': ErrorEventSerializer(created_event).data
-                        }
-                    )
-
-                    # Send Slack notification for error events
-                    try:
-                        twilio_error_notification({
-                            'severity': created_event.severity,
-                            'error_code': created_event.error_code,
-                            'message': created_event.error_message,
-                            'product': created_event.product,
-                            'account_sid': created_event.account_sid,
-                            'correlation_sid': created_event.correlation_sid,
-                            'timestamp': created_event.timestamp.isoformat()
-                        })
-                    except Exception as slack_exc:
-                        print(f"Slack notification failed: {slack_exc}")
-            else:
-                print(f"Unknown event type: {event_type}")
-        
+
+            with tracing.span('webhook.event', **{'twilio.event_type': event_type}):
+                if category == 'call':
+                    created_event = process_call_event(event)
+                    if created_event:
+                        # Broadcast to WebSocket clients
+                        broadcast_call_event(channel_layer, created_event)
+
+                        _run_ingest_hook(record_call_timing, created_event)
+                        _run_ingest_hook(record_call_event_hitters, created_event)
+                        _run_ingest_hook(observe_call_event, created_event)
+                elif category == 'error':
+                    created_event = process_error_event(event)
+                    if created_event:
+                        # Broadcast to WebSocket clients
+                        broadcast_error_event(channel_layer, created_event)
+                        _run_ingest_hook(record_error_event_hitters, created_event)
+                        _run_ingest_hook(observe_error_event, created_event)
+
+                        # Send Slack notification for error events
+                        try:
+                            twilio_error_notification({
+                                'severity': created_event.severity,
+                                'error_code': created_event.error_code,
+                                'message': created_event.error_message,
+                                'product': created_event.product,
+                                'account_sid': created_event.account_sid,
+                                'correlation_sid': created_event.correlation_sid,
+                                'timestamp': created_event.timestamp.isoformat()
+                            })
+                        except Exception as slack_exc:
+                            logger.warning("Slack notification failed: %s", slack_exc)
+                else:
+                    logger.warning("Unknown event type: %s", event_type)
+
+            if category and created_event is None:
+                failed_events += 1
+
+        get_ingest_health().events_processed(len(events_to_process), failed_events)
         return HttpResponse(status=204)
         
     except json.JSONDecodeError as e:
-        print(f"Error decoding JSON: {e}")
+        logger.warning("Error decoding JSON: %s", e)
         webhook_error_notification(e)
         return HttpResponse(status=400)
     except Exception as e:
-        print(f"Error processing webhook: {e}")
+        logger.exception("Error processing webhook")
         webhook_error_notification(e)
         return HttpResponse(status=500)
@@ -0,0 +1,128 @@
+"""
+Project-wide HTTP middleware.
+"""
+import logging
+import re
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+
+from .query_profiling import (
+    QueryBudgetExceeded,
+    QueryRecorder,
+    get_query_profile_report,
+    view_label,
+    view_query_budget,
+)
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+
+re_accepts_brotli = re.compile(r'\bbr\b')
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """
+    Negotiated brotli/gzip compression for API responses above a size threshold.
+    Streaming responses (NDJSON traces, exports) and excluded paths such as the
+    Twilio webhook are passed through untouched.
+    """
+
+    def process_response(self, request, response):
+        if response.streaming or response.has_header('Content-Encoding'):
+            return response
+        if len(response.content) < getattr(settings, 'COMPRESSION_MIN_SIZE', 1024):
+            return response
+        if any(request.path.startswith(path) for path in getattr(settings, 'COMPRESSION_EXCLUDE_PATHS', ())):
+            return response
+
+        accept_encoding = request.META.get('HTTP_ACCEPT_ENCODING', '')
+        if brotli is None or not re_accepts_brotli.search(accept_encoding):
+            return super().process_response(request, response)
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        compressed_content = brotli.compress(response.content, quality=getattr(settings, 'COMPRESSION_BROTLI_QUALITY', 4))
+        if len(compressed_content) >= len(response.content):
+            return response
+
+        response.content = compressed_content
+        response.headers['Content-Length'] = str(len(response.content))
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = 'br'
+        return response
+
+
+class QueryProfilingMiddleware:
+    """
+    Opt-in (QUERY_PROFILING['ENABLED']) query profiling for every request: adds
+    X-Query-Count, X-Query-Time-Ms, X-Query-Duplicates, X-Query-Slowest and a db
+    Server-Timing entry, records the request in the /query-profile report, and checks
+    the view's query_budget. Queries run while a streaming response is iterated happen
+    after this returns and are not counted.
+    """
+
+    def __init__(self, get_response):
+        config = getattr(settings, 'QUERY_PROFILING', {})
+        if not config.get('ENABLED'):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.enforce_budgets = config.get('ENFORCE_BUDGETS', False)
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        summary = recorder.summary()
+        view, budget = getattr(request, '_query_profile_view', (None, None))
+        over_budget = budget is not None and summary['queries'] > budget
+
+        response['X-Query-Count'] = str(summary['queries'])
+        response['X-Query-Time-Ms'] = f"{summary['db_ms']:.3f}"
+        response['X-Query-Duplicates'] = str(summary['duplicates'])
+        if summary['slowest']:
+            slowest = summary['slowest']['sql'].encode('ascii', 'replace').decode()
+            response['X-Query-Slowest'] = f"{summary['slowest']['ms']:.3f}ms {slowest}"
+        if budget is not None:
+            response['X-Query-Budget'] = str(budget)
+        response['Server-Timing'] = f'db;dur={summary["db_ms"]:.3f};desc="{summary["queries"]} queries"'
+
+        get_query_profile_report().add({
+            'time': time.time(),
+            'method': request.method,
+            'path': request.path,
+            'view': view or request.path,
+            'status': response.status_code,
+            'duration_ms': round(elapsed_ms, 3),
+            'budget': budget,
+            'over_budget': over_budget,
+            **summary,
+        })
+
+        if over_budget:
+            message = f"{view} ran {summary['queries']} queries, over its budget of {budget}"
+            if summary['most_repeated']:
+                message += f" (repeated {summary['most_repeated']['count']}x: {summary['most_repeated']['sql']})"
+            if self.enforce_budgets:
+                raise QueryBudgetExceeded(message)
+            logger.warning("Query budget exceeded: %s", message)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._query_profile_view = (view_label(view_func, request), view_query_budget(view_func, request))
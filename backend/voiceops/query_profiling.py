@@ -0,0 +1,214 @@
+"""
+Per-request query profiling and per-view query budgets.
+
+QueryProfilingMiddleware (voiceops.middleware) records every query a request runs through
+a connection execute wrapper, so it works without DEBUG. It reports the count, total DB
+time, the slowest statement and repeated statements in response headers, and keeps the
+last QUERY_PROFILING['REPORT_SIZE'] requests in a per-process report served at
+/query-profile.
+
+Views declare the most queries a request may run with @query_budget(n). Requests over
+budget are flagged in the report; with QUERY_PROFILING['ENFORCE_BUDGETS'] the middleware
+raises QueryBudgetExceeded instead, which makes the Django test client fail the test.
+Tests can also check one request with the assert_query_budget() context manager.
+"""
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from contextlib import ExitStack, contextmanager
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.db import connections
+from django.http import JsonResponse
+from django.urls import resolve
+from django.views.decorators.http import require_GET
+
+# Longest SQL kept per query in headers and the report
+MAX_SQL_LENGTH = 300
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def query_budget(max_queries):
+    """
+    Declare the most queries one request to a view may run, including authentication.
+    Put it on a function view above @api_view, or on a viewset action or handler method.
+    """
+    def decorator(view):
+        view.query_budget = max_queries
+        return view
+    return decorator
+
+
+def view_query_budget(view_func, request):
+    """query_budget of the handler that serves request, or None."""
+    handler = _view_handler(view_func, request)
+    return getattr(handler, 'query_budget', getattr(view_func, 'query_budget', None))
+
+
+@contextmanager
+def assert_query_budget(path, method='GET', budget=None):
+    """
+    Like assertNumQueries, with the limit read from the query_budget of the view serving
+    path (or budget): raises QueryBudgetExceeded when the block runs more queries.
+
+        with assert_query_budget('/api/call-events/'):
+            self.client.get('/api/call-events/')
+    """
+    from django.test import RequestFactory
+
+    request = RequestFactory().generic(method, path)
+    view_func = resolve(urlsplit(path).path).func
+    view = view_label(view_func, request)
+    if budget is None:
+        budget = view_query_budget(view_func, request)
+    if budget is None:
+        raise AssertionError(f"{view} declares no query_budget")
+
+    recorder = QueryRecorder()
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(recorder))
+        yield recorder
+
+    if len(recorder.queries) > budget:
+        queries = '\n'.join(f"{index}. {_truncate(sql)}" for index, (sql, _) in enumerate(recorder.queries, start=1))
+        raise QueryBudgetExceeded(f"{view} ran {len(recorder.queries)} queries, over its budget of {budget}:\n{queries}")
+
+
+def view_label(view_func, request):
+    """ViewSet.action for DRF views, the function name otherwise."""
+    view_class = getattr(view_func, 'cls', None)
+    actions = getattr(view_func, 'actions', None)
+    if view_class is not None and actions:
+        return f"{view_class.__name__}.{actions.get(request.method.lower(), request.method.lower())}"
+    return getattr(view_func, '__name__', view_func.__class__.__name__)
+
+
+def _view_handler(view_func, request):
+    view_class = getattr(view_func, 'cls', None)
+    if view_class is None:
+        return view_func
+    actions = getattr(view_func, 'actions', None)
+    method = request.method.lower()
+    return getattr(view_class, actions.get(method, method) if actions else method, None)
+
+
+class QueryRecorder:
+    """Connection execute wrapper collecting (sql, seconds) for each executed statement."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, time.perf_counter() - start))
+
+    def summary(self):
+        """Query count, DB milliseconds, slowest statement and most repeated statement."""
+        total = sum(seconds for _, seconds in self.queries)
+        slowest = most_repeated = None
+        if self.queries:
+            slowest_sql, slowest_seconds = max(self.queries, key=lambda query: query[1])
+            slowest = {'sql': _truncate(slowest_sql), 'ms': round(slowest_seconds * 1000, 3)}
+        repeats = Counter(sql for sql, _ in self.queries)
+        for repeated_sql, repeated_count in repeats.most_common(1):
+            if repeated_count > 1:
+                most_repeated = {'sql': _truncate(repeated_sql), 'count': repeated_count}
+        return {
+            'queries': len(self.queries),
+            'db_ms': round(total * 1000, 3),
+            'duplicates': len(self.queries) - len(repeats),
+            'slowest': slowest,
+            'most_repeated': most_repeated,
+        }
+
+
+def _truncate(sql):
+    sql = ' '.join(sql.split())
+    return sql if len(sql) <= MAX_SQL_LENGTH else sql[:MAX_SQL_LENGTH - 3] + '...'
+
+
+class QueryProfileReport:
+    """The most recent request profiles of this process."""
+
+    def __init__(self, size):
+        self.lock = threading.Lock()
+        self.entries = deque(maxlen=size)
+
+    def add(self, entry):
+        with self.lock:
+            self.entries.append(entry)
+
+    def snapshot(self):
+        with self.lock:
+            return list(self.entries)
+
+
+def summarize_views(entries):
+    """Per-view request count, mean and max queries, mean DB time and over-budget requests."""
+    views = defaultdict(lambda: {'requests': 0, 'queries': 0, 'max_queries': 0, 'db_ms': 0.0, 'over_budget': 0})
+    for entry in entries:
+        view = views[entry['view']]
+        view['requests'] += 1
+        view['queries'] += entry['queries']
+        view['max_queries'] = max(view['max_queries'], entry['queries'])
+        view['db_ms'] += entry['db_ms']
+        view['over_budget'] += entry['over_budget']
+        view['budget'] = entry['budget']
+
+    return sorted(
+        (
+            {
+                'view': name,
+                'requests': view['requests'],
+                'mean_queries': round(view['queries'] / view['requests'], 2),
+                'max_queries': view['max_queries'],
+                'mean_db_ms': round(view['db_ms'] / view['requests'], 3),
+                'budget': view['budget'],
+                'over_budget': view['over_budget'],
+            }
+            for name, view in views.items()
+        ),
+        key=lambda view: (-view['max_queries'], view['view'])
+    )
+
+
+_report = None
+_report_lock = threading.Lock()
+
+
+def get_query_profile_report():
+    """Process-wide report, or None when QUERY_PROFILING is disabled."""
+    global _report
+    config = getattr(settings, 'QUERY_PROFILING', {})
+    if not config.get('ENABLED'):
+        return None
+    with _report_lock:
+        if _report is None:
+            _report = QueryProfileReport(config.get('REPORT_SIZE', 200))
+    return _report
+
+
+@require_GET
+def query_profile_view(request):
+    """Recent request profiles (newest first, ?limit=) and a per-view summary for this worker."""
+    report = get_query_profile_report()
+    if report is None:
+        return JsonResponse({'error': 'Query profiling is disabled'}, status=503)
+    try:
+        limit = int(request.GET.get('limit') or 50)
+    except ValueError:
+        return JsonResponse({'error': 'limit must be an integer'}, status=400)
+
+    entries = report.snapshot()
+    return JsonResponse({
+        'views': summarize_views(entries),
+        'requests': entries[::-1][:max(limit, 0)],
+    })
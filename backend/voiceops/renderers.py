@@ -0,0 +1,30 @@
+"""
+High-performance JSON renderer for the REST API.
+"""
+import orjson
+from rest_framework.utils import encoders
+from rest_framework.renderers import BaseRenderer
+
+
+class ORJSONRenderer(BaseRenderer):
+    """
+    Render JSON with orjson.
+    datetime, UUID and dict/list subclasses (DRF's ReturnDict/ReturnList) are serialized natively;
+    anything else falls back to DRF's JSONEncoder rules.
+    """
+    media_type = 'application/json'
+    format = 'json'
+    charset = None
+
+    options = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+    encoder = encoders.JSONEncoder()
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        options = self.options
+        if accepted_media_type and 'indent=' in accepted_media_type:
+            options |= orjson.OPT_INDENT_2
+
+        return orjson.dumps(data, default=self.encoder.default, option=options)
@@ -38,6 +38,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'voiceops.middleware.QueryProfilingMiddleware',
+    'voiceops.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -78,6 +80,75 @@ CHANNEL_LAYERS = {
     },
 }
 
+# Per-connection outbound queue for the event stream WebSocket.
+# POLICY is the default overflow policy: coalesce, drop_oldest or disconnect.
+EVENT_STREAM_BACKPRESSURE = {
+    'QUEUE_SIZE': int(os.environ.get('EVENT_STREAM_QUEUE_SIZE', '500')),
+    'POLICY': os.environ.get('EVENT_STREAM_OVERFLOW_POLICY', 'coalesce'),
+}
+
+# Replay buffer for resuming the event stream after a reconnect.
+# BACKEND is redis (shared Redis Stream) or memory (single process only); empty disables replay.
+EVENT_STREAM_REPLAY = {
+    'BACKEND': os.environ.get('EVENT_STREAM_REPLAY_BACKEND', 'redis'),
+    'REDIS_URL': os.environ.get('REDIS_URL', 'redis://127.0.0.1:6379/0'),
+    'MAX_EVENTS': int(os.environ.get('EVENT_STREAM_REPLAY_MAX_EVENTS', '10000')),
+    'MAX_REPLAY': int(os.environ.get('EVENT_STREAM_REPLAY_MAX_REPLAY', '1000')),
+}
+
+# Sliding-window top-N sketches for error codes, correlation_sids and failing to_numbers.
+# BACKEND is redis (shared by all workers) or memory (per process); empty disables tracking.
+HEAVY_HITTERS = {
+    'BACKEND': os.environ.get('HEAVY_HITTERS_BACKEND', 'redis'),
+    'REDIS_URL': os.environ.get('REDIS_URL', 'redis://127.0.0.1:6379/0'),
+    'WINDOW_MINUTES': int(os.environ.get('HEAVY_HITTERS_WINDOW_MINUTES', '60')),
+    'CAPACITY': int(os.environ.get('HEAVY_HITTERS_CAPACITY', '200')),
+}
+
+# Per-account EWMA baseline of per-minute error and failed-call counts; alerts once per anomaly.
+# BACKEND is redis (counts, baselines and alerts shared by all workers) or memory (per process,
+# lost on restart); empty disables. With redis each process syncs its counts every SYNC_SECONDS.
+ERROR_RATE_ANOMALY = {
+    'BACKEND': os.environ.get('ERROR_RATE_ANOMALY_BACKEND', 'redis'),
+    'REDIS_URL': os.environ.get('REDIS_URL', 'redis://127.0.0.1:6379/0'),
+    'ALPHA': float(os.environ.get('ERROR_RATE_ANOMALY_ALPHA', '0.1')),
+    'THRESHOLD': float(os.environ.get('ERROR_RATE_ANOMALY_THRESHOLD', '4')),
+    'MIN_COUNT': int(os.environ.get('ERROR_RATE_ANOMALY_MIN_COUNT', '10')),
+    'WARMUP_MINUTES': int(os.environ.get('ERROR_RATE_ANOMALY_WARMUP_MINUTES', '15')),
+    'SYNC_SECONDS': float(os.environ.get('ERROR_RATE_ANOMALY_SYNC_SECONDS', '5')),
+    'CHECKPOINT_SECONDS': 30,
+}
+
+# Prometheus metrics served at /metrics. BACKEND is redis (totals shared by all workers)
+# or memory (per process); empty disables collection. Each process adds its increments
+# to the store every FLUSH_SECONDS.
+METRICS = {
+    'BACKEND': os.environ.get('METRICS_BACKEND', 'redis'),
+    'REDIS_URL': os.environ.get('REDIS_URL', 'redis://127.0.0.1:6379/0'),
+    'FLUSH_SECONDS': float(os.environ.get('METRICS_FLUSH_SECONDS', '5')),
+}
+
+# Tracing spans for webhook deliveries (voiceops.tracing). EXPORTER is file (OTLP/JSON
+# lines in FILE, rotated at MAX_BYTES), console, or empty to disable. SAMPLE_RATE is the
+# fraction of deliveries traced when the request carries no W3C traceparent header.
+TRACING = {
+    'EXPORTER': os.environ.get('TRACING_EXPORTER', 'file'),
+    'FILE': os.environ.get('TRACING_FILE', str(BASE_DIR / 'traces' / 'spans.jsonl')),
+    'MAX_BYTES': int(os.environ.get('TRACING_MAX_BYTES', str(50 * 1024 * 1024))),
+    'SAMPLE_RATE': float(os.environ.get('TRACING_SAMPLE_RATE', '1.0')),
+    'SERVICE_NAME': 'voiceops-backend',
+}
+
+# Health and readiness (/api/health/, /api/health/ready/). A worker is unready when the
+# database or channel layer does not answer within CHECK_TIMEOUT_SECONDS or its ingest
+# lag exceeds MAX_LAG_SECONDS. Dependency checks are cached for CACHE_SECONDS.
+INGEST_HEALTH = {
+    'MAX_LAG_SECONDS': float(os.environ.get('INGEST_MAX_LAG_SECONDS', '5')),
+    'LAG_WINDOW_SECONDS': 10,
+    'ERROR_WINDOW_SECONDS': 60,
+    'CHECK_TIMEOUT_SECONDS': float(os.environ.get('HEALTH_CHECK_TIMEOUT_SECONDS', '0.5')),
+    'CACHE_SECONDS': 1.0,
+}
 
 
 # Database
@@ -150,13 +221,38 @@ REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 100,
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'voiceops.renderers.ORJSONRenderer',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'authentication.authentication.ClaimsJWTAuthentication',
     ],
 }
 
+# JWT authentication (authentication.authentication). The claims mode builds request.user
+# from the access token claims without a query; database loads the User row per request.
+# USER_CACHE_SECONDS is how long authenticated_user() reuses a loaded User row.
+JWT_AUTHENTICATION = {
+    'MODE': os.environ.get('JWT_AUTH_MODE', 'claims'),
+    'USER_CACHE_SECONDS': float(os.environ.get('JWT_USER_CACHE_SECONDS', '30')),
+}
+
+# Response compression (voiceops.middleware.CompressionMiddleware)
+COMPRESSION_MIN_SIZE = 1024
+COMPRESSION_BROTLI_QUALITY = 4
+COMPRESSION_EXCLUDE_PATHS = (
+    '/api/twilio-events',
+    '/webhooks/',
+)
+
+# Per-request query profiling (voiceops.middleware.QueryProfilingMiddleware), off by
+# default. ENFORCE_BUDGETS raises QueryBudgetExceeded for requests over their view's
+# query_budget instead of only flagging them in the /query-profile report.
+QUERY_PROFILING = {
+    'ENABLED': os.environ.get('QUERY_PROFILING', '').lower() in ('1', 'true'),
+    'ENFORCE_BUDGETS': os.environ.get('QUERY_PROFILING_ENFORCE_BUDGETS', '').lower() in ('1', 'true'),
+    'REPORT_SIZE': int(os.environ.get('QUERY_PROFILING_REPORT_SIZE', '200')),
+}
+
 # JWT Settings
 from datetime import timedelta
 
@@ -165,7 +261,8 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
     'ROTATE_REFRESH_TOKENS': False,
     'BLACKLIST_AFTER_ROTATION': False,
-    'UPDATE_LAST_LOGIN': True,
+    # Only affects simplejwt's token obtain views; google_auth records last_login itself
+    'UPDATE_LAST_LOGIN': False,
     'ALGORITHM': 'HS256',
     'SIGNING_KEY': SECRET_KEY,
     'AUTH_HEADER_TYPES': ('Bearer',),
@@ -173,3 +270,34 @@ SIMPLE_JWT = {
 
 # Google OAuth settings
 GOOGLE_OAUTH_CLIENT_ID = os.environ.get('GOOGLE_OAUTH_CLIENT_ID')
+
+# Google ID token verification (authentication.google_verifier). Certificates are cached
+# for the max-age Google sends; CERTS_URL can point at a local stub in tests.
+GOOGLE_AUTH = {
+    'CERTS_URL': os.environ.get('GOOGLE_OAUTH_CERTS_URL', 'https://www.googleapis.com/oauth2/v1/certs'),
+    'CERTS_TIMEOUT_SECONDS': float(os.environ.get('GOOGLE_OAUTH_CERTS_TIMEOUT_SECONDS', '5')),
+    'CLOCK_SKEW_SECONDS': 0,
+}
+
+# Post-login side effects (authentication.background): worker threads and the most tasks
+# queued or running before new ones are dropped
+LOGIN_TASKS = {
+    'MAX_WORKERS': int(os.environ.get('LOGIN_TASK_WORKERS', '4')),
+    'MAX_PENDING': int(os.environ.get('LOGIN_TASK_MAX_PENDING', '100')),
+}
+
+# Application logs (loggers named after their modules) go to the console at LOG_LEVEL
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'simple': {'format': '{asctime} {levelname} {name}: {message}', 'style': '{'},
+    },
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler', 'formatter': 'simple'},
+    },
+    'loggers': {
+        app: {'handlers': ['console'], 'level': os.environ.get('LOG_LEVEL', 'INFO')}
+        for app in ('authentication', 'events', 'voiceops')
+    },
+}
@@ -0,0 +1,337 @@
+"""
+Lightweight tracing spans with the OpenTelemetry data model.
+
+span() opens a span under the current one. The current span lives in a context variable,
+so it follows Django's sync_to_async and async_to_sync hops; functions handed to threads
+are wrapped with propagate() so their spans join the caller's trace. Spans are buffered
+until the local root span ends and then exported together:
+
+- file: one OTLP/JSON ExportTraceServiceRequest per line in TRACING['FILE'], the format
+  the OpenTelemetry Collector's otlpjsonfile receiver reads; rotated at MAX_BYTES
+- console: an indented span tree per trace on stdout
+
+Root spans are sampled by trace id at TRACING['SAMPLE_RATE'], like OpenTelemetry's
+TraceIdRatioBased sampler; a W3C traceparent on the incoming request decides instead.
+With an empty exporter span() does nothing.
+"""
+import contextvars
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+SPAN_KIND_CLIENT = 3
+
+STATUS_ERROR = 2
+
+re_traceparent = re.compile(r'^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$')
+
+# Span, SpanContext (a parent in another thread or service) or None
+_current = contextvars.ContextVar('voiceops_current_span', default=None)
+
+
+class SpanContext:
+    """Identity of a span recorded elsewhere, used as the parent of local spans."""
+
+    def __init__(self, trace_id, span_id, sampled):
+        self.trace_id = trace_id
+        self.span_id = span_id
+        self.sampled = sampled
+
+
+class Span:
+    """A span being recorded in this process."""
+
+    recording = True
+    sampled = True
+
+    def __init__(self, name, trace_id, parent_id, kind, attributes, buffer):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = f"{_random_bits(64):016x}"
+        self.parent_id = parent_id
+        self.kind = kind
+        self.attributes = attributes
+        self.events = []
+        self.status = None
+        self.buffer = buffer
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def set_error(self, message):
+        self.status = (STATUS_ERROR, message)
+
+    def record_exception(self, exc):
+        self.set_error(str(exc))
+        self.events.append({
+            'name': 'exception',
+            'timeUnixNano': str(time.time_ns()),
+            'attributes': _otlp_attributes({'exception.type': type(exc).__name__, 'exception.message': str(exc)}),
+        })
+
+
+class NonRecordingSpan:
+    """Stand-in yielded by span() when the trace is not sampled or tracing is off."""
+
+    recording = False
+
+    def set_attribute(self, key, value):
+        pass
+
+    def set_error(self, message):
+        pass
+
+    def record_exception(self, exc):
+        pass
+
+
+NON_RECORDING_SPAN = NonRecordingSpan()
+
+
+class _TraceBuffer:
+    """Finished spans of one trace in this thread of work, exported when the root ends."""
+
+    def __init__(self, root=None):
+        self.root = root
+        self.spans = []
+
+
+class Tracer:
+    def __init__(self, exporter, sample_rate, service_name):
+        self.exporter = exporter
+        self.sample_bound = round(min(max(sample_rate, 0.0), 1.0) * (1 << 64))
+        self.resource = _otlp_attributes({'service.name': service_name, 'process.pid': os.getpid()})
+
+    def sampled(self, trace_id):
+        return int(trace_id[16:], 16) < self.sample_bound
+
+    def export(self, spans):
+        try:
+            self.exporter.export(spans, self.resource)
+        except Exception as e:
+            logger.warning("Failed to export trace spans: %s", e)
+
+
+class FileSpanExporter:
+    """Appends one OTLP/JSON line per trace; keeps one rotated file at path + '.1'."""
+
+    def __init__(self, path, max_bytes):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.stream = None
+
+    def export(self, spans, resource):
+        line = json.dumps(_otlp_request(spans, resource), separators=(',', ':')) + '\n'
+        with self.lock:
+            if self.stream is None:
+                os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+                self.stream = open(self.path, 'a')
+            elif self.stream.tell() >= self.max_bytes:
+                self._rotate()
+            self.stream.write(line)
+            self.stream.flush()
+
+    def _rotate(self):
+        # Another worker may have rotated already; only move the file this stream writes to.
+        try:
+            if os.stat(self.path).st_ino == os.fstat(self.stream.fileno()).st_ino:
+                os.replace(self.path, self.path + '.1')
+        except FileNotFoundError:
+            pass
+        self.stream.close()
+        self.stream = open(self.path, 'a')
+
+
+class ConsoleSpanExporter:
+    """Prints each trace as an indented tree of spans with durations."""
+
+    def export(self, spans, resource):
+        depths = {}
+        lines = []
+        for span in sorted(spans, key=lambda span: span.start_ns):
+            depth = depths.get(span.parent_id, -1) + 1
+            depths[span.span_id] = depth
+            attributes = ' '.join(f"{key}={value}" for key, value in span.attributes.items())
+            error = f" ERROR {span.status[1]}" if span.status else ''
+            lines.append(
+                f"{'  ' * depth}{span.name} {(span.end_ns - span.start_ns) / 1e6:.2f}ms {attributes}{error}".rstrip()
+            )
+        print(f"trace {spans[0].trace_id}\n" + '\n'.join(lines))
+
+
+SPAN_EXPORTERS = {
+    'file': lambda config: FileSpanExporter(
+        config.get('FILE', os.path.join(settings.BASE_DIR, 'traces', 'spans.jsonl')),
+        config.get('MAX_BYTES', 50 * 1024 * 1024)
+    ),
+    'console': lambda config: ConsoleSpanExporter(),
+}
+
+_tracer = None
+_tracer_configured = False
+_tracer_lock = threading.Lock()
+
+
+def get_tracer():
+    """Process-wide tracer from settings.TRACING, or None when tracing is disabled."""
+    global _tracer, _tracer_configured
+    if _tracer_configured:
+        return _tracer
+    with _tracer_lock:
+        if not _tracer_configured:
+            config = getattr(settings, 'TRACING', {})
+            exporter = config.get('EXPORTER')
+            _tracer = None
+            if exporter:
+                if exporter not in SPAN_EXPORTERS:
+                    raise ValueError(f"Unknown TRACING exporter: {exporter}")
+                _tracer = Tracer(
+                    SPAN_EXPORTERS[exporter](config),
+                    config.get('SAMPLE_RATE', 1.0),
+                    config.get('SERVICE_NAME', 'voiceops-backend')
+                )
+            _tracer_configured = True
+    return _tracer
+
+
+@contextmanager
+def span(name, kind=SPAN_KIND_INTERNAL, parent=None, **attributes):
+    """
+    Record the with block as a span named name under the current span, or under parent
+    (a SpanContext, e.g. from extract_traceparent) when given. Yields the span so callers
+    can add attributes; exceptions are recorded on it and re-raised.
+    """
+    tracer = get_tracer()
+    parent = parent or _current.get()
+    if tracer is None or (parent is not None and not parent.sampled):
+        yield NON_RECORDING_SPAN
+        return
+
+    if parent is None:
+        trace_id = f"{_random_bits(128):032x}"
+        if not tracer.sampled(trace_id):
+            # Children must not start traces of their own
+            token = _current.set(SpanContext(trace_id, None, False))
+            try:
+                yield NON_RECORDING_SPAN
+            finally:
+                _current.reset(token)
+            return
+        parent_id, buffer = None, None
+    elif isinstance(parent, Span):
+        trace_id, parent_id, buffer = parent.trace_id, parent.span_id, parent.buffer
+    else:
+        trace_id, parent_id, buffer = parent.trace_id, parent.span_id, None
+
+    current = Span(name, trace_id, parent_id, kind, attributes, buffer or _TraceBuffer())
+    if buffer is None:
+        current.buffer.root = current
+    token = _current.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.record_exception(e)
+        raise
+    finally:
+        _current.reset(token)
+        current.end_ns = time.time_ns()
+        current.buffer.spans.append(current)
+        if current.buffer.root is current:
+            tracer.export(current.buffer.spans)
+
+
+def current_span():
+    """The span being recorded in this context, or a non-recording stand-in."""
+    current = _current.get()
+    return current if isinstance(current, Span) else NON_RECORDING_SPAN
+
+
+def propagate(func):
+    """Wrap func to run under the current span, e.g. as a thread target."""
+    parent = _current.get()
+    if isinstance(parent, Span):
+        parent = SpanContext(parent.trace_id, parent.span_id, True)
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        token = _current.set(parent)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _current.reset(token)
+    return wrapper
+
+
+def extract_traceparent(header):
+    """SpanContext from a W3C traceparent header value, or None when absent or malformed."""
+    match = re_traceparent.match((header or '').strip().lower())
+    if not match or match.group(1) == '0' * 32 or match.group(2) == '0' * 16:
+        return None
+    return SpanContext(match.group(1), match.group(2), bool(int(match.group(3), 16) & 1))
+
+
+def _random_bits(bits):
+    value = 0
+    while not value:
+        value = random.getrandbits(bits)
+    return value
+
+
+def _otlp_request(spans, resource):
+    return {
+        'resourceSpans': [{
+            'resource': {'attributes': resource},
+            'scopeSpans': [{
+                'scope': {'name': 'voiceops'},
+                'spans': [_otlp_span(span) for span in spans],
+            }],
+        }],
+    }
+
+
+def _otlp_span(span):
+    encoded = {
+        'traceId': span.trace_id,
+        'spanId': span.span_id,
+        'name': span.name,
+        'kind': span.kind,
+        'startTimeUnixNano': str(span.start_ns),
+        'endTimeUnixNano': str(span.end_ns),
+        'attributes': _otlp_attributes(span.attributes),
+    }
+    if span.parent_id:
+        encoded['parentSpanId'] = span.parent_id
+    if span.events:
+        encoded['events'] = span.events
+    if span.status:
+        encoded['status'] = {'code': span.status[0], 'message': span.status[1]}
+    return encoded
+
+
+def _otlp_attributes(attributes):
+    return [{'key': key, 'value': _otlp_value(value)} for key, value in attributes.items()]
+
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
@@ -1,9 +1,14 @@
 from django.contrib import admin
 from django.urls import path, include
 
+from .metrics import metrics_view
+from .query_profiling import query_profile_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include("events.urls")),
     path('api/auth/', include("authentication.urls")),
     path('webhooks/', include("events.urls")),
+    path('metrics', metrics_view, name='metrics'),
+    path('query-profile', query_profile_view, name='query_profile'),
 ]
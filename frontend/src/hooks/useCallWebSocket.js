@@ -1,25 +1,53 @@
 import { useEffect, useRef, useState } from 'react'
 
-export function useCallWebSocket(url, onCallEvent, onErrorEvent) {
+// Stream messages count towards the server's ack window; acks are batched.
+const STREAM_MESSAGE_TYPES = new Set([
+  'call_event', 'error_event', 'trace_event', 'coalesced', 'replay_complete', 'resync_required',
+])
+const ACK_EVERY = 25
+const ACK_DELAY_MS = 500
+
+export function useCallWebSocket(url, onCallEvent, onErrorEvent, onResync) {
   const [isConnected, setIsConnected] = useState(false)
   const wsRef = useRef(null)
   const reconnectTimerRef = useRef(null)
+  const lastCursorRef = useRef(null)
   const onCallEventRef = useRef(onCallEvent)
   const onErrorEventRef = useRef(onErrorEvent)
+  const onResyncRef = useRef(onResync)
 
   useEffect(() => {
     onCallEventRef.current = onCallEvent
     onErrorEventRef.current = onErrorEvent
-  }, [onCallEvent, onErrorEvent])
+    onResyncRef.current = onResync
+  }, [onCallEvent, onErrorEvent, onResync])
 
   useEffect(() => {
     if (!url) return undefined
 
     let isMounted = true
+    // Cursors are only meaningful for the stream they came from.
+    lastCursorRef.current = null
 
     const connect = () => {
-      const ws = new WebSocket(url)
+      // Resume from the last seen cursor so the server replays only missed events.
+      const separator = url.includes('?') ? '&' : '?'
+      const ws = new WebSocket(
+        lastCursorRef.current
+          ? `${url}${separator}last_seen=${encodeURIComponent(lastCursorRef.current)}`
+          : url,
+      )
       wsRef.current = ws
+      let received = 0
+      let acked = 0
+      let ackTimer = null
+
+      const sendAck = () => {
+        ackTimer = null
+        if (received === acked || ws.readyState !== WebSocket.OPEN) return
+        acked = received
+        ws.send(JSON.stringify({ action: 'ack', received }))
+      }
 
       ws.onopen = () => {
         if (!isMounted) return
@@ -29,8 +57,26 @@ export function useCallWebSocket(url, onCallEvent, onErrorEvent) {
       ws.onmessage = (event) => {
         if (!isMounted) return
         const message = JSON.parse(event.data)
+        if (message.cursor) lastCursorRef.current = message.cursor
         if (message.type === 'call_event') onCallEventRef.current?.(message.data)
         if (message.type === 'error_event') onErrorEventRef.current?.(message.data)
+        // Slow consumer disconnect: the reconnect replays from last_seen, so no reload is needed.
+        if (message.type === 'resume' && message.last_seen) lastCursorRef.current = message.last_seen
+        // Server dropped events for this connection or cannot replay the gap: reload current data instead.
+        if (message.type === 'coalesced' || message.type === 'resync_required') {
+          // The reload covers everything up to now; replaying from the old cursor would repeat it.
+          lastCursorRef.current = null
+          onResyncRef.current?.(message)
+        }
+
+        if (STREAM_MESSAGE_TYPES.has(message.type)) {
+          received += 1
+          if (received - acked >= ACK_EVERY) {
+            sendAck()
+          } else if (!ackTimer) {
+            ackTimer = setTimeout(sendAck, ACK_DELAY_MS)
+          }
+        }
       }
 
       ws.onerror = () => {
@@ -39,6 +85,7 @@ export function useCallWebSocket(url, onCallEvent, onErrorEvent) {
       }
 
       ws.onclose = () => {
+        if (ackTimer) clearTimeout(ackTimer)
         if (!isMounted) return
         setIsConnected(false)
         reconnectTimerRef.current = setTimeout(connect, 3000)
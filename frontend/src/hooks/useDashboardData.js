@@ -101,10 +101,15 @@ export function useDashboardData({ apiBaseUrl, wsBaseUrl }) {
     }
   }, [])
 
+  const handleStreamResync = useCallback(() => {
+    fetchData(true)
+  }, [fetchData])
+
   const { isConnected: wsConnected } = useCallWebSocket(
-    `${wsBaseUrl}/ws/events/`,
+    `${wsBaseUrl}/ws/events/?ack_window=100`,
     handleIncomingCallEvent,
     handleIncomingErrorEvent,
+    handleStreamResync,
   )
 
   useEffect(() => {